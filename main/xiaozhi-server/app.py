@@ -9,6 +9,14 @@ from core.utils.util import get_local_ip, validate_mcp_endpoint
 from core.http_server import SimpleHttpServer
 from core.websocket_server import WebSocketServer
 from core.utils.util import check_ffmpeg_installed
+from core.utils.turn_trace import turn_tracer
+from core.utils.executor import configure_executor, run_blocking, set_main_loop
+from core.utils.audio_assets import audio_assets
+from core.utils.music_library import music_library
+from core.utils.tts_cache import tts_audio_cache
+from core.utils.cache.manager import cache_manager, CacheType
+from core.utils.cache.backends import create_backend
+from core.utils.http_client import close_http_session
 
 TAG = __name__
 logger = setup_logging()
@@ -54,6 +62,33 @@ async def main():
         auth_key = str(uuid.uuid4().hex)
     config["server"]["auth_key"] = auth_key
 
+    # 单轮对话耗时追踪
+    turn_tracer.configure(config.get("turn_trace", {}))
+    # 所有连接共享的线程池
+    configure_executor(
+        config.get("executor_max_workers"), config.get("chat_executor_max_workers")
+    )
+    set_main_loop(asyncio.get_running_loop())
+    # 多个服务进程共享的缓存
+    shared_cache = config.get("shared_cache") or {}
+    cache_manager.configure_backend(
+        create_backend(shared_cache),
+        [CacheType(name) for name in shared_cache.get("types", [])],
+        near_ttl=float(shared_cache.get("near_ttl", 60)),
+        max_ttl=float(shared_cache.get("max_ttl", 3600)),
+        sweep_interval=float(shared_cache.get("sweep_interval", 300)),
+    )
+    # TTS音频缓存
+    tts_audio_cache.configure(config.get("tts_cache", {}))
+    # 后台预先转码提示音，绑定码等首次播放时无需等待
+    if config.get("preload_audio_assets", True):
+        asyncio.create_task(run_blocking(audio_assets.preload, "config/assets"))
+    # 后台把音乐库转码为p3，播放时无需整首解码
+    music_config = config.get("plugins", {}).get("play_music", {})
+    music_library.configure(music_config)
+    if music_config.get("pre_transcode", True):
+        asyncio.create_task(run_blocking(music_library.transcode_all))
+
     # 添加 stdin 监控任务
     stdin_task = asyncio.create_task(monitor_stdin())
 
@@ -128,6 +163,7 @@ async def main():
             timeout=3.0,
             return_when=asyncio.ALL_COMPLETED,
         )
+        await close_http_session()
         print("服务器已关闭，程序退出。")
 
 
@@ -39,8 +39,8 @@ def load_config():
     # 初始化目录
     ensure_directories(config)
 
-    # 缓存配置
-    cache_manager.set(CacheType.CONFIG, "main_config", config)
+    # 缓存配置，各进程读取自己的配置文件，不写入共享缓存
+    cache_manager.set(CacheType.CONFIG, "main_config", config, shared=False)
     return config
 
 
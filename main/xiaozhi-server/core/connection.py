@@ -25,7 +25,8 @@ from core.utils.modules_initialize import (
 )
 from core.handle.reportHandle import report
 from core.providers.tts.default import DefaultTTS
-from concurrent.futures import ThreadPoolExecutor
+from core.utils.executor import get_executor, get_chat_executor, StreamIterator
+from core.utils.loop_queue import LoopQueue
 from core.utils.dialogue import Message, Dialogue
 from core.providers.asr.dto.dto import InterfaceType
 from core.handle.textHandle import handleTextMessage
@@ -39,6 +40,7 @@ from config.logger import setup_logging, build_module_string, create_connection_
 from config.manage_api_client import DeviceNotFoundException, DeviceBindException
 from core.utils.prompt_manager import PromptManager
 from core.utils.voiceprint_provider import VoiceprintProvider
+from core.utils.audio_buffer import PcmRingBuffer
 from core.utils import textUtils
 
 TAG = __name__
@@ -90,11 +92,14 @@ class ConnectionHandler:
         # 线程任务相关
         self.loop = asyncio.get_event_loop()
         self.stop_event = threading.Event()
-        self.executor = ThreadPoolExecutor(max_workers=5)
-
-        # 添加上报线程池
-        self.report_queue = queue.Queue()
-        self.report_thread = None
+        # 短时阻塞调用统一提交到进程级共享线程池
+        self.executor = get_executor()
+        # 每轮对话的chat线程在对话线程池中执行
+        self.chat_executor = get_chat_executor()
+
+        # 上报队列，由事件循环中的上报任务消费
+        self.report_queue = LoopQueue(self.loop)
+        self.report_task = None
         # 未来可以通过修改此处，调节asr的上报和tts的上报，目前默认都开启
         self.report_asr_enable = self.read_config_from_api
         self.report_tts_enable = self.read_config_from_api
@@ -113,7 +118,10 @@ class ConnectionHandler:
         self.voiceprint_provider = None
 
         # vad相关变量
-        self.client_audio_buffer = bytearray()
+        # 每个连接独占的VAD会话（解码器和模型状态），关闭连接时归还
+        self.vad_session = None
+        # 解码后的PCM只写入一次，VAD按窗口读取视图，ASR复用同一份数据
+        self.client_audio_buffer = PcmRingBuffer()
         self.client_have_voice = False
         self.last_activity_time = 0.0  # 统一的活动时间戳（毫秒）
         self.client_voice_stop = False
@@ -124,11 +132,14 @@ class ConnectionHandler:
         # 因为实际部署时可能会用到公共的本地ASR，不能把变量暴露给公共ASR
         # 所以涉及到ASR的变量，需要在这里定义，属于connection的私有变量
         self.asr_audio = []
-        self.asr_audio_queue = queue.Queue()
+        self.asr_audio_queue = LoopQueue(self.loop)
+        self.asr_priority_task = None
 
         # llm相关变量
         self.llm_finish_task = True
         self.dialogue = Dialogue()
+        # 正在进行的大模型流式请求，打断时立即关闭
+        self.llm_stream = None
 
         # tts相关变量
         self.sentence_id = None
@@ -149,6 +160,10 @@ class ConnectionHandler:
         self.close_after_chat = False
         self.load_function_plugin = False
         self.intent_type = "nointent"
+        # 意图识别与聊天大模型同时启动
+        self.speculative_chat = False
+        # 本轮对话的耗时追踪，从用户说完话开始
+        self.turn_trace = None
 
         self.timeout_seconds = (
             int(self.config.get("close_connection_no_voice_time", 120)) + 60
@@ -263,8 +278,8 @@ class ConnectionHandler:
                         except Exception:
                             pass
 
-                # 启动线程保存记忆，不等待完成
-                threading.Thread(target=save_memory_task, daemon=True).start()
+                # 在共享线程池中保存记忆，不等待完成
+                get_executor().submit(save_memory_task)
         except Exception as e:
             self.logger.bind(tag=TAG).error(f"保存记忆失败: {e}")
         finally:
@@ -355,6 +370,8 @@ class ConnectionHandler:
             """初始化本地组件"""
             if self.vad is None:
                 self.vad = self._vad
+            if self.vad is not None and self.vad_session is None:
+                self.vad_session = self.vad.acquire_session()
             if self.asr is None:
                 self.asr = self._initialize_asr()
 
@@ -376,8 +393,8 @@ class ConnectionHandler:
             self._initialize_memory()
             """加载意图识别"""
             self._initialize_intent()
-            """初始化上报线程"""
-            self._init_report_threads()
+            """初始化上报任务"""
+            asyncio.run_coroutine_threadsafe(self._init_report_task(), self.loop)
             """更新系统提示词"""
             self._init_prompt_enhancement()
 
@@ -394,18 +411,15 @@ class ConnectionHandler:
             self.change_system_prompt(enhanced_prompt)
             self.logger.bind(tag=TAG).info("系统提示词已增强更新")
 
-    def _init_report_threads(self):
-        """初始化ASR和TTS上报线程"""
+    async def _init_report_task(self):
+        """初始化ASR和TTS上报任务"""
         if not self.read_config_from_api or self.need_bind:
             return
         if self.chat_history_conf == 0:
             return
-        if self.report_thread is None or not self.report_thread.is_alive():
-            self.report_thread = threading.Thread(
-                target=self._report_worker, daemon=True
-            )
-            self.report_thread.start()
-            self.logger.bind(tag=TAG).info("TTS上报线程已启动")
+        if self.report_task is None or self.report_task.done():
+            self.report_task = asyncio.create_task(self._report_worker())
+            self.logger.bind(tag=TAG).info("TTS上报任务已启动")
 
     def _initialize_tts(self):
         """初始化TTS"""
@@ -618,6 +632,11 @@ class ConnectionHandler:
         ]["type"]
         if self.intent_type == "function_call" or self.intent_type == "intent_llm":
             self.load_function_plugin = True
+        self.speculative_chat = str(
+            self.config["Intent"][self.config["selected_module"]["Intent"]].get(
+                "speculative_chat", False
+            )
+        ).lower() in ("true", "1", "yes")
         """初始化意图识别模块"""
         # 获取意图识别配置
         intent_config = self.config["Intent"]
@@ -664,23 +683,18 @@ class ConnectionHandler:
         # 更新系统prompt至上下文
         self.dialogue.update_system_message(self.prompt)
 
-    def chat(self, query, tool_call=False, depth=0):
+    def chat(self, query, tool_call=False, depth=0, speculation=None):
         self.logger.bind(tag=TAG).info(f"大模型收到用户消息: {query}")
-        self.llm_finish_task = False
 
-        if not tool_call:
-            self.dialogue.put(Message(role="user", content=query))
+        # 推测执行时，用户消息和播报都要等意图确认后才生效
+        if speculation is None:
+            self.llm_finish_task = False
+            if not tool_call:
+                self.dialogue.put(Message(role="user", content=query))
 
-        # 为最顶层时新建会话ID和发送FIRST请求
-        if depth == 0:
-            self.sentence_id = str(uuid.uuid4().hex)
-            self.tts.tts_text_queue.put(
-                TTSMessageDTO(
-                    sentence_id=self.sentence_id,
-                    sentence_type=SentenceType.FIRST,
-                    content_type=ContentType.ACTION,
-                )
-            )
+            # 为最顶层时新建会话ID和发送FIRST请求
+            if depth == 0:
+                self._start_sentence()
 
         # Define intent functions
         functions = None
@@ -697,21 +711,36 @@ class ConnectionHandler:
                 )
                 memory_str = future.result()
 
+            llm_dialogue = self.dialogue.get_llm_dialogue_with_memory(
+                memory_str, self.config.get("voiceprint", {})
+            )
+            if speculation is not None:
+                llm_dialogue.append({"role": "user", "content": query})
+
             if self.intent_type == "function_call" and functions is not None:
                 # 使用支持functions的streaming接口
                 llm_responses = self.llm.response_with_functions(
                     self.session_id,
-                    self.dialogue.get_llm_dialogue_with_memory(
-                        memory_str, self.config.get("voiceprint", {})
-                    ),
+                    llm_dialogue,
                     functions=functions,
                 )
             else:
                 llm_responses = self.llm.response(
                     self.session_id,
-                    self.dialogue.get_llm_dialogue_with_memory(
-                        memory_str, self.config.get("voiceprint", {})
-                    ),
+                    llm_dialogue,
+                )
+            llm_stream = llm_responses
+            if speculation is None:
+                self.llm_stream = llm_stream
+            else:
+                # 推测执行的请求在意图确认后才登记为当前请求，之前不影响正在进行的对话
+                speculation.stream = llm_stream
+                if speculation.decided and not speculation.committed:
+                    # 请求发出前意图已确认不是继续聊天
+                    self.close_llm_stream(llm_stream)
+                    return None
+                llm_responses = self._speculative_responses(
+                    llm_responses, speculation, query
                 )
         except Exception as e:
             self.logger.bind(tag=TAG).error(f"LLM 处理出错 {query}: {e}")
@@ -719,11 +748,12 @@ class ConnectionHandler:
 
         # 处理流式响应
         tool_call_flag = False
-        function_name = None
-        function_id = None
-        function_arguments = ""
+        # 按index累积的工具调用，以及已提交执行的调用数
+        function_calls = []
+        function_futures = []
         content_arguments = ""
-        self.client_abort = False
+        if speculation is None:
+            self.client_abort = False
         emotion_flag = True
         for response in llm_responses:
             if self.client_abort:
@@ -742,17 +772,19 @@ class ConnectionHandler:
 
                 if tools_call is not None and len(tools_call) > 0:
                     tool_call_flag = True
-                    if tools_call[0].id is not None:
-                        function_id = tools_call[0].id
-                    if tools_call[0].function.name is not None:
-                        function_name = tools_call[0].function.name
-                    if tools_call[0].function.arguments is not None:
-                        function_arguments += tools_call[0].function.arguments
+                    for tool_call_delta in tools_call:
+                        self._accumulate_tool_call(function_calls, tool_call_delta)
+                    # 流式输出的工具调用按index依次给出，出现下一个调用时前面的参数已完整，立即开始执行
+                    self._dispatch_function_calls(
+                        function_calls, function_futures, len(function_calls) - 1
+                    )
             else:
                 content = response
 
             # 在llm回复中获取情绪表情，一轮对话只在开头获取一次
             if emotion_flag and content is not None and content.strip():
+                if self.turn_trace is not None:
+                    self.turn_trace.mark("llm_first_token")
                 asyncio.run_coroutine_threadsafe(
                     textUtils.get_emotion(self, content),
                     self.loop,
@@ -770,19 +802,32 @@ class ConnectionHandler:
                             content_detail=content,
                         )
                     )
+        # 被打断提前退出时关闭流式请求，上游停止生成
+        if llm_responses is not llm_stream:
+            llm_responses.close()
+        self.close_llm_stream(llm_stream)
+        if speculation is not None and not speculation.committed:
+            # 意图不是继续聊天，丢弃推测生成的内容
+            return None
+
         # 处理function call
         if tool_call_flag:
             bHasError = False
-            if function_id is None:
+            if not function_calls:
                 a = extract_json_from_string(content_arguments)
                 if a is not None:
                     try:
                         content_arguments_json = json.loads(a)
-                        function_name = content_arguments_json["name"]
-                        function_arguments = json.dumps(
-                            content_arguments_json["arguments"], ensure_ascii=False
+                        function_calls.append(
+                            {
+                                "name": content_arguments_json["name"],
+                                "id": str(uuid.uuid4().hex),
+                                "arguments": json.dumps(
+                                    content_arguments_json["arguments"],
+                                    ensure_ascii=False,
+                                ),
+                            }
                         )
-                        function_id = str(uuid.uuid4().hex)
                     except Exception as e:
                         bHasError = True
                         response_message.append(a)
@@ -800,23 +845,24 @@ class ConnectionHandler:
                     self.tts_MessageText = text_buff
                     self.dialogue.put(Message(role="assistant", content=text_buff))
                 response_message.clear()
-                self.logger.bind(tag=TAG).debug(
-                    f"function_name={function_name}, function_id={function_id}, function_arguments={function_arguments}"
+                self.logger.bind(tag=TAG).debug(f"function_calls={function_calls}")
+
+                # 提交剩余的调用，等待本轮所有调用完成
+                self._dispatch_function_calls(
+                    function_calls, function_futures, len(function_calls)
                 )
-                function_call_data = {
-                    "name": function_name,
-                    "id": function_id,
-                    "arguments": function_arguments,
-                }
-
-                # 使用统一工具处理器处理所有工具调用
-                result = asyncio.run_coroutine_threadsafe(
-                    self.func_handler.handle_llm_function_call(
-                        self, function_call_data
-                    ),
-                    self.loop,
-                ).result()
-                self._handle_function_result(result, function_call_data, depth=depth)
+                results = []
+                for future in function_futures:
+                    try:
+                        results.append(future.result())
+                    except Exception as e:
+                        self.logger.bind(tag=TAG).error(f"工具调用失败: {e}")
+                        results.append(
+                            ActionResponse(
+                                action=Action.ERROR, result=str(e), response=str(e)
+                            )
+                        )
+                self._handle_function_results(results, function_calls, depth=depth)
 
         # 存储对话内容
         if len(response_message) > 0:
@@ -841,6 +887,157 @@ class ConnectionHandler:
 
         return True
 
+    def close_llm_stream(self, stream=None):
+        """关闭大模型流式请求，未指定时关闭正在进行的请求
+
+        异步大模型的请求可以在任意线程关闭；同步生成器只能由正在迭代它的对话线程关闭。
+        """
+        if stream is None:
+            stream = self.llm_stream
+            if not isinstance(stream, StreamIterator):
+                return
+        # 只清除自己的请求，不影响其他对话已登记的请求
+        if self.llm_stream is stream:
+            self.llm_stream = None
+        close = getattr(stream, "close", None)
+        if close is not None:
+            try:
+                close()
+            except ValueError:
+                # 同步生成器正在对话线程中迭代，由对话线程在下一个片段后关闭
+                pass
+
+    def _start_sentence(self):
+        """新建会话ID并发送FIRST请求"""
+        self.sentence_id = str(uuid.uuid4().hex)
+        self.tts.tts_text_queue.put(
+            TTSMessageDTO(
+                sentence_id=self.sentence_id,
+                sentence_type=SentenceType.FIRST,
+                content_type=ContentType.ACTION,
+            )
+        )
+
+    def _speculative_responses(self, llm_responses, speculation, query):
+        """意图确认前缓存大模型输出，确认继续聊天后再依次放出，否则取消生成"""
+        buffered = []
+
+        def commit():
+            # 意图确认后才成为当前对话，接管打断状态和流式请求
+            self.client_abort = False
+            self.llm_stream = speculation.stream
+            self.llm_finish_task = False
+            self.dialogue.put(Message(role="user", content=query))
+            self._start_sentence()
+            self.logger.bind(tag=TAG).info(
+                f"推测执行生效，已缓存{len(buffered)}个片段，"
+                f"提前生成耗时: {time.monotonic() - speculation.start_time:.3f}s"
+            )
+
+        try:
+            for response in llm_responses:
+                if not speculation.decided:
+                    buffered.append(response)
+                    continue
+                if not speculation.committed:
+                    break
+                if buffered is not None:
+                    commit()
+                    yield from buffered
+                    buffered = None
+                yield response
+            if buffered is not None and speculation.wait():
+                commit()
+                yield from buffered
+        finally:
+            if not speculation.committed:
+                self.logger.bind(tag=TAG).info("意图不是继续聊天，取消推测执行的大模型生成")
+            # 关闭生成器，中断大模型的流式请求
+            close = getattr(llm_responses, "close", None)
+            if close is not None:
+                close()
+
+    def _accumulate_tool_call(self, function_calls, tool_call_delta):
+        """把一个流式片段累积到对应index的工具调用上"""
+        index = getattr(tool_call_delta, "index", None)
+        if index is None:
+            # 部分接口不返回index，以新的id区分不同的调用
+            index = len(function_calls) - 1
+            new_id = tool_call_delta.id
+            if index < 0 or (
+                new_id is not None
+                and function_calls[index]["id"] not in (None, new_id)
+            ):
+                index += 1
+        while len(function_calls) <= index:
+            function_calls.append({"name": None, "id": None, "arguments": ""})
+        function_call = function_calls[index]
+        if tool_call_delta.id is not None:
+            function_call["id"] = tool_call_delta.id
+        function = tool_call_delta.function
+        if function is not None:
+            if function.name is not None:
+                function_call["name"] = function.name
+            if function.arguments is not None:
+                function_call["arguments"] += function.arguments
+
+    def _dispatch_function_calls(self, function_calls, function_futures, end):
+        """在事件循环中开始执行前end个尚未提交的工具调用"""
+        for function_call in function_calls[len(function_futures) : end]:
+            if function_call["id"] is None:
+                function_call["id"] = str(uuid.uuid4().hex)
+            function_futures.append(
+                asyncio.run_coroutine_threadsafe(
+                    self.func_handler.handle_ordered_function_call(
+                        self, function_call
+                    ),
+                    self.loop,
+                )
+            )
+
+    def _handle_function_results(self, results, function_calls, depth):
+        """处理一轮中所有工具调用的结果，需要大模型继续处理时只请求一次"""
+        if len(function_calls) == 1 or not any(
+            result is not None and result.action == Action.REQLLM for result in results
+        ):
+            for result, function_call_data in zip(results, function_calls):
+                if result is not None:
+                    self._handle_function_result(result, function_call_data, depth)
+            return
+
+        self.dialogue.put(
+            Message(
+                role="assistant",
+                tool_calls=[
+                    {
+                        "id": function_call["id"],
+                        "function": {
+                            "arguments": function_call["arguments"] or "{}",
+                            "name": function_call["name"],
+                        },
+                        "type": "function",
+                        "index": index,
+                    }
+                    for index, function_call in enumerate(function_calls)
+                ],
+            )
+        )
+        # 每个调用都要有对应的tool消息，直接回复类的结果也交给大模型一并组织语言
+        texts = []
+        for result, function_call in zip(results, function_calls):
+            text = ""
+            if result is not None:
+                if result.action == Action.REQLLM:
+                    text = result.result
+                else:
+                    text = result.response or result.result
+            text = "" if text is None else str(text)
+            texts.append(text)
+            self.dialogue.put(
+                Message(role="tool", tool_call_id=function_call["id"], content=text)
+            )
+        self.chat("\n".join(texts), tool_call=True, depth=depth + 1)
+
     def _handle_function_result(self, result, function_call_data, depth):
         if result.action == Action.RESPONSE:  # 直接回复前端
             text = result.response
@@ -886,28 +1083,23 @@ class ConnectionHandler:
         else:
             pass
 
-    def _report_worker(self):
-        """聊天记录上报工作线程"""
-        while not self.stop_event.is_set():
-            try:
-                # 从队列获取数据，设置超时以便定期检查停止事件
-                item = self.report_queue.get(timeout=1)
+    async def _report_worker(self):
+        """聊天记录上报任务"""
+        try:
+            while not self.stop_event.is_set():
+                item = await self.report_queue.get()
                 if item is None:  # 检测毒丸对象
                     break
                 try:
                     # 检查线程池状态
                     if self.executor is None:
                         continue
-                    # 提交任务到线程池
+                    # 提交任务到线程池，不等待上报完成
                     self.executor.submit(self._process_report, *item)
                 except Exception as e:
-                    self.logger.bind(tag=TAG).error(f"聊天记录上报线程异常: {e}")
-            except queue.Empty:
-                continue
-            except Exception as e:
-                self.logger.bind(tag=TAG).error(f"聊天记录上报工作线程异常: {e}")
-
-        self.logger.bind(tag=TAG).info("聊天记录上报线程已退出")
+                    self.logger.bind(tag=TAG).error(f"聊天记录上报任务异常: {e}")
+        finally:
+            self.logger.bind(tag=TAG).info("聊天记录上报任务已退出")
 
     def _process_report(self, type, text, audio_data, report_time):
         """处理上报任务"""
@@ -916,9 +1108,6 @@ class ConnectionHandler:
             report(self, type, text, audio_data, report_time)
         except Exception as e:
             self.logger.bind(tag=TAG).error(f"上报处理异常: {e}")
-        finally:
-            # 标记任务完成
-            self.report_queue.task_done()
 
     def clearSpeakStatus(self):
         self.client_is_speaking = False
@@ -949,6 +1138,9 @@ class ConnectionHandler:
             if self.stop_event:
                 self.stop_event.set()
 
+            # 取消消化任务
+            self._cancel_pipeline_tasks()
+
             # 清空任务队列
             self.clear_queues()
 
@@ -991,15 +1183,17 @@ class ConnectionHandler:
             if self.tts:
                 await self.tts.close()
 
-            # 最后关闭线程池（避免阻塞）
-            if self.executor:
-                try:
-                    self.executor.shutdown(wait=False)
-                except Exception as executor_error:
-                    self.logger.bind(tag=TAG).error(
-                        f"关闭线程池时出错: {executor_error}"
-                    )
-                self.executor = None
+            if self.asr:
+                await self.asr.close_audio_channels(self)
+
+            # 归还VAD会话
+            if self.vad and self.vad_session:
+                self.vad.release_session(self.vad_session)
+                self.vad_session = None
+
+            # 线程池为所有连接共享，这里只解除引用，不关闭
+            self.executor = None
+            self.chat_executor = None
 
             self.logger.bind(tag=TAG).info("连接资源已释放")
         except Exception as e:
@@ -1009,6 +1203,15 @@ class ConnectionHandler:
             if self.stop_event:
                 self.stop_event.set()
 
+    def _cancel_pipeline_tasks(self):
+        """取消本连接的ASR、TTS和上报任务，当前正在执行的任务除外"""
+        current = asyncio.current_task()
+        for task in (self.asr_priority_task, self.report_task):
+            if task is not None and task is not current and not task.done():
+                task.cancel()
+        if self.tts:
+            self.tts.cancel_tasks()
+
     def clear_queues(self):
         """清空所有任务队列"""
         if self.tts:
@@ -1016,6 +1219,9 @@ class ConnectionHandler:
                 f"开始清理: TTS队列大小={self.tts.tts_text_queue.qsize()}, 音频队列大小={self.tts.tts_audio_queue.qsize()}"
             )
 
+            # 取消尚未播放的并行合成任务
+            self.tts.cancel_pending()
+
             # 使用非阻塞方式清空队列
             for q in [
                 self.tts.tts_text_queue,
@@ -1035,7 +1241,7 @@ class ConnectionHandler:
             )
 
     def reset_vad_states(self):
-        self.client_audio_buffer = bytearray()
+        self.client_audio_buffer.discard_pending()
         self.client_have_voice = False
         self.client_voice_stop = False
         self.logger.bind(tag=TAG).debug("VAD states reset.")
@@ -3,7 +3,7 @@ import json
 import random
 import asyncio
 from core.utils.dialogue import Message
-from core.utils.util import audio_to_data
+from core.utils.audio_assets import audio_assets
 from core.handle.sendAudioHandle import sendAudioMessage, send_stt_message
 from core.utils.util import remove_punctuation_and_length, opus_datas_to_wav_bytes
 from core.providers.tts.dto.dto import ContentType, SentenceType
@@ -83,7 +83,7 @@ async def checkWakeupWords(conn, text):
 
     # 播放唤醒词回复
     conn.client_abort = False
-    opus_packets, _ = audio_to_data(response.get("file_path"))
+    opus_packets = audio_assets.get(response.get("file_path"))
 
     conn.logger.bind(tag=TAG).info(f"播放唤醒词回复: {response.get('text')}")
     await sendAudioMessage(conn, SentenceType.FIRST, opus_packets, response.get("text"))
@@ -117,7 +117,7 @@ async def wakeupWordsResponse(conn):
             + "请勿对这条内容本身进行任何解释和回应，请勿返回表情符号，仅返回对用户的内容的回复。"
         )
 
-        result = conn.llm.response_no_stream(conn.config["prompt"], question)
+        result = await conn.llm.aresponse_no_stream(conn.config["prompt"], question)
         if not result or len(result) == 0:
             return
 
@@ -133,6 +133,8 @@ async def wakeupWordsResponse(conn):
         file_path = wakeup_words_config.generate_file_path(voice)
         with open(file_path, "wb") as f:
             f.write(wav_bytes)
+        # 已有编码好的数据，直接放入提示音缓存
+        audio_assets.put(file_path, tts_result)
         # 更新配置
         wakeup_words_config.update_wakeup_response(voice, file_path, result)
     finally:
@@ -1,4 +1,5 @@
 import json
+import time
 import asyncio
 import uuid
 from core.handle.sendAudioHandle import send_stt_message
@@ -35,7 +36,10 @@ async def handle_user_intent(conn, text):
         # 使用支持function calling的聊天方法,不再进行意图分析
         return False
     # 使用LLM进行意图分析
+    start_time = time.monotonic()
     intent_result = await analyze_intent_with_llm(conn, text)
+    if conn.turn_trace is not None:
+        conn.turn_trace.span("intent", start_time)
     if not intent_result:
         return False
     # 会话开始时生成sentence_id
@@ -80,8 +84,31 @@ async def process_intent_result(conn, intent_result, original_text):
         # 尝试将结果解析为JSON
         intent_data = json.loads(intent_result)
 
+        # 一句话包含多个指令，如"打开灯并且调高音量"，这些调用会并发执行
+        if "function_calls" in intent_data:
+            calls = [
+                call
+                for call in intent_data["function_calls"] or []
+                if call.get("name") and call["name"] != "continue_chat"
+            ]
+            if not calls:
+                return False
+            function_name = "+".join(call["name"] for call in calls)
+            conn.logger.bind(tag=TAG).debug(
+                f"检测到function_calls格式的意图结果: {function_name}"
+            )
+            function_call_data = {
+                "function_calls": [
+                    {
+                        "name": call["name"],
+                        "id": str(uuid.uuid4().hex),
+                        "arguments": call.get("arguments") or {},
+                    }
+                    for call in calls
+                ]
+            }
         # 检查是否有function_call
-        if "function_call" in intent_data:
+        elif "function_call" in intent_data:
             # 直接从意图识别获取了function_call
             conn.logger.bind(tag=TAG).debug(
                 f"检测到function_call格式的意图结果: {intent_data['function_call']['name']}"
@@ -104,60 +131,61 @@ async def process_intent_result(conn, intent_result, original_text):
                 "id": str(uuid.uuid4().hex),
                 "arguments": function_args,
             }
-
-            await send_stt_message(conn, original_text)
-            conn.client_abort = False
-
-            # 使用executor执行函数调用和结果处理
-            def process_function_call():
-                conn.dialogue.put(Message(role="user", content=original_text))
-
-                # 使用统一工具处理器处理所有工具调用
-                try:
-                    result = asyncio.run_coroutine_threadsafe(
-                        conn.func_handler.handle_llm_function_call(
-                            conn, function_call_data
-                        ),
-                        conn.loop,
-                    ).result()
-                except Exception as e:
-                    conn.logger.bind(tag=TAG).error(f"工具调用失败: {e}")
-                    result = ActionResponse(
-                        action=Action.ERROR, result=str(e), response=str(e)
-                    )
-
-                if result:
-                    if result.action == Action.RESPONSE:  # 直接回复前端
-                        text = result.response
-                        if text is not None:
-                            speak_txt(conn, text)
-                    elif result.action == Action.REQLLM:  # 调用函数后再请求llm生成回复
+        else:
+            return False
+
+        await send_stt_message(conn, original_text)
+        conn.client_abort = False
+
+        # 使用executor执行函数调用和结果处理
+        def process_function_call():
+            conn.dialogue.put(Message(role="user", content=original_text))
+
+            # 使用统一工具处理器处理所有工具调用
+            try:
+                result = asyncio.run_coroutine_threadsafe(
+                    conn.func_handler.handle_llm_function_call(
+                        conn, function_call_data
+                    ),
+                    conn.loop,
+                ).result()
+            except Exception as e:
+                conn.logger.bind(tag=TAG).error(f"工具调用失败: {e}")
+                result = ActionResponse(
+                    action=Action.ERROR, result=str(e), response=str(e)
+                )
+
+            if result:
+                if result.action == Action.RESPONSE:  # 直接回复前端
+                    text = result.response
+                    if text is not None:
+                        speak_txt(conn, text)
+                elif result.action == Action.REQLLM:  # 调用函数后再请求llm生成回复
+                    text = result.result
+                    conn.dialogue.put(Message(role="tool", content=text))
+                    llm_result = conn.intent.replyResult(text, original_text)
+                    if llm_result is None:
+                        llm_result = text
+                    speak_txt(conn, llm_result)
+                elif (
+                    result.action == Action.NOTFOUND
+                    or result.action == Action.ERROR
+                ):
+                    text = result.result
+                    if text is not None:
+                        speak_txt(conn, text)
+                elif function_name != "play_music":
+                    # For backward compatibility with original code
+                    # 获取当前最新的文本索引
+                    text = result.response
+                    if text is None:
                         text = result.result
-                        conn.dialogue.put(Message(role="tool", content=text))
-                        llm_result = conn.intent.replyResult(text, original_text)
-                        if llm_result is None:
-                            llm_result = text
-                        speak_txt(conn, llm_result)
-                    elif (
-                        result.action == Action.NOTFOUND
-                        or result.action == Action.ERROR
-                    ):
-                        text = result.result
-                        if text is not None:
-                            speak_txt(conn, text)
-                    elif function_name != "play_music":
-                        # For backward compatibility with original code
-                        # 获取当前最新的文本索引
-                        text = result.response
-                        if text is None:
-                            text = result.result
-                        if text is not None:
-                            speak_txt(conn, text)
-
-            # 将函数执行放在线程池中
-            conn.executor.submit(process_function_call)
-            return True
-        return False
+                    if text is not None:
+                        speak_txt(conn, text)
+
+        # 将函数执行放在对话线程池中
+        conn.chat_executor.submit(process_function_call)
+        return True
     except json.JSONDecodeError as e:
         conn.logger.bind(tag=TAG).error(f"处理意图结果时出错: {e}")
         return False
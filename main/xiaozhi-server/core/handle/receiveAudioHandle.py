@@ -6,14 +6,15 @@ import time
 import asyncio
 import json
 from core.handle.sendAudioHandle import SentenceType
-from core.utils.util import audio_to_data
+from core.utils.audio_assets import audio_assets
+from core.utils.speculation import SpeculativeTurn
 
 TAG = __name__
 
 
 async def handleAudioMessage(conn, audio):
     # 当前片段是否有人说话
-    have_voice = conn.vad.is_vad(conn, audio)
+    have_voice = await conn.vad.is_vad_async(conn, audio)
     # 如果设备刚刚被唤醒，短暂忽略VAD检测
     if have_voice and hasattr(conn, "just_woken_up") and conn.just_woken_up:
         have_voice = False
@@ -78,16 +79,33 @@ async def startToChat(conn, text):
     if conn.client_is_speaking:
         await handleAbortMessage(conn)
 
-    # 首先进行意图分析，使用实际文本内容
-    intent_handled = await handle_user_intent(conn, actual_text)
+    # 推测执行：意图识别的同时启动聊天大模型，输出先缓存不播报
+    speculation = None
+    if conn.intent_type == "intent_llm" and conn.speculative_chat:
+        speculation = SpeculativeTurn()
+        conn.chat_executor.submit(conn.chat, actual_text, speculation=speculation)
 
-    if intent_handled:
-        # 如果意图已被处理，不再进行聊天
-        return
+    try:
+        # 首先进行意图分析，使用实际文本内容
+        intent_handled = await handle_user_intent(conn, actual_text)
+
+        if intent_handled:
+            # 如果意图已被处理，不再进行聊天，推测执行在finally中取消
+            return
 
-    # 意图未被处理，继续常规聊天流程，使用实际文本内容
-    await send_stt_message(conn, actual_text)
-    conn.executor.submit(conn.chat, actual_text)
+        # 意图未被处理，继续常规聊天流程，使用实际文本内容
+        await send_stt_message(conn, actual_text)
+        if speculation is not None:
+            speculation.commit()
+        else:
+            conn.chat_executor.submit(conn.chat, actual_text)
+    finally:
+        # 未确认继续聊天（意图已处理或识别出错）时取消推测执行，不让它等到超时
+        if speculation is not None:
+            speculation.rollback()
+            # 同时关闭推测执行的流式请求，上游立即停止生成，不等下一个片段到达
+            if not speculation.committed and speculation.stream is not None:
+                conn.close_llm_stream(speculation.stream)
 
 
 async def no_voice_close_connect(conn, have_voice):
@@ -121,7 +139,7 @@ async def max_out_size(conn):
     text = "不好意思，我现在有点事情要忙，明天这个时候我们再聊，约好了哦！明天不见不散，拜拜！"
     await send_stt_message(conn, text)
     file_path = "config/assets/max_output_size.wav"
-    opus_packets, _ = audio_to_data(file_path)
+    opus_packets = audio_assets.get(file_path)
     conn.tts.tts_audio_queue.put((SentenceType.LAST, opus_packets, text))
     conn.close_after_chat = True
 
@@ -140,7 +158,7 @@ async def check_bind_device(conn):
 
         # 播放提示音
         music_path = "config/assets/bind_code.wav"
-        opus_packets, _ = audio_to_data(music_path)
+        opus_packets = audio_assets.get(music_path)
         conn.tts.tts_audio_queue.put((SentenceType.FIRST, opus_packets, text))
 
         # 逐个播放数字
@@ -148,7 +166,7 @@ async def check_bind_device(conn):
             try:
                 digit = conn.bind_code[i]
                 num_path = f"config/assets/bind_code/{digit}.wav"
-                num_packets, _ = audio_to_data(num_path)
+                num_packets = audio_assets.get(num_path)
                 conn.tts.tts_audio_queue.put((SentenceType.MIDDLE, num_packets, None))
             except Exception as e:
                 conn.logger.bind(tag=TAG).error(f"播放数字音频失败: {e}")
@@ -158,5 +176,5 @@ async def check_bind_device(conn):
         text = f"没有找到该设备的版本信息，请正确配置 OTA地址，然后重新编译固件。"
         await send_stt_message(conn, text)
         music_path = "config/assets/bind_not_found.wav"
-        opus_packets, _ = audio_to_data(music_path)
+        opus_packets = audio_assets.get(music_path)
         conn.tts.tts_audio_queue.put((SentenceType.LAST, opus_packets, text))
@@ -14,6 +14,7 @@ import time
 import opuslib_next
 
 from config.manage_api_client import report as manage_report
+from core.utils.audio_buffer import AudioFrames
 
 TAG = __name__
 
@@ -56,15 +57,18 @@ def opus_to_wav(conn, opus_data):
     Returns:
         bytes: WAV格式的音频数据
     """
-    decoder = opuslib_next.Decoder(16000, 1)  # 16kHz, 单声道
     pcm_data = []
-
-    for opus_packet in opus_data:
-        try:
-            pcm_frame = decoder.decode(opus_packet, 960)  # 960 samples = 60ms
-            pcm_data.append(pcm_frame)
-        except opuslib_next.OpusError as e:
-            conn.logger.bind(tag=TAG).error(f"Opus解码错误: {e}", exc_info=True)
+    if isinstance(opus_data, AudioFrames) and opus_data.pcm:
+        # ASR阶段已解码过的语音直接复用
+        pcm_data.append(opus_data.pcm)
+    else:
+        decoder = opuslib_next.Decoder(16000, 1)  # 16kHz, 单声道
+        for opus_packet in opus_data:
+            try:
+                pcm_frame = decoder.decode(opus_packet, 960)  # 960 samples = 60ms
+                pcm_data.append(pcm_frame)
+            except opuslib_next.OpusError as e:
+                conn.logger.bind(tag=TAG).error(f"Opus解码错误: {e}", exc_info=True)
 
     if not pcm_data:
         raise ValueError("没有有效的PCM数据")
@@ -3,6 +3,8 @@ import asyncio
 import time
 from core.providers.tts.dto.dto import SentenceType
 from core.utils import textUtils
+from core.utils.turn_trace import turn_tracer
+from core.utils.audio_assets import audio_assets
 
 TAG = __name__
 
@@ -19,10 +21,23 @@ async def sendAudioMessage(conn, sentenceType, audios, text):
 
     await send_tts_message(conn, "sentence_start", text)
 
+    trace = conn.turn_trace
+    if trace is not None and audios and not trace.has("first_audio_sent"):
+        # 从用户说完话到发出第一帧音频的耗时
+        trace.mark("first_audio_sent")
+        conn.logger.bind(tag=TAG).info(
+            f"首帧音频延迟(TTFA): {trace.elapsed('first_audio_sent'):.3f}s"
+        )
+
     await sendAudio(conn, audios, pre_buffer)
 
     # 发送结束消息（如果是最后一个文本）
     if conn.llm_finish_task and sentenceType == SentenceType.LAST:
+        if trace is not None:
+            trace.mark("last_frame")
+            trace.sentence_id = conn.sentence_id
+            turn_tracer.finish_turn(trace)
+            conn.turn_trace = None
         await send_tts_message(conn, "stop", None)
         conn.client_is_speaking = False
         if conn.close_after_chat:
@@ -81,7 +96,7 @@ async def send_tts_message(conn, state, text=None):
             stop_tts_notify_voice = conn.config.get(
                 "stop_tts_notify_voice", "config/assets/tts_notify.mp3"
             )
-            audios, _ = conn.tts.audio_to_opus_data(stop_tts_notify_voice)
+            audios = audio_assets.get(stop_tts_notify_voice)
             await sendAudio(conn, audios)
         # 清除服务端讲话状态
         conn.clearSpeakStatus()
@@ -90,6 +105,14 @@ async def send_tts_message(conn, state, text=None):
     await conn.websocket.send(json.dumps(message))
 
 
+async def send_stt_partial_message(conn, text):
+    """发送识别中间结果，仅用于设备显示，不改变播报状态"""
+    stt_text = textUtils.get_string_no_punctuation_or_emoji(text)
+    await conn.websocket.send(
+        json.dumps({"type": "stt", "text": stt_text, "session_id": conn.session_id})
+    )
+
+
 async def send_stt_message(conn, text):
     end_prompt_str = conn.config.get("end_prompt", {}).get("prompt")
     if end_prompt_str and end_prompt_str == text:
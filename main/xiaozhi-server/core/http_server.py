@@ -3,6 +3,8 @@ from aiohttp import web
 from config.logger import setup_logging
 from core.api.ota_handler import OTAHandler
 from core.api.vision_handler import VisionHandler
+from core.utils.turn_trace import turn_tracer
+from core.utils.intent_cache import intent_cache
 
 TAG = __name__
 
@@ -32,6 +34,14 @@ class SimpleHttpServer:
         else:
             return f"ws://{local_ip}:{port}/xiaozhi/v1/"
 
+    async def handle_metrics(self, request):
+        """输出Prometheus格式的单轮对话耗时和意图缓存指标"""
+        return web.Response(
+            text=turn_tracer.render_prometheus() + intent_cache.render_prometheus(),
+            content_type="text/plain",
+            charset="utf-8",
+        )
+
     async def start(self):
         server_config = self.config["server"]
         host = server_config.get("ip", "0.0.0.0")
@@ -57,6 +67,7 @@ class SimpleHttpServer:
                     web.get("/mcp/vision/explain", self.vision_handler.handle_get),
                     web.post("/mcp/vision/explain", self.vision_handler.handle_post),
                     web.options("/mcp/vision/explain", self.vision_handler.handle_post),
+                    web.get("/xiaozhi/metrics", self.handle_metrics),
                 ]
             )
 
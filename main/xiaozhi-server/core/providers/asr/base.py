@@ -1,26 +1,31 @@
 import os
 import wave
 import uuid
-import queue
 import asyncio
 import traceback
-import threading
 import opuslib_next
+import numpy as np
 import json
 import io
 import time
-import concurrent.futures
 from abc import ABC, abstractmethod
 from config.logger import setup_logging
 from typing import Optional, Tuple, List, Dict, Any
 from core.handle.receiveAudioHandle import startToChat
 from core.handle.reportHandle import enqueue_asr_report
 from core.utils.util import remove_punctuation_and_length
+from core.utils.audio_buffer import AudioFrames
+from core.utils.turn_trace import turn_tracer
+from core.utils.executor import run_blocking
 from core.handle.receiveAudioHandle import handleAudioMessage
 
 TAG = __name__
 logger = setup_logging()
 
+# 未检测到声音时保留的音频包数，以及对应的PCM采样点数（每包60ms）
+ASR_PREROLL_PACKETS = 10
+ASR_PREROLL_SAMPLES = ASR_PREROLL_PACKETS * 960
+
 
 class ASRProviderBase(ABC):
     def __init__(self):
@@ -28,23 +33,22 @@ class ASRProviderBase(ABC):
 
     # 打开音频通道
     async def open_audio_channels(self, conn):
-        conn.asr_priority_thread = threading.Thread(
-            target=self.asr_text_priority_thread, args=(conn,), daemon=True
+        conn.asr_priority_task = asyncio.create_task(
+            self.asr_text_priority_task(conn)
         )
-        conn.asr_priority_thread.start()
+
+    # 关闭音频通道，释放为该连接保留的资源
+    async def close_audio_channels(self, conn):
+        pass
 
     # 有序处理ASR音频
-    def asr_text_priority_thread(self, conn):
+    async def asr_text_priority_task(self, conn):
         while not conn.stop_event.is_set():
             try:
-                message = conn.asr_audio_queue.get(timeout=1)
-                future = asyncio.run_coroutine_threadsafe(
-                    handleAudioMessage(conn, message),
-                    conn.loop,
-                )
-                future.result()
-            except queue.Empty:
-                continue
+                message = await conn.asr_audio_queue.get()
+                await handleAudioMessage(conn, message)
+            except asyncio.CancelledError:
+                raise
             except Exception as e:
                 logger.bind(tag=TAG).error(
                     f"处理ASR文本失败: {str(e)}, 类型: {type(e).__name__}, 堆栈: {traceback.format_exc()}"
@@ -60,17 +64,39 @@ class ASRProviderBase(ABC):
         
         conn.asr_audio.append(audio)
         if not have_voice and not conn.client_have_voice:
-            conn.asr_audio = conn.asr_audio[-10:]
+            conn.asr_audio = conn.asr_audio[-ASR_PREROLL_PACKETS:]
+            # VAD解码出的PCM同步保留相同长度的前置音频
+            conn.client_audio_buffer.retain_tail(ASR_PREROLL_SAMPLES)
             return
+        if not conn.client_audio_buffer.retaining:
+            conn.client_audio_buffer.retain_tail(ASR_PREROLL_SAMPLES)
 
         if conn.client_voice_stop:
-            asr_audio_task = conn.asr_audio.copy()
+            self._start_turn_trace(conn)
+            # 音频包和VAD阶段已解码的PCM一起交给ASR、声纹识别和上报使用
+            truncated = conn.client_audio_buffer.retained_truncated
+            pcm = conn.client_audio_buffer.take_retained()
+            if truncated:
+                # 语音超过缓冲区容量，开头的PCM已被丢弃，改为解码全部音频包
+                pcm = b""
+            if conn.audio_format == "pcm":
+                pcm = b"".join(conn.asr_audio)
+            asr_audio_task = AudioFrames(conn.asr_audio, pcm)
             conn.asr_audio.clear()
             conn.reset_vad_states()
 
             if len(asr_audio_task) > 15:
                 await self.handle_voice_stop(conn, asr_audio_task)
 
+    def _start_turn_trace(self, conn):
+        """用户说完话，开始新一轮的耗时追踪，上一轮未结束的一并记录"""
+        turn_tracer.finish_turn(conn.turn_trace)
+        conn.turn_trace = turn_tracer.start_turn(conn.session_id)
+        if conn.turn_trace is not None:
+            now = time.monotonic()
+            silence = max(time.time() * 1000 - conn.last_activity_time, 0) / 1000
+            conn.turn_trace.span("vad_endpoint", now - silence, now)
+
     # 处理语音停止
     async def handle_voice_stop(self, conn, asr_audio_task: List[bytes]):
         """并行处理ASR和声纹识别"""
@@ -92,64 +118,62 @@ class ASRProviderBase(ABC):
                 wav_data = self._pcm_to_wav(combined_pcm_data)
             
             
-            # 定义ASR任务
-            def run_asr():
-                start_time = time.monotonic()
-                try:
-                    loop = asyncio.new_event_loop()
-                    asyncio.set_event_loop(loop)
+            if getattr(self, "batch_scheduler", None) is not None:
+                # 本地ASR由进程级调度器批量识别，直接在当前事件循环中等待，无需额外线程
+                results = await self._recognize_in_loop(conn, asr_audio_task, wav_data)
+            else:
+                # 定义ASR任务
+                def run_asr():
+                    start_time = time.monotonic()
                     try:
-                        result = loop.run_until_complete(
-                            self.speech_to_text(asr_audio_task, conn.session_id, conn.audio_format)
-                        )
+                        loop = asyncio.new_event_loop()
+                        asyncio.set_event_loop(loop)
+                        try:
+                            result = loop.run_until_complete(
+                                self.speech_to_text(asr_audio_task, conn.session_id, conn.audio_format)
+                            )
+                            end_time = time.monotonic()
+                            logger.bind(tag=TAG).info(f"ASR耗时: {end_time - start_time:.3f}s")
+                            if conn.turn_trace is not None:
+                                conn.turn_trace.span("asr", start_time, end_time)
+                            return result
+                        finally:
+                            loop.close()
+                    except Exception as e:
                         end_time = time.monotonic()
-                        logger.bind(tag=TAG).info(f"ASR耗时: {end_time - start_time:.3f}s")
-                        return result
-                    finally:
-                        loop.close()
-                except Exception as e:
-                    end_time = time.monotonic()
-                    logger.bind(tag=TAG).error(f"ASR失败: {e}")
-                    return ("", None)
+                        logger.bind(tag=TAG).error(f"ASR失败: {e}")
+                        return ("", None)
             
-            # 定义声纹识别任务
-            def run_voiceprint():
-                if not wav_data:
-                    return None
-                try:
-                    loop = asyncio.new_event_loop()
-                    asyncio.set_event_loop(loop)
+                # 定义声纹识别任务
+                def run_voiceprint():
+                    if not wav_data:
+                        return None
+                    start_time = time.monotonic()
                     try:
-                        # 使用连接的声纹识别提供者
-                        result = loop.run_until_complete(
-                            conn.voiceprint_provider.identify_speaker(wav_data, conn.session_id)
-                        )
-                        return result
-                    finally:
-                        loop.close()
-                except Exception as e:
-                    logger.bind(tag=TAG).error(f"声纹识别失败: {e}")
-                    return None
-            
-            # 使用线程池执行器并行运行
-            parallel_start_time = time.monotonic()
-            
-            with concurrent.futures.ThreadPoolExecutor(max_workers=2) as thread_executor:
-                asr_future = thread_executor.submit(run_asr)
-                
-                if conn.voiceprint_provider and wav_data:
-                    voiceprint_future = thread_executor.submit(run_voiceprint)
-                    
-                    # 等待两个线程都完成
-                    asr_result = asr_future.result(timeout=15)
-                    voiceprint_result = voiceprint_future.result(timeout=15)
-                    
-                    results = {"asr": asr_result, "voiceprint": voiceprint_result}
-                else:
-                    asr_result = asr_future.result(timeout=15)
-                    results = {"asr": asr_result, "voiceprint": None}
-            
+                        loop = asyncio.new_event_loop()
+                        asyncio.set_event_loop(loop)
+                        try:
+                            # 使用连接的声纹识别提供者
+                            result = loop.run_until_complete(
+                                conn.voiceprint_provider.identify_speaker(wav_data, conn.session_id)
+                            )
+                            if conn.turn_trace is not None:
+                                conn.turn_trace.span("voiceprint", start_time)
+                            return result
+                        finally:
+                            loop.close()
+                    except Exception as e:
+                        logger.bind(tag=TAG).error(f"声纹识别失败: {e}")
+                        return None
             
+                # 在共享线程池中并行运行，事件循环只等待结果，不被阻塞
+                asr_result, voiceprint_result = await asyncio.wait_for(
+                    asyncio.gather(run_blocking(run_asr), run_blocking(run_voiceprint)),
+                    timeout=15,
+                )
+                results = {"asr": asr_result, "voiceprint": voiceprint_result}
+
+
             # 处理结果
             raw_text, file_path = results.get("asr", ("", None))
             speaker_name = results.get("voiceprint", None)
@@ -168,7 +192,11 @@ class ASRProviderBase(ABC):
             text_len, _ = remove_punctuation_and_length(raw_text)
             self.stop_ws_connection()
             
-            if text_len > 0:
+            if text_len == 0:
+                # 没有识别出文字，本轮不会有回复
+                turn_tracer.finish_turn(conn.turn_trace)
+                conn.turn_trace = None
+            else:
                 # 构建包含说话人信息的JSON字符串
                 enhanced_text = self._build_enhanced_text(raw_text, speaker_name)
                 
@@ -181,6 +209,43 @@ class ASRProviderBase(ABC):
             import traceback
             logger.bind(tag=TAG).debug(f"异常详情: {traceback.format_exc()}")
 
+    async def _recognize_in_loop(self, conn, asr_audio_task, wav_data):
+        """在当前事件循环中并行等待ASR和声纹识别"""
+
+        async def run_asr():
+            start_time = time.monotonic()
+            try:
+                result = await self.speech_to_text(
+                    asr_audio_task, conn.session_id, conn.audio_format
+                )
+                logger.bind(tag=TAG).info(f"ASR耗时: {time.monotonic() - start_time:.3f}s")
+                if conn.turn_trace is not None:
+                    conn.turn_trace.span("asr", start_time)
+                return result
+            except Exception as e:
+                logger.bind(tag=TAG).error(f"ASR失败: {e}")
+                return ("", None)
+
+        async def run_voiceprint():
+            if not conn.voiceprint_provider or not wav_data:
+                return None
+            start_time = time.monotonic()
+            try:
+                result = await conn.voiceprint_provider.identify_speaker(
+                    wav_data, conn.session_id
+                )
+                if conn.turn_trace is not None:
+                    conn.turn_trace.span("voiceprint", start_time)
+                return result
+            except Exception as e:
+                logger.bind(tag=TAG).error(f"声纹识别失败: {e}")
+                return None
+
+        asr_result, voiceprint_result = await asyncio.wait_for(
+            asyncio.gather(run_asr(), run_voiceprint()), timeout=15
+        )
+        return {"asr": asr_result, "voiceprint": voiceprint_result}
+
     def _build_enhanced_text(self, text: str, speaker_name: Optional[str]) -> str:
         """构建包含说话人信息的文本"""
         if speaker_name and speaker_name.strip():
@@ -242,9 +307,18 @@ class ASRProviderBase(ABC):
         """将语音数据转换为文本"""
         pass
 
+    @staticmethod
+    def pcm_to_float32(pcm_data: List[bytes]) -> np.ndarray:
+        """将16位PCM数据转换为归一化到[-1, 1]的float32数组，供本地模型直接使用"""
+        samples_int16 = np.frombuffer(b"".join(pcm_data), dtype=np.int16)
+        return np.multiply(samples_int16, 1.0 / 32768.0, dtype=np.float32)
+
     @staticmethod
     def decode_opus(opus_data: List[bytes]) -> List[bytes]:
         """将Opus音频数据解码为PCM数据"""
+        # VAD阶段已经解码过的语音直接复用
+        if isinstance(opus_data, AudioFrames) and opus_data.pcm:
+            return [opus_data.pcm]
         try:
             decoder = opuslib_next.Decoder(16000, 1)
             pcm_data = []
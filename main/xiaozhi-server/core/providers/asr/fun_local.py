@@ -1,11 +1,15 @@
 import time
 import os
+import asyncio
 import sys
 import io
 import psutil
+import numpy as np
 from config.logger import setup_logging
 from typing import Optional, Tuple, List
 from core.providers.asr.base import ASRProviderBase
+from core.utils.asr_scheduler import ASRBatchScheduler
+from core.utils.executor import run_blocking
 from funasr import AutoModel
 from funasr.utils.postprocess_utils import rich_transcription_postprocess
 import shutil
@@ -50,8 +54,9 @@ class ASRProvider(ASRProviderBase):
         self.output_dir = config.get("output_dir")  # 修正配置键名
         self.delete_audio_file = delete_audio_file
 
-        # 确保输出目录存在
-        os.makedirs(self.output_dir, exist_ok=True)
+        # 保留音频文件时才需要输出目录
+        if not self.delete_audio_file:
+            os.makedirs(self.output_dir, exist_ok=True)
         with CaptureOutput():
             self.model = AutoModel(
                 model=self.model_dir,
@@ -61,6 +66,44 @@ class ASRProvider(ASRProviderBase):
                 # device="cuda:0",  # 启用GPU加速
             )
 
+        # 所有连接共享的批量识别调度器
+        self.batch_scheduler = ASRBatchScheduler(
+            self.recognize_batch,
+            max_batch_size=config.get("batch_max_size") or 8,
+            max_wait_ms=config.get("batch_max_wait_ms") or 10,
+        )
+
+    def recognize(self, samples: np.ndarray) -> str:
+        """直接识别内存中的float32音频"""
+        result = self.model.generate(
+            input=samples,
+            cache={},
+            language="auto",
+            use_itn=True,
+            batch_size_s=60,
+        )
+        return rich_transcription_postprocess(result[0]["text"])
+
+    def recognize_batch(self, samples_list: List[np.ndarray]) -> List[str]:
+        """一次推理多段音频，结果与输入顺序一致"""
+        if len(samples_list) == 1:
+            return [self.recognize(samples_list[0])]
+        results = self.model.generate(
+            input=samples_list,
+            cache={},
+            language="auto",
+            use_itn=True,
+            batch_size_s=60,
+        )
+        return [rich_transcription_postprocess(result["text"]) for result in results]
+
+    def _save_debug_audio(self, pcm_data: List[bytes], session_id: str) -> str:
+        """检查磁盘空间并保存音频文件，在线程池中执行"""
+        free_space = shutil.disk_usage(self.output_dir).free
+        if free_space < sum(len(pcm) for pcm in pcm_data) * 2:  # 预留2倍空间
+            raise OSError("磁盘空间不足")
+        return self.save_audio_to_file(pcm_data, session_id)
+
     async def speech_to_text(
         self, opus_data: List[bytes], session_id: str, audio_format="opus"
     ) -> Tuple[Optional[str], Optional[str]]:
@@ -76,30 +119,17 @@ class ASRProvider(ASRProviderBase):
                 else:
                     pcm_data = self.decode_opus(opus_data)
 
-                combined_pcm_data = b"".join(pcm_data)
-
-                # 检查磁盘空间
-                if not self.delete_audio_file:
-                    free_space = shutil.disk_usage(self.output_dir).free
-                    if free_space < len(combined_pcm_data) * 2:  # 预留2倍空间
-                        raise OSError("磁盘空间不足")
-
-                # 判断是否保存为WAV文件
-                if self.delete_audio_file:
-                    pass
-                else:
-                    file_path = self.save_audio_to_file(pcm_data, session_id)
+                # 仅在不删除音频时保存文件，便于调试；识别本身不经过磁盘
+                if not self.delete_audio_file and file_path is None:
+                    file_path = await run_blocking(
+                        self._save_debug_audio, pcm_data, session_id
+                    )
 
                 # 语音识别
                 start_time = time.time()
-                result = self.model.generate(
-                    input=combined_pcm_data,
-                    cache={},
-                    language="auto",
-                    use_itn=True,
-                    batch_size_s=60,
+                text = await self.batch_scheduler.submit(
+                    self.pcm_to_float32(pcm_data)
                 )
-                text = rich_transcription_postprocess(result[0]["text"])
                 logger.bind(tag=TAG).debug(
                     f"语音识别耗时: {time.time() - start_time:.3f}s | 结果: {text}"
                 )
@@ -116,19 +146,8 @@ class ASRProvider(ASRProviderBase):
                 logger.bind(tag=TAG).warning(
                     f"语音识别失败，正在重试（{retry_count}/{MAX_RETRIES}）: {e}"
                 )
-                time.sleep(RETRY_DELAY)
+                await asyncio.sleep(RETRY_DELAY)
 
             except Exception as e:
                 logger.bind(tag=TAG).error(f"语音识别失败: {e}", exc_info=True)
                 return "", file_path
-
-            finally:
-                # 文件清理逻辑
-                if self.delete_audio_file and file_path and os.path.exists(file_path):
-                    try:
-                        os.remove(file_path)
-                        logger.bind(tag=TAG).debug(f"已删除临时音频文件: {file_path}")
-                    except Exception as e:
-                        logger.bind(tag=TAG).error(
-                            f"文件删除失败: {file_path} | 错误: {e}"
-                        )
@@ -7,6 +7,7 @@ from config.logger import setup_logging
 from typing import Optional, Tuple, List
 from core.providers.asr.dto.dto import InterfaceType
 from core.providers.asr.base import ASRProviderBase
+from core.utils.asr_scheduler import ASRBatchScheduler
 
 import numpy as np
 import sherpa_onnx
@@ -43,8 +44,9 @@ class ASRProvider(ASRProviderBase):
         self.model_type = config.get("model_type", "sense_voice")  # 支持 paraformer
         self.delete_audio_file = delete_audio_file
 
-        # 确保输出目录存在
-        os.makedirs(self.output_dir, exist_ok=True)
+        # 保留音频文件时才需要输出目录
+        if not self.delete_audio_file:
+            os.makedirs(self.output_dir, exist_ok=True)
 
         # 初始化模型文件路径
         model_files = {
@@ -96,6 +98,13 @@ class ASRProvider(ASRProviderBase):
                     use_itn=True,
                 )
 
+        # 所有连接共享的批量识别调度器
+        self.batch_scheduler = ASRBatchScheduler(
+            self.recognize_batch,
+            max_batch_size=config.get("batch_max_size") or 8,
+            max_wait_ms=config.get("batch_max_wait_ms") or 10,
+        )
+
     def read_wave(self, wave_filename: str) -> Tuple[np.ndarray, int]:
         """
         Args:
@@ -120,30 +129,41 @@ class ASRProvider(ASRProviderBase):
             samples_float32 = samples_float32 / 32768
             return samples_float32, f.getframerate()
 
+    def recognize(self, samples: np.ndarray, sample_rate: int = 16000) -> str:
+        """直接识别内存中的float32音频"""
+        s = self.model.create_stream()
+        s.accept_waveform(sample_rate, samples)
+        self.model.decode_stream(s)
+        return s.result.text
+
+    def recognize_batch(self, samples_list: List[np.ndarray]) -> List[str]:
+        """一次解码多段音频"""
+        streams = []
+        for samples in samples_list:
+            s = self.model.create_stream()
+            s.accept_waveform(16000, samples)
+            streams.append(s)
+        self.model.decode_streams(streams)
+        return [s.result.text for s in streams]
+
     async def speech_to_text(
         self, opus_data: List[bytes], session_id: str, audio_format="opus"
     ) -> Tuple[Optional[str], Optional[str]]:
         """语音转文本主处理逻辑"""
         file_path = None
         try:
-            # 保存音频文件
-            start_time = time.time()
             if audio_format == "pcm":
                 pcm_data = opus_data
             else:
                 pcm_data = self.decode_opus(opus_data)
-            file_path = self.save_audio_to_file(pcm_data, session_id)
-            logger.bind(tag=TAG).debug(
-                f"音频文件保存耗时: {time.time() - start_time:.3f}s | 路径: {file_path}"
-            )
+
+            # 仅在不删除音频时保存文件，便于调试；识别本身不经过磁盘
+            if not self.delete_audio_file:
+                file_path = self.save_audio_to_file(pcm_data, session_id)
 
             # 语音识别
             start_time = time.time()
-            s = self.model.create_stream()
-            samples, sample_rate = self.read_wave(file_path)
-            s.accept_waveform(sample_rate, samples)
-            self.model.decode_stream(s)
-            text = s.result.text
+            text = await self.batch_scheduler.submit(self.pcm_to_float32(pcm_data))
             logger.bind(tag=TAG).debug(
                 f"语音识别耗时: {time.time() - start_time:.3f}s | 结果: {text}"
             )
@@ -153,11 +173,3 @@ class ASRProvider(ASRProviderBase):
         except Exception as e:
             logger.bind(tag=TAG).error(f"语音识别失败: {e}", exc_info=True)
             return "", file_path
-        finally:
-            # 文件清理逻辑
-            if self.delete_audio_file and file_path and os.path.exists(file_path):
-                try:
-                    os.remove(file_path)
-                    logger.bind(tag=TAG).debug(f"已删除临时音频文件: {file_path}")
-                except Exception as e:
-                    logger.bind(tag=TAG).error(f"文件删除失败: {file_path} | 错误: {e}")
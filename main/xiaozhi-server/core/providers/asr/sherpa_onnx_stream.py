@@ -0,0 +1,213 @@
+import time
+import os
+import sys
+import io
+from config.logger import setup_logging
+from typing import Optional, Tuple, List
+from core.providers.asr.dto.dto import InterfaceType
+from core.providers.asr.base import ASRProviderBase, ASR_PREROLL_SAMPLES
+from core.handle.sendAudioHandle import send_stt_partial_message
+from core.utils.executor import run_blocking
+
+import numpy as np
+import sherpa_onnx
+
+TAG = __name__
+logger = setup_logging()
+
+# 结束识别前补充的静音时长，让模型输出最后几个字
+TAIL_PADDING_SAMPLES = int(16000 * 0.3)
+
+
+# 捕获标准输出
+class CaptureOutput:
+    def __enter__(self):
+        self._output = io.StringIO()
+        self._original_stdout = sys.stdout
+        sys.stdout = self._output
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        sys.stdout = self._original_stdout
+        self.output = self._output.getvalue()
+        self._output.close()
+
+        # 将捕获到的内容通过 logger 输出
+        if self.output:
+            logger.bind(tag=TAG).info(self.output.strip())
+
+
+class OnlineStreamState:
+    """单个连接正在识别的流，以及已送入的PCM位置"""
+
+    def __init__(self, stream, position: int):
+        self.stream = stream
+        self.position = position
+        self.text = ""
+
+
+class ASRProvider(ASRProviderBase):
+    """Sherpa-ONNX 本地流式识别
+
+    识别器由所有连接共享，每个连接说话期间持有一个独立的流。
+    音频边接收边送入流中解码，VAD判定说话结束时只需处理最后一小段音频。
+    """
+
+    def __init__(self, config: dict, delete_audio_file: bool):
+        super().__init__()
+        self.interface_type = InterfaceType.LOCAL
+        self.model_dir = config.get("model_dir")
+        self.output_dir = config.get("output_dir")
+        self.model_type = config.get("model_type", "zipformer")  # 支持 paraformer
+        self.delete_audio_file = delete_audio_file
+        self.partial_result = str(config.get("partial_result", True)).lower() in (
+            "true",
+            "1",
+            "yes",
+        )
+        # 流式识别不经过批量调度
+        self.batch_scheduler = None
+        # session_id -> OnlineStreamState
+        self.streams = {}
+
+        # 保留音频文件时才需要输出目录
+        if not self.delete_audio_file:
+            os.makedirs(self.output_dir, exist_ok=True)
+
+        model_files = {
+            "tokens": os.path.join(
+                self.model_dir, config.get("tokens", "tokens.txt")
+            ),
+            "encoder": os.path.join(
+                self.model_dir, config.get("encoder", "encoder.onnx")
+            ),
+            "decoder": os.path.join(
+                self.model_dir, config.get("decoder", "decoder.onnx")
+            ),
+        }
+        if self.model_type != "paraformer":
+            model_files["joiner"] = os.path.join(
+                self.model_dir, config.get("joiner", "joiner.onnx")
+            )
+        for file_path in model_files.values():
+            if not os.path.isfile(file_path):
+                raise FileNotFoundError(f"模型文件不存在: {file_path}")
+
+        with CaptureOutput():
+            if self.model_type == "paraformer":
+                self.model = sherpa_onnx.OnlineRecognizer.from_paraformer(
+                    tokens=model_files["tokens"],
+                    encoder=model_files["encoder"],
+                    decoder=model_files["decoder"],
+                    num_threads=2,
+                    sample_rate=16000,
+                    feature_dim=80,
+                    decoding_method="greedy_search",
+                    debug=False,
+                )
+            else:  # zipformer 等 transducer 模型
+                self.model = sherpa_onnx.OnlineRecognizer.from_transducer(
+                    tokens=model_files["tokens"],
+                    encoder=model_files["encoder"],
+                    decoder=model_files["decoder"],
+                    joiner=model_files["joiner"],
+                    num_threads=2,
+                    sample_rate=16000,
+                    feature_dim=80,
+                    decoding_method="greedy_search",
+                    debug=False,
+                )
+
+    async def receive_audio(self, conn, audio, audio_have_voice):
+        if conn.client_listen_mode == "auto" or conn.client_listen_mode == "realtime":
+            have_voice = audio_have_voice
+        else:
+            have_voice = conn.client_have_voice
+
+        voice_stop = conn.client_voice_stop
+        if have_voice or conn.client_have_voice:
+            try:
+                await self._feed_stream(conn)
+            except Exception as e:
+                logger.bind(tag=TAG).error(f"流式识别失败: {e}")
+
+        await super().receive_audio(conn, audio, audio_have_voice)
+
+        # 语音过短未进入识别时，丢弃本次的流
+        if voice_stop:
+            self.streams.pop(conn.session_id, None)
+
+    async def _feed_stream(self, conn):
+        """把VAD已解码、尚未送入的PCM送入该连接的流并解码"""
+        buffer = conn.client_audio_buffer
+        state = self.streams.get(conn.session_id)
+        if state is None:
+            # 从ASR保留的前置音频开始识别
+            if buffer.retaining:
+                start = buffer.retained_start
+            else:
+                start = buffer.write_pos - ASR_PREROLL_SAMPLES
+            state = OnlineStreamState(self.model.create_stream(), start)
+            self.streams[conn.session_id] = state
+
+        samples = buffer.read_float32(state.position)
+        state.position = buffer.write_pos
+        if len(samples) == 0:
+            return
+        state.stream.accept_waveform(16000, samples)
+
+        text = await run_blocking(self._decode_ready, state.stream)
+        if self.partial_result and text and text != state.text:
+            state.text = text
+            await send_stt_partial_message(conn, text)
+
+    def _decode_ready(self, stream) -> str:
+        """解码流中已就绪的帧，返回当前识别结果"""
+        while self.model.is_ready(stream):
+            self.model.decode_stream(stream)
+        return self.model.get_result(stream)
+
+    async def close_audio_channels(self, conn):
+        self.streams.pop(conn.session_id, None)
+
+    async def speech_to_text(
+        self, opus_data: List[bytes], session_id: str, audio_format="opus"
+    ) -> Tuple[Optional[str], Optional[str]]:
+        """结束该连接的流并返回最终识别结果"""
+        file_path = None
+        try:
+            pcm_data = None
+            if not self.delete_audio_file:
+                if audio_format == "pcm":
+                    pcm_data = opus_data
+                else:
+                    pcm_data = self.decode_opus(opus_data)
+                file_path = self.save_audio_to_file(pcm_data, session_id)
+
+            start_time = time.time()
+            state = self.streams.pop(session_id, None)
+            if state is not None:
+                stream = state.stream
+            else:
+                # 没有进行中的流时，整段音频一次送入
+                if pcm_data is None:
+                    if audio_format == "pcm":
+                        pcm_data = opus_data
+                    else:
+                        pcm_data = self.decode_opus(opus_data)
+                stream = self.model.create_stream()
+                stream.accept_waveform(16000, self.pcm_to_float32(pcm_data))
+
+            stream.accept_waveform(
+                16000, np.zeros(TAIL_PADDING_SAMPLES, dtype=np.float32)
+            )
+            stream.input_finished()
+            text = self._decode_ready(stream)
+            logger.bind(tag=TAG).debug(
+                f"语音识别耗时: {time.time() - start_time:.3f}s | 结果: {text}"
+            )
+
+            return text, file_path
+
+        except Exception as e:
+            logger.bind(tag=TAG).error(f"语音识别失败: {e}", exc_info=True)
+            return "", file_path
@@ -2,6 +2,9 @@ from typing import List, Dict
 from ..base import IntentProviderBase
 from plugins_func.functions.play_music import initialize_music_handler
 from config.logger import setup_logging
+from core.utils.intent_cache import intent_cache, canonical
+from core.utils.executor import run_blocking
+import os
 import re
 import json
 import hashlib
@@ -10,6 +13,9 @@ import time
 TAG = __name__
 logger = setup_logging()
 
+# 提示词中最多列出的候选歌曲数
+MUSIC_PROMPT_TOP_K = 10
+
 
 class IntentProvider(IntentProviderBase):
     def __init__(self, config):
@@ -22,6 +28,21 @@ class IntentProvider(IntentProviderBase):
         self.cache_manager = cache_manager
         self.CacheType = CacheType
         self.history_count = 4  # 默认使用最近4条对话记录
+        intent_cache.configure(config.get("semantic_cache", {}))
+
+    @staticmethod
+    def _tools_signature(conn) -> str:
+        """设备当前可用工具列表的摘要，工具变化后之前缓存的意图失效"""
+        names = [
+            func.get("function", {}).get("name", "")
+            for func in conn.func_handler.get_functions() or []
+        ]
+        if hasattr(conn, "mcp_client"):
+            names.extend(
+                tool.get("function", {}).get("name", "")
+                for tool in conn.mcp_client.get_available_tools() or []
+            )
+        return hashlib.md5(",".join(sorted(names)).encode()).hexdigest()
 
     def get_intent_system_prompt(self, functions_list: str) -> str:
         """
@@ -124,18 +145,37 @@ class IntentProvider(IntentProviderBase):
         model_info = getattr(self.llm, "model_name", str(self.llm.__class__.__name__))
         logger.bind(tag=TAG).debug(f"使用意图识别模型: {model_info}")
 
-        # 计算缓存键
-        cache_key = hashlib.md5((conn.device_id + text).encode()).hexdigest()
+        # 计算缓存键，只忽略标点、大小写和繁简的差异
+        tools_signature = self._tools_signature(conn)
+        cache_key = hashlib.md5(
+            (conn.device_id + tools_signature + canonical(text)).encode()
+        ).hexdigest()
 
-        # 检查缓存
-        cached_intent = self.cache_manager.get(self.CacheType.INTENT, cache_key)
+        # 检查缓存，共享缓存后端会读文件，放到线程池中执行
+        cached_intent = await run_blocking(
+            self.cache_manager.get, self.CacheType.INTENT, cache_key
+        )
         if cached_intent is not None:
+            intent_cache.record(cached_intent, "exact")
             cache_time = time.time() - total_start_time
             logger.bind(tag=TAG).debug(
                 f"使用缓存的意图: {cache_key} -> {cached_intent}, 耗时: {cache_time:.4f}秒"
             )
             return cached_intent
 
+        # 说法不同但意思相近的句子
+        similar_intent = intent_cache.lookup(conn.device_id, tools_signature, text)
+        if similar_intent is not None:
+            intent_cache.record(similar_intent, "semantic")
+            await run_blocking(
+                self.cache_manager.set, self.CacheType.INTENT, cache_key, similar_intent
+            )
+            cache_time = time.time() - total_start_time
+            logger.bind(tag=TAG).debug(
+                f"使用相似句子的意图: {text} -> {similar_intent}, 耗时: {cache_time:.4f}秒"
+            )
+            return similar_intent
+
         if self.promot == "":
             functions = conn.func_handler.get_functions()
             if hasattr(conn, "mcp_client"):
@@ -147,9 +187,17 @@ class IntentProvider(IntentProviderBase):
 
             self.promot = self.get_intent_system_prompt(functions)
 
+        # 只列出歌名出现在用户这句话中的几首歌，不再把整个曲库放入提示词
         music_config = initialize_music_handler(conn)
-        music_file_names = music_config["music_file_names"]
-        prompt_music = f"{self.promot}\n<musicNames>{music_file_names}\n</musicNames>"
+        music_matches = music_config["music_index"].search(
+            text, top_k=MUSIC_PROMPT_TOP_K, min_score=0.5, containment=True
+        )
+        prompt_music = self.promot
+        if music_matches:
+            music_file_names = [
+                os.path.splitext(path)[0] for path, _ in music_matches
+            ]
+            prompt_music += f"\n<musicNames>{music_file_names}\n</musicNames>"
 
         home_assistant_cfg = conn.config["plugins"].get("home_assistant")
         if home_assistant_cfg:
@@ -183,7 +231,7 @@ class IntentProvider(IntentProviderBase):
         llm_start_time = time.time()
         logger.bind(tag=TAG).debug(f"开始LLM意图识别调用, 模型: {model_info}")
 
-        intent = self.llm.response_no_stream(
+        intent = await self.llm.aresponse_no_stream(
             system_prompt=prompt_music, user_prompt=user_prompt
         )
 
@@ -234,7 +282,11 @@ class IntentProvider(IntentProviderBase):
                     conn.dialogue.dialogue = clean_history
 
                 # 添加到缓存
-                self.cache_manager.set(self.CacheType.INTENT, cache_key, intent)
+                await run_blocking(
+                    self.cache_manager.set, self.CacheType.INTENT, cache_key, intent
+                )
+                intent_cache.add(conn.device_id, tools_signature, text, intent)
+                intent_cache.record(intent, "miss")
 
                 # 后处理时间
                 postprocess_time = time.time() - postprocess_start_time
@@ -244,7 +296,11 @@ class IntentProvider(IntentProviderBase):
                 return intent
             else:
                 # 添加到缓存
-                self.cache_manager.set(self.CacheType.INTENT, cache_key, intent)
+                await run_blocking(
+                    self.cache_manager.set, self.CacheType.INTENT, cache_key, intent
+                )
+                intent_cache.add(conn.device_id, tools_signature, text, intent)
+                intent_cache.record(intent, "miss")
 
                 # 后处理时间
                 postprocess_time = time.time() - postprocess_start_time
@@ -1,9 +1,14 @@
 from abc import ABC, abstractmethod
 from config.logger import setup_logging
+from core.utils.executor import run_blocking, StreamIterator
 
 TAG = __name__
 logger = setup_logging()
 
+# 同步生成器结束的标记
+_END = object()
+
+
 class LLMProviderBase(ABC):
     @abstractmethod
     def response(self, session_id, dialogue):
@@ -25,7 +30,23 @@ class LLMProviderBase(ABC):
         except Exception as e:
             logger.bind(tag=TAG).error(f"Error in Ollama response generation: {e}")
             return "【LLM服务响应异常】"
-    
+
+    async def aresponse_no_stream(self, system_prompt, user_prompt, **kwargs):
+        """response_no_stream的异步版本，等待大模型回复时不阻塞事件循环"""
+        try:
+            dialogue = [
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_prompt},
+            ]
+            result = ""
+            async for part in self.astream("", dialogue, **kwargs):
+                result += part
+            return result
+
+        except Exception as e:
+            logger.bind(tag=TAG).error(f"Error in response generation: {e}")
+            return "【LLM服务响应异常】"
+
     def response_with_functions(self, session_id, dialogue, functions=None):
         """
         Default implementation for function calling (streaming)
@@ -37,3 +58,56 @@ class LLMProviderBase(ABC):
         for token in self.response(session_id, dialogue):
             yield token, None
 
+    async def astream(self, session_id, dialogue, functions=None, **kwargs):
+        """异步流式接口
+
+        functions为None时输出文本片段，否则输出(文本, 工具调用)。
+        默认在共享线程池中迭代同步的response接口，支持异步请求的大模型应重写此方法。
+        """
+        if functions is None:
+            stream = self.response(session_id, dialogue, **kwargs)
+        else:
+            stream = self.response_with_functions(
+                session_id, dialogue, functions=functions
+            )
+        if stream is None:
+            return
+        try:
+            while True:
+                item = await run_blocking(next, stream, _END)
+                if item is _END:
+                    break
+                yield item
+        finally:
+            close = getattr(stream, "close", None)
+            if close is not None:
+                try:
+                    close()
+                except ValueError:
+                    # 线程池中仍在读取下一个片段，随生成器回收
+                    pass
+
+
+class AsyncLLMProviderBase(LLMProviderBase):
+    """以astream为核心的大模型接口
+
+    请求在事件循环中通过共用的连接池发出，同步的response接口由astream转换而来。
+    关闭response返回的迭代器会取消请求，上游立即停止生成。
+    """
+
+    @abstractmethod
+    def astream(self, session_id, dialogue, functions=None, **kwargs):
+        """异步流式接口，functions为None时输出文本片段，否则输出(文本, 工具调用)"""
+        pass
+
+    def response(self, session_id, dialogue, **kwargs):
+        return StreamIterator(self.astream(session_id, dialogue, **kwargs))
+
+    def response_with_functions(self, session_id, dialogue, functions=None):
+        return StreamIterator(
+            self.astream(
+                session_id,
+                dialogue,
+                functions=functions if functions is not None else [],
+            )
+        )
@@ -1,61 +1,37 @@
 from config.logger import setup_logging
 import json
-from core.providers.llm.base import LLMProviderBase
-
-# official coze sdk for Python [cozepy](https://github.com/coze-dev/coze-py)
-from cozepy import COZE_CN_BASE_URL
-from cozepy import (
-    Coze,
-    TokenAuth,
-    Message,
-    ChatEventType,
-)  # noqa
+from core.providers.llm.base import AsyncLLMProviderBase
 from core.providers.llm.system_prompt import get_system_prompt_for_function
+from core.utils.http_client import get_llm_http_client, llm_timeout
 from core.utils.util import check_model_key
 
 TAG = __name__
 logger = setup_logging()
 
+# Coze开放平台接口 https://www.coze.cn/open/docs/developer_guides/chat_v3
+COZE_CN_BASE_URL = "https://api.coze.cn"
+CONVERSATION_MESSAGE_DELTA = "conversation.message.delta"
+
 
-class LLMProvider(LLMProviderBase):
+class LLMProvider(AsyncLLMProviderBase):
     def __init__(self, config):
         self.personal_access_token = config.get("personal_access_token")
         self.bot_id = str(config.get("bot_id"))
         self.user_id = str(config.get("user_id"))
+        # 流式响应两个片段之间的最长等待时间（秒）
+        self.timeout = llm_timeout(config.get("timeout"))
         self.session_conversation_map = {}  # 存储session_id和conversation_id的映射
         model_key_msg = check_model_key("CozeLLM", self.personal_access_token)
         if model_key_msg:
             logger.bind(tag=TAG).error(model_key_msg)
 
-    def response(self, session_id, dialogue, **kwargs):
-        coze_api_token = self.personal_access_token
-        coze_api_base = COZE_CN_BASE_URL
-
-        last_msg = next(m for m in reversed(dialogue) if m["role"] == "user")
-
-        coze = Coze(auth=TokenAuth(token=coze_api_token), base_url=coze_api_base)
-        conversation_id = self.session_conversation_map.get(session_id)
-
-        # 如果没有找到conversation_id，则创建新的对话
-        if not conversation_id:
-            conversation = coze.conversations.create(messages=[])
-            conversation_id = conversation.id
-            self.session_conversation_map[session_id] = conversation_id  # 更新映射
-
-        for event in coze.chat.stream(
-            bot_id=self.bot_id,
-            user_id=self.user_id,
-            additional_messages=[
-                Message.build_user_question_text(last_msg["content"]),
-            ],
-            conversation_id=conversation_id,
-        ):
-            if event.event == ChatEventType.CONVERSATION_MESSAGE_DELTA:
-                print(event.message.content, end="", flush=True)
-                yield event.message.content
+    async def astream(self, session_id, dialogue, functions=None, **kwargs):
+        if functions is None:
+            async for token in self._stream(session_id, dialogue):
+                yield token
+            return
 
-    def response_with_functions(self, session_id, dialogue, functions=None):
-        if len(dialogue) == 2 and functions is not None and len(functions) > 0:
+        if len(dialogue) == 2 and len(functions) > 0:
             # 第一次调用llm， 取最后一条用户消息，附加tool提示词
             last_msg = dialogue[-1]["content"]
             function_str = json.dumps(functions, ensure_ascii=False)
@@ -71,5 +47,61 @@ class LLMProvider(LLMProviderBase):
                     break
                 dialogue.pop()
 
-        for token in self.response(session_id, dialogue):
+        async for token in self._stream(session_id, dialogue):
             yield token, None
+
+    async def _stream(self, session_id, dialogue):
+        try:
+            last_msg = next(m for m in reversed(dialogue) if m["role"] == "user")
+
+            client = get_llm_http_client(COZE_CN_BASE_URL)
+            headers = {"Authorization": f"Bearer {self.personal_access_token}"}
+            conversation_id = self.session_conversation_map.get(session_id)
+
+            # 如果没有找到conversation_id，则创建新的对话
+            if not conversation_id:
+                r = await client.post(
+                    f"{COZE_CN_BASE_URL}/v1/conversation/create",
+                    headers=headers,
+                    timeout=self.timeout,
+                    json={"messages": []},
+                )
+                conversation_id = r.json()["data"]["id"]
+                self.session_conversation_map[session_id] = conversation_id  # 更新映射
+
+            # 被打断时退出async with，连接随之关闭
+            async with client.stream(
+                "POST",
+                f"{COZE_CN_BASE_URL}/v3/chat",
+                params={"conversation_id": conversation_id},
+                headers=headers,
+                timeout=self.timeout,
+                json={
+                    "bot_id": self.bot_id,
+                    "user_id": self.user_id,
+                    "stream": True,
+                    "auto_save_history": True,
+                    "additional_messages": [
+                        {
+                            "role": "user",
+                            "type": "question",
+                            "content": last_msg["content"],
+                            "content_type": "text",
+                        }
+                    ],
+                },
+            ) as r:
+                # 服务端事件由event:和data:两行组成
+                event = None
+                async for line in r.aiter_lines():
+                    if line.startswith("event:"):
+                        event = line[6:].strip()
+                    elif line.startswith("data:"):
+                        if event == CONVERSATION_MESSAGE_DELTA:
+                            yield json.loads(line[5:])["content"]
+                        elif event == "error":
+                            logger.bind(tag=TAG).error(f"Coze服务响应异常: {line[5:]}")
+
+        except Exception as e:
+            logger.bind(tag=TAG).error(f"Error in response generation: {e}")
+            yield "【服务响应异常】"
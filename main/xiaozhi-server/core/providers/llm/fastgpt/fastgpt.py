@@ -1,32 +1,42 @@
 import json
 from config.logger import setup_logging
-import requests
-from core.providers.llm.base import LLMProviderBase
+from core.utils.http_client import get_llm_http_client, llm_timeout
+from core.providers.llm.base import AsyncLLMProviderBase
 from core.utils.util import check_model_key
 
 TAG = __name__
 logger = setup_logging()
 
 
-class LLMProvider(LLMProviderBase):
+class LLMProvider(AsyncLLMProviderBase):
     def __init__(self, config):
         self.api_key = config["api_key"]
         self.base_url = config.get("base_url")
         self.detail = config.get("detail", False)
         self.variables = config.get("variables", {})
+        # 流式响应两个片段之间的最长等待时间（秒）
+        self.timeout = llm_timeout(config.get("timeout"))
         model_key_msg = check_model_key("FastGPTLLM", self.api_key)
         if model_key_msg:
             logger.bind(tag=TAG).error(model_key_msg)
 
-    def response(self, session_id, dialogue, **kwargs):
+    async def astream(self, session_id, dialogue, functions=None, **kwargs):
+        if functions is not None:
+            logger.bind(tag=TAG).error(
+                f"fastgpt暂未实现完整的工具调用（function call），建议使用其他意图识别"
+            )
+            return
+
         try:
             # 取最后一条用户消息
             last_msg = next(m for m in reversed(dialogue) if m["role"] == "user")
 
-            # 发起流式请求
-            with requests.post(
+            # 发起流式请求，被打断时退出async with，连接随之关闭
+            async with get_llm_http_client(self.base_url).stream(
+                "POST",
                 f"{self.base_url}/chat/completions",
                 headers={"Authorization": f"Bearer {self.api_key}"},
+                timeout=self.timeout,
                 json={
                     "stream": True,
                     "chatId": session_id,
@@ -34,13 +44,12 @@ class LLMProvider(LLMProviderBase):
                     "variables": self.variables,
                     "messages": [{"role": "user", "content": last_msg["content"]}],
                 },
-                stream=True,
             ) as r:
-                for line in r.iter_lines():
+                async for line in r.aiter_lines():
                     if line:
                         try:
-                            if line.startswith(b"data: "):
-                                if line[6:].decode("utf-8") == "[DONE]":
+                            if line.startswith("data: "):
+                                if line[6:] == "[DONE]":
                                     break
 
                                 data = json.loads(line[6:])
@@ -66,8 +75,3 @@ class LLMProvider(LLMProviderBase):
         except Exception as e:
             logger.bind(tag=TAG).error(f"Error in response generation: {e}")
             yield "【服务响应异常】"
-
-    def response_with_functions(self, session_id, dialogue, functions=None):
-        logger.bind(tag=TAG).error(
-            f"fastgpt暂未实现完整的工具调用（function call），建议使用其他意图识别"
-        )
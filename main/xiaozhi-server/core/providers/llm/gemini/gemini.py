@@ -6,7 +6,7 @@ import requests
 from google import generativeai as genai
 from google.generativeai import types, GenerationConfig
 
-from core.providers.llm.base import LLMProviderBase
+from core.providers.llm.base import AsyncLLMProviderBase
 from core.utils.util import check_model_key
 from config.logger import setup_logging
 from google.generativeai.types import GenerateContentResponse
@@ -66,7 +66,7 @@ def setup_proxy_env(http_proxy: str | None, https_proxy: str | None):
         raise RuntimeError("HTTP 和 HTTPS 代理都不可用，请检查配置")
 
 
-class LLMProvider(LLMProviderBase):
+class LLMProvider(AsyncLLMProviderBase):
     def __init__(self, cfg: Dict[str, Any]):
         self.model_name = cfg.get("model_name", "gemini-2.0-flash")
         self.api_key = cfg["api_key"]
@@ -113,13 +113,45 @@ class LLMProvider(LLMProviderBase):
         ]
 
     # Gemini文档提到，无需维护session-id，直接用dialogue拼接而成
-    def response(self, session_id, dialogue, **kwargs):
-        yield from self._generate(dialogue, None)
+    async def astream(self, session_id, dialogue, functions=None, **kwargs):
+        tools = None if functions is None else self._build_tools(functions)
+        stream = await self.model.generate_content_async(
+            contents=self._build_contents(dialogue),
+            generation_config=self.gen_cfg,
+            tools=tools,
+            stream=True,
+        )
 
-    def response_with_functions(self, session_id, dialogue, functions=None):
-        yield from self._generate(dialogue, self._build_tools(functions))
+        # 一轮回复中可能有多个函数调用，按出现顺序编号
+        call_index = 0
+        async for chunk in stream:
+            cand = chunk.candidates[0]
+            for part in cand.content.parts:
+                # a) 函数调用-通常是最后一段话才是函数调用
+                if getattr(part, "function_call", None):
+                    fc = part.function_call
+                    yield None, [
+                        SimpleNamespace(
+                            index=call_index,
+                            id=uuid.uuid4().hex,
+                            type="function",
+                            function=SimpleNamespace(
+                                name=fc.name,
+                                arguments=json.dumps(dict(fc.args), ensure_ascii=False),
+                            ),
+                        )
+                    ]
+                    call_index += 1
+                    continue
+                # b) 普通文本
+                if getattr(part, "text", None):
+                    yield part.text if functions is None else (part.text, None)
+
+        if functions is not None:
+            yield None, None  # function‑mode 结束，返回哑包
 
-    def _generate(self, dialogue, tools):
+    @staticmethod
+    def _build_contents(dialogue):
         role_map = {"assistant": "model", "user": "user"}
         contents: list = []
         # 拼接对话
@@ -127,7 +159,6 @@ class LLMProvider(LLMProviderBase):
             r = m["role"]
 
             if r == "assistant" and "tool_calls" in m:
-                tc = m["tool_calls"][0]
                 contents.append(
                     {
                         "role": "model",
@@ -138,6 +169,7 @@ class LLMProvider(LLMProviderBase):
                                     "args": json.loads(tc["function"]["arguments"]),
                                 }
                             }
+                            for tc in m["tool_calls"]
                         ],
                     }
                 )
@@ -158,41 +190,7 @@ class LLMProvider(LLMProviderBase):
                     "parts": [{"text": str(m.get("content", ""))}],
                 }
             )
-
-        stream: GenerateContentResponse = self.model.generate_content(
-            contents=contents,
-            generation_config=self.gen_cfg,
-            tools=tools,
-            stream=True,
-        )
-
-        try:
-            for chunk in stream:
-                cand = chunk.candidates[0]
-                for part in cand.content.parts:
-                    # a) 函数调用-通常是最后一段话才是函数调用
-                    if getattr(part, "function_call", None):
-                        fc = part.function_call
-                        yield None, [
-                            SimpleNamespace(
-                                id=uuid.uuid4().hex,
-                                type="function",
-                                function=SimpleNamespace(
-                                    name=fc.name,
-                                    arguments=json.dumps(
-                                        dict(fc.args), ensure_ascii=False
-                                    ),
-                                ),
-                            )
-                        ]
-                        return
-                    # b) 普通文本
-                    if getattr(part, "text", None):
-                        yield part.text if tools is None else (part.text, None)
-
-        finally:
-            if tools is not None:
-                yield None, None  # function‑mode 结束，返回哑包
+        return contents
 
     # 关闭stream，预留后续打断对话功能的功能方法，官方文档推荐打断对话要关闭上一个流，可以有效减少配额计费和资源占用
     @staticmethod
@@ -1,15 +1,14 @@
-import httpx
-import openai
 from openai.types import CompletionUsage
 from config.logger import setup_logging
 from core.utils.util import check_model_key
-from core.providers.llm.base import LLMProviderBase
+from core.utils.http_client import get_async_openai
+from core.providers.llm.base import AsyncLLMProviderBase
 
 TAG = __name__
 logger = setup_logging()
 
 
-class LLMProvider(LLMProviderBase):
+class LLMProvider(AsyncLLMProviderBase):
     def __init__(self, config):
         self.model_name = config.get("model_name")
         self.api_key = config.get("api_key")
@@ -46,69 +45,82 @@ class LLMProvider(LLMProviderBase):
         model_key_msg = check_model_key("LLM", self.api_key)
         if model_key_msg:
             logger.bind(tag=TAG).error(model_key_msg)
-        self.client = openai.OpenAI(api_key=self.api_key, base_url=self.base_url, timeout=httpx.Timeout(self.timeout))
 
-    def response(self, session_id, dialogue, **kwargs):
+    async def astream(self, session_id, dialogue, functions=None, **kwargs):
+        client = get_async_openai(self.base_url, self.api_key, self.timeout)
+        stream = None
         try:
-            responses = self.client.chat.completions.create(
-                model=self.model_name,
-                messages=dialogue,
-                stream=True,
-                max_tokens=kwargs.get("max_tokens", self.max_tokens),
-                temperature=kwargs.get("temperature", self.temperature),
-                top_p=kwargs.get("top_p", self.top_p),
-                frequency_penalty=kwargs.get(
-                    "frequency_penalty", self.frequency_penalty
-                ),
-            )
-
-            is_active = True
-            for chunk in responses:
-                try:
-                    # 检查是否存在有效的choice且content不为空
-                    delta = (
-                        chunk.choices[0].delta
-                        if getattr(chunk, "choices", None)
-                        else None
-                    )
-                    content = delta.content if hasattr(delta, "content") else ""
-                except IndexError:
-                    content = ""
-                if content:
-                    # 处理标签跨多个chunk的情况
-                    if "<think>" in content:
-                        is_active = False
-                        content = content.split("<think>")[0]
-                    if "</think>" in content:
-                        is_active = True
-                        content = content.split("</think>")[-1]
-                    if is_active:
-                        yield content
+            if functions is None:
+                stream = await client.chat.completions.create(
+                    model=self.model_name,
+                    messages=dialogue,
+                    stream=True,
+                    max_tokens=kwargs.get("max_tokens", self.max_tokens),
+                    temperature=kwargs.get("temperature", self.temperature),
+                    top_p=kwargs.get("top_p", self.top_p),
+                    frequency_penalty=kwargs.get(
+                        "frequency_penalty", self.frequency_penalty
+                    ),
+                )
+                async for content in self._text_stream(stream):
+                    yield content
+            else:
+                stream = await client.chat.completions.create(
+                    model=self.model_name,
+                    messages=dialogue,
+                    stream=True,
+                    tools=functions or None,
+                )
+                async for item in self._function_stream(stream):
+                    yield item
 
         except Exception as e:
-            logger.bind(tag=TAG).error(f"Error in response generation: {e}")
-
-    def response_with_functions(self, session_id, dialogue, functions=None):
-        try:
-            stream = self.client.chat.completions.create(
-                model=self.model_name, messages=dialogue, stream=True, tools=functions
-            )
+            if functions is None:
+                logger.bind(tag=TAG).error(f"Error in response generation: {e}")
+            else:
+                logger.bind(tag=TAG).error(f"Error in function call streaming: {e}")
+                yield f"【OpenAI服务响应异常: {e}】", None
+        finally:
+            # 被打断时关闭响应，上游随之停止生成
+            if stream is not None:
+                await stream.close()
 
-            for chunk in stream:
+    @staticmethod
+    async def _text_stream(stream):
+        is_active = True
+        async for chunk in stream:
+            try:
                 # 检查是否存在有效的choice且content不为空
-                if getattr(chunk, "choices", None):
-                    yield chunk.choices[0].delta.content, chunk.choices[
-                        0
-                    ].delta.tool_calls
-                # 存在 CompletionUsage 消息时，生成 Token 消耗 log
-                elif isinstance(getattr(chunk, "usage", None), CompletionUsage):
-                    usage_info = getattr(chunk, "usage", None)
-                    logger.bind(tag=TAG).info(
-                        f"Token 消耗：输入 {getattr(usage_info, 'prompt_tokens', '未知')}，"
-                        f"输出 {getattr(usage_info, 'completion_tokens', '未知')}，"
-                        f"共计 {getattr(usage_info, 'total_tokens', '未知')}"
-                    )
+                delta = (
+                    chunk.choices[0].delta if getattr(chunk, "choices", None) else None
+                )
+                content = delta.content if hasattr(delta, "content") else ""
+            except IndexError:
+                content = ""
+            if content:
+                # 处理标签跨多个chunk的情况
+                if "<think>" in content:
+                    is_active = False
+                    content = content.split("<think>")[0]
+                if "</think>" in content:
+                    is_active = True
+                    content = content.split("</think>")[-1]
+                if is_active:
+                    yield content
 
-        except Exception as e:
-            logger.bind(tag=TAG).error(f"Error in function call streaming: {e}")
-            yield f"【OpenAI服务响应异常: {e}】", None
+    @staticmethod
+    async def _function_stream(stream):
+        async for chunk in stream:
+            # 检查是否存在有效的choice且content不为空
+            if getattr(chunk, "choices", None):
+                yield chunk.choices[0].delta.content, chunk.choices[
+                    0
+                ].delta.tool_calls
+            # 存在 CompletionUsage 消息时，生成 Token 消耗 log
+            elif isinstance(getattr(chunk, "usage", None), CompletionUsage):
+                usage_info = getattr(chunk, "usage", None)
+                logger.bind(tag=TAG).info(
+                    f"Token 消耗：输入 {getattr(usage_info, 'prompt_tokens', '未知')}，"
+                    f"输出 {getattr(usage_info, 'completion_tokens', '未知')}，"
+                    f"共计 {getattr(usage_info, 'total_tokens', '未知')}"
+                )
@@ -122,6 +122,21 @@ class ServerMCPClient:
         fut: concurrent.futures.Future = asyncio.run_coroutine_threadsafe(coro, loop)
         return await asyncio.wrap_future(fut)
 
+    async def ping(self) -> None:
+        """向MCP服务发送ping，用于健康检查"""
+        if not self.session:
+            raise RuntimeError("服务端MCP客户端未初始化")
+
+        loop = self._worker_task.get_loop()
+        coro = self.session.send_ping()
+
+        if loop is asyncio.get_running_loop():
+            await coro
+            return
+
+        fut: concurrent.futures.Future = asyncio.run_coroutine_threadsafe(coro, loop)
+        await asyncio.wrap_future(fut)
+
     def is_connected(self) -> bool:
         """检查MCP客户端是否连接正常
 
@@ -1,9 +1,10 @@
 """服务端MCP工具执行器"""
 
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, Union
 from ..base import ToolType, ToolDefinition, ToolExecutor
 from plugins_func.register import Action, ActionResponse
 from .mcp_manager import ServerMCPManager
+from .mcp_pool import ServerMCPPool
 
 
 class ServerMCPExecutor(ToolExecutor):
@@ -11,14 +12,19 @@ class ServerMCPExecutor(ToolExecutor):
 
     def __init__(self, conn):
         self.conn = conn
-        self.mcp_manager: Optional[ServerMCPManager] = None
+        self.mcp_manager: Optional[Union[ServerMCPManager, ServerMCPPool]] = None
         self._initialized = False
 
     async def initialize(self):
-        """初始化MCP管理器"""
+        """初始化MCP管理器，优先使用服务器共享的连接池"""
         if not self._initialized:
-            self.mcp_manager = ServerMCPManager(self.conn)
-            await self.mcp_manager.initialize_servers()
+            pool = getattr(getattr(self.conn, "server", None), "mcp_pool", None)
+            if pool is not None:
+                await pool.start()
+                self.mcp_manager = pool
+            else:
+                self.mcp_manager = ServerMCPManager(self.conn)
+                await self.mcp_manager.initialize_servers()
             self._initialized = True
 
     async def execute(
@@ -84,6 +90,6 @@ class ServerMCPExecutor(ToolExecutor):
         return self.mcp_manager.is_mcp_tool(actual_tool_name)
 
     async def cleanup(self):
-        """清理MCP连接"""
-        if self.mcp_manager:
+        """清理MCP连接，共享连接池由服务器关闭"""
+        if isinstance(self.mcp_manager, ServerMCPManager):
             await self.mcp_manager.cleanup_all()
@@ -12,35 +12,45 @@ TAG = __name__
 logger = setup_logging()
 
 
+def load_server_settings(config_path: str) -> Dict[str, Any]:
+    """读取data/.mcp_server_settings.json中的mcpServers配置"""
+    if len(config_path) == 0:
+        return {}
+
+    try:
+        with open(config_path, "r", encoding="utf-8") as f:
+            config = json.load(f)
+        return config.get("mcpServers", {})
+    except Exception as e:
+        logger.bind(tag=TAG).error(
+            f"Error loading MCP config from {config_path}: {e}"
+        )
+        return {}
+
+
+def get_settings_path() -> str:
+    config_path = get_project_dir() + "data/.mcp_server_settings.json"
+    if not os.path.exists(config_path):
+        logger.bind(tag=TAG).warning(
+            f"请检查mcp服务配置文件：data/.mcp_server_settings.json"
+        )
+        return ""
+    return config_path
+
+
 class ServerMCPManager:
     """管理多个服务端MCP服务的集中管理器"""
 
     def __init__(self, conn) -> None:
         """初始化MCP管理器"""
         self.conn = conn
-        self.config_path = get_project_dir() + "data/.mcp_server_settings.json"
-        if not os.path.exists(self.config_path):
-            self.config_path = ""
-            logger.bind(tag=TAG).warning(
-                f"请检查mcp服务配置文件：data/.mcp_server_settings.json"
-            )
+        self.config_path = get_settings_path()
         self.clients: Dict[str, ServerMCPClient] = {}
         self.tools = []
 
     def load_config(self) -> Dict[str, Any]:
         """加载MCP服务配置"""
-        if len(self.config_path) == 0:
-            return {}
-
-        try:
-            with open(self.config_path, "r", encoding="utf-8") as f:
-                config = json.load(f)
-            return config.get("mcpServers", {})
-        except Exception as e:
-            logger.bind(tag=TAG).error(
-                f"Error loading MCP config from {self.config_path}: {e}"
-            )
-            return {}
+        return load_server_settings(self.config_path)
 
     async def initialize_servers(self) -> None:
         """初始化所有MCP服务"""
@@ -0,0 +1,204 @@
+"""服务端MCP连接池
+
+data/.mcp_server_settings.json 中的每个MCP服务在整个服务器进程中只启动一个客户端
+（一个stdio子进程或一个SSE会话），所有设备连接共用。MCP会话按JSON-RPC请求id
+分发响应，多个连接的工具调用可以在同一个会话上并发进行，每个服务的并发数有上限。
+工具列表只在启动和重启服务时获取一次；后台定期ping各服务，失败时自动重启。
+"""
+
+import asyncio
+from typing import Dict, Any, List, Optional
+from config.logger import setup_logging
+from .mcp_client import ServerMCPClient
+from .mcp_manager import load_server_settings, get_settings_path
+
+TAG = __name__
+logger = setup_logging()
+
+
+class PooledMCPServer:
+    """连接池中的一个MCP服务"""
+
+    def __init__(self, name: str, config: Dict[str, Any], max_concurrency: int):
+        self.name = name
+        self.config = config
+        self.client: Optional[ServerMCPClient] = None
+        self.tools: List[Dict[str, Any]] = []
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.restart_lock = asyncio.Lock()
+        self.restarts = 0
+
+    def is_connected(self) -> bool:
+        return self.client is not None and self.client.is_connected()
+
+    async def connect(self):
+        client = ServerMCPClient(self.config)
+        await client.initialize()
+        if not client.is_connected():
+            await client.cleanup()
+            raise RuntimeError(f"MCP服务 {self.name} 连接失败")
+        self.client = client
+        self.tools = client.get_available_tools()
+
+    async def restart(self, failed_client: Optional[ServerMCPClient]):
+        """重启服务，多个调用同时失败时只重启一次"""
+        async with self.restart_lock:
+            if self.client is not failed_client and self.is_connected():
+                return
+            old_client, self.client = self.client, None
+            if old_client is not None:
+                await old_client.cleanup()
+            await self.connect()
+            self.restarts += 1
+            logger.bind(tag=TAG).info(f"服务端MCP服务已重启: {self.name}")
+
+    async def close(self):
+        if self.client is not None:
+            try:
+                await asyncio.wait_for(self.client.cleanup(), timeout=20)
+                logger.bind(tag=TAG).info(f"服务端MCP客户端已关闭: {self.name}")
+            except (asyncio.TimeoutError, Exception) as e:
+                logger.bind(tag=TAG).error(
+                    f"关闭服务端MCP客户端 {self.name} 时出错: {e}"
+                )
+            self.client = None
+
+
+class ServerMCPPool:
+    """由WebSocketServer持有的服务端MCP连接池，各连接只向它租用工具"""
+
+    def __init__(self, config: Dict[str, Any]):
+        pool_config = config.get("mcp_server_pool") or {}
+        self.max_concurrency = int(pool_config.get("max_concurrency", 8))
+        self.call_timeout = float(pool_config.get("call_timeout", 30))
+        self.health_check_interval = float(
+            pool_config.get("health_check_interval", 30)
+        )
+        self.max_retries = 3
+        self.retry_interval = 2
+        self.servers: Dict[str, PooledMCPServer] = {}
+        self.tools: List[Dict[str, Any]] = []
+        self._tool_servers: Dict[str, PooledMCPServer] = {}
+        self._start_task: Optional[asyncio.Task] = None
+        self._health_task: Optional[asyncio.Task] = None
+
+    async def start(self) -> None:
+        """启动所有MCP服务，可以重复调用，并发调用时等待同一次启动完成"""
+        if self._start_task is None:
+            self._start_task = asyncio.create_task(self._start())
+        await asyncio.shield(self._start_task)
+
+    async def _start(self):
+        for name, srv_config in load_server_settings(get_settings_path()).items():
+            if not srv_config.get("command") and not srv_config.get("url"):
+                logger.bind(tag=TAG).warning(
+                    f"Skipping server {name}: neither command nor url specified"
+                )
+                continue
+            self.servers[name] = PooledMCPServer(
+                name, srv_config, self.max_concurrency
+            )
+
+        async def connect(server: PooledMCPServer):
+            try:
+                logger.bind(tag=TAG).info(f"初始化服务端MCP客户端: {server.name}")
+                await server.connect()
+            except Exception as e:
+                logger.bind(tag=TAG).error(
+                    f"Failed to initialize MCP server {server.name}: {e}"
+                )
+
+        await asyncio.gather(*(connect(server) for server in self.servers.values()))
+        self._refresh_tools()
+        if self.servers and self.health_check_interval > 0:
+            self._health_task = asyncio.create_task(self._health_check_loop())
+
+    def _refresh_tools(self):
+        """重建工具列表和工具名到服务的映射，同名工具以先配置的服务为准"""
+        tools = []
+        tool_servers = {}
+        for server in self.servers.values():
+            for tool in server.tools:
+                name = tool.get("function", {}).get("name")
+                if name and name not in tool_servers:
+                    tool_servers[name] = server
+                    tools.append(tool)
+        self.tools = tools
+        self._tool_servers = tool_servers
+
+    async def _health_check_loop(self):
+        while True:
+            await asyncio.sleep(self.health_check_interval)
+            for server in list(self.servers.values()):
+                client = server.client
+                try:
+                    if client is None or not client.is_connected():
+                        raise RuntimeError("连接已断开")
+                    await asyncio.wait_for(client.ping(), timeout=self.call_timeout)
+                except Exception as e:
+                    logger.bind(tag=TAG).warning(
+                        f"服务端MCP服务 {server.name} 健康检查失败: {e}"
+                    )
+                    try:
+                        await server.restart(client)
+                        self._refresh_tools()
+                    except Exception as restart_error:
+                        logger.bind(tag=TAG).error(
+                            f"重启MCP服务 {server.name} 失败: {restart_error}"
+                        )
+
+    def get_all_tools(self) -> List[Dict[str, Any]]:
+        """获取所有服务的工具function定义"""
+        return self.tools
+
+    def is_mcp_tool(self, tool_name: str) -> bool:
+        """检查是否是MCP工具"""
+        return tool_name in self._tool_servers
+
+    async def execute_tool(self, tool_name: str, arguments: Dict[str, Any]) -> Any:
+        """执行工具调用，失败时重启对应的服务后重试"""
+        logger.bind(tag=TAG).info(f"执行服务端MCP工具 {tool_name}，参数: {arguments}")
+
+        server = self._tool_servers.get(tool_name)
+        if server is None:
+            raise ValueError(f"工具 {tool_name} 在任意MCP服务中未找到")
+
+        async with server.semaphore:
+            for attempt in range(self.max_retries):
+                client = server.client
+                try:
+                    if client is None or not client.is_connected():
+                        raise RuntimeError(f"MCP服务 {server.name} 未连接")
+                    return await asyncio.wait_for(
+                        client.call_tool(tool_name, arguments),
+                        timeout=self.call_timeout,
+                    )
+                except Exception as e:
+                    # 最后一次尝试失败时直接抛出异常
+                    if attempt == self.max_retries - 1:
+                        raise
+
+                    logger.bind(tag=TAG).warning(
+                        f"执行工具 {tool_name} 失败 (尝试 {attempt+1}/{self.max_retries}): {e}"
+                    )
+                    try:
+                        await server.restart(client)
+                        self._refresh_tools()
+                    except Exception as restart_error:
+                        logger.bind(tag=TAG).error(
+                            f"Failed to reconnect MCP client {server.name}: {restart_error}"
+                        )
+
+                    # 等待一段时间再重试
+                    await asyncio.sleep(self.retry_interval)
+
+    async def close(self) -> None:
+        """关闭所有MCP客户端"""
+        if self._health_task is not None:
+            self._health_task.cancel()
+            self._health_task = None
+        for server in self.servers.values():
+            await server.close()
+        self.servers.clear()
+        self._refresh_tools()
+        self._start_task = None
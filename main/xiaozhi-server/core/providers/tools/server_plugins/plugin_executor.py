@@ -1,9 +1,53 @@
-"""服务端插件工具执行器"""
-
-from typing import Dict, Any
+"""服务端插件工具执行器
+
+async插件（如查天气、查新闻）直接在事件循环中执行；普通函数插件（如阻塞的requests请求）
+在插件专用的线程池中执行，不阻塞其他设备的音频收发。对话线程在共享线程池中等待工具结果，
+插件若也在共享线程池中排队，对话较多时会互相等待直到超时，因此单独使用一个线程池。
+每次调用有超时，每个插件同时执行的调用数有上限，所有连接共用。
+"""
+
+import asyncio
+import inspect
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Optional
+from config.logger import setup_logging
 from ..base import ToolType, ToolDefinition, ToolExecutor
 from plugins_func.register import all_function_registry, Action, ActionResponse
 
+TAG = __name__
+logger = setup_logging()
+
+# 需要传入conn参数的插件类型：CHANGE_SYS_PROMPT, SYSTEM_CTL, IOT_CTL
+CONN_TYPE_CODES = (3, 4, 5)
+
+# 插件名 -> 所有连接共用的并发信号量
+_plugin_semaphores: Dict[str, asyncio.Semaphore] = {}
+
+
+# 同步插件专用线程池，大小为plugin_execution.max_concurrency
+_plugin_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def _get_plugin_executor(max_workers: int) -> ThreadPoolExecutor:
+    global _plugin_executor
+    if _plugin_executor is None:
+        with _executor_lock:
+            if _plugin_executor is None:
+                _plugin_executor = ThreadPoolExecutor(
+                    max_workers=max_workers, thread_name_prefix="xiaozhi-plugin"
+                )
+    return _plugin_executor
+
+
+def _get_semaphore(name: str, max_concurrency: int) -> asyncio.Semaphore:
+    semaphore = _plugin_semaphores.get(name)
+    if semaphore is None:
+        semaphore = _plugin_semaphores[name] = asyncio.Semaphore(max_concurrency)
+    return semaphore
+
 
 class ServerPluginExecutor(ToolExecutor):
     """服务端插件工具执行器"""
@@ -11,6 +55,9 @@ class ServerPluginExecutor(ToolExecutor):
     def __init__(self, conn):
         self.conn = conn
         self.config = conn.config
+        plugin_config = self.config.get("plugin_execution") or {}
+        self.timeout = float(plugin_config.get("timeout", 15))
+        self.max_concurrency = int(plugin_config.get("max_concurrency", 16))
 
     async def execute(
         self, conn, tool_name: str, arguments: Dict[str, Any]
@@ -22,24 +69,32 @@ class ServerPluginExecutor(ToolExecutor):
                 action=Action.NOTFOUND, response=f"插件函数 {tool_name} 不存在"
             )
 
+        # 根据工具类型决定是否传入conn参数
+        func_type = getattr(func_item, "type", None)
+        args = (conn,) if func_type and func_type.code in CONN_TYPE_CODES else ()
+        timeout = func_item.timeout or self.timeout
+        semaphore = _get_semaphore(
+            tool_name, func_item.max_concurrency or self.max_concurrency
+        )
+
         try:
-            # 根据工具类型决定如何调用
-            if hasattr(func_item, "type"):
-                func_type = func_item.type
-                if func_type.code in [4, 5]:  # SYSTEM_CTL, IOT_CTL (需要conn参数)
-                    result = func_item.func(conn, **arguments)
-                elif func_type.code == 2:  # WAIT
-                    result = func_item.func(**arguments)
-                elif func_type.code == 3:  # CHANGE_SYS_PROMPT
-                    result = func_item.func(conn, **arguments)
+            async with semaphore:
+                if inspect.iscoroutinefunction(func_item.func):
+                    call = func_item.func(*args, **arguments)
                 else:
-                    result = func_item.func(**arguments)
-            else:
-                # 默认不传conn参数
-                result = func_item.func(**arguments)
-
-            return result
-
+                    call = asyncio.get_running_loop().run_in_executor(
+                        _get_plugin_executor(self.max_concurrency),
+                        functools.partial(func_item.func, *args, **arguments),
+                    )
+                return await asyncio.wait_for(call, timeout=timeout)
+
+        except asyncio.TimeoutError:
+            # 线程池中的同步插件无法中断，只是不再等待其结果，仍占用插件线程池直到结束
+            logger.bind(tag=TAG).error(f"插件函数 {tool_name} 执行超时({timeout}秒)")
+            return ActionResponse(
+                action=Action.ERROR,
+                response=f"插件函数 {tool_name} 执行超时",
+            )
         except Exception as e:
             return ActionResponse(
                 action=Action.ERROR,
@@ -1,6 +1,7 @@
 """统一工具处理器"""
 
 import json
+import asyncio
 from typing import Dict, List, Any, Optional
 from config.logger import setup_logging
 from plugins_func.loadplugins import auto_import_modules
@@ -50,6 +51,9 @@ class UnifiedToolHandler:
             ToolType.MCP_ENDPOINT, self.mcp_endpoint_executor
         )
 
+        # 函数名 -> 锁，大模型流式返回的同名调用按顺序执行
+        self._call_locks: Dict[str, asyncio.Lock] = {}
+
         # 初始化标志
         self.finish_init = False
 
@@ -142,66 +146,121 @@ class UnifiedToolHandler:
         try:
             # 处理多函数调用
             if "function_calls" in function_call_data:
-                responses = []
-                for call in function_call_data["function_calls"]:
-                    result = await self.tool_manager.execute_tool(
-                        call["name"], call.get("arguments", {})
-                    )
-                    responses.append(result)
-                return self._combine_responses(responses)
-
-            # 处理单函数调用
-            function_name = function_call_data["name"]
-            arguments = function_call_data.get("arguments", {})
-
-            # 如果arguments是字符串，尝试解析为JSON
-            if isinstance(arguments, str):
-                try:
-                    arguments = json.loads(arguments) if arguments else {}
-                except json.JSONDecodeError:
-                    self.logger.error(f"无法解析函数参数: {arguments}")
-                    return ActionResponse(
-                        action=Action.ERROR,
-                        response="无法解析函数参数",
-                    )
-
-            self.logger.debug(f"调用函数: {function_name}, 参数: {arguments}")
-
-            # 执行工具调用
-            result = await self.tool_manager.execute_tool(function_name, arguments)
-            return result
+                calls = function_call_data["function_calls"]
+                responses = await self.execute_function_calls(calls)
+                return self._combine_responses(
+                    responses,
+                [call.get("name") if isinstance(call, dict) else None for call in calls],
+                )
+
+            return await self._execute_call(function_call_data)
+
+        except Exception as e:
+            self.logger.error(f"处理function call错误: {e}")
+            return ActionResponse(action=Action.ERROR, response=str(e))
+
+    async def handle_ordered_function_call(
+        self, conn, function_call_data: Dict[str, Any]
+    ) -> Optional[ActionResponse]:
+        """处理单个函数调用，同名函数按提交顺序依次执行，不同函数之间并发
 
+        调用出错时返回该调用自己的错误结果，不影响同一轮中的其他调用。
+        """
+        try:
+            name = function_call_data.get("name")
+            lock = self._call_locks.setdefault(name, asyncio.Lock())
+            async with lock:
+                return await self.handle_llm_function_call(conn, function_call_data)
         except Exception as e:
             self.logger.error(f"处理function call错误: {e}")
             return ActionResponse(action=Action.ERROR, response=str(e))
 
-    def _combine_responses(self, responses: List[ActionResponse]) -> ActionResponse:
-        """合并多个函数调用的响应"""
+    async def execute_function_calls(
+        self, calls: List[Dict[str, Any]]
+    ) -> List[ActionResponse]:
+        """并发执行一轮中的多个函数调用，返回与calls顺序一致的结果
+
+        不同函数之间视为互不依赖，同时执行，总耗时取决于最慢的一个；
+        同一函数的多次调用（如连续两次调节音量）由handle_ordered_function_call的锁按原顺序依次执行。
+        单个调用失败只影响它自己的结果。
+        """
+        tasks = [self.handle_ordered_function_call(self.conn, call) for call in calls]
+        return list(await asyncio.gather(*tasks))
+
+    async def _execute_call(self, call: Dict[str, Any]) -> ActionResponse:
+        """执行单个函数调用"""
+        function_name = call["name"]
+        arguments = call.get("arguments", {})
+
+        # 如果arguments是字符串，尝试解析为JSON
+        if isinstance(arguments, str):
+            try:
+                arguments = json.loads(arguments) if arguments else {}
+            except json.JSONDecodeError:
+                self.logger.error(f"无法解析函数参数: {arguments}")
+                return ActionResponse(
+                    action=Action.ERROR,
+                    response="无法解析函数参数",
+                )
+
+        self.logger.debug(f"调用函数: {function_name}, 参数: {arguments}")
+
+        # 执行工具调用
+        return await self.tool_manager.execute_tool(function_name, arguments or {})
+
+    def _combine_responses(
+        self,
+        responses: List[Optional[ActionResponse]],
+        names: Optional[List[str]] = None,
+    ) -> ActionResponse:
+        """按调用顺序合并多个函数调用的响应
+
+        全部失败时返回第一个错误；部分失败时把失败原因一并交给LLM生成回复。
+        需要交给LLM时，直接回复类的调用与_handle_function_results一致，取response或result。
+        """
         if not responses:
             return ActionResponse(action=Action.NONE, response="无响应")
 
-        # 如果有任何错误，返回第一个错误
-        for response in responses:
-            if response.action == Action.ERROR:
-                return response
+        failed = [
+            response is None or response.action in (Action.ERROR, Action.NOTFOUND)
+            for response in responses
+        ]
+        if all(failed):
+            for response in responses:
+                if response is not None:
+                    return response
+            return ActionResponse(action=Action.ERROR, response="无响应")
 
-        # 合并所有成功的响应
+        # 确定最终的动作类型
+        final_action = Action.RESPONSE
+        if any(failed) or any(
+            response.action == Action.REQLLM
+            for response in responses
+            if response is not None
+        ):
+            final_action = Action.REQLLM
+
+        # 合并所有响应
         contents = []
         responses_text = []
 
-        for response in responses:
-            if response.content:
-                contents.append(response.content)
+        for index, response in enumerate(responses):
+            if failed[index]:
+                name = (names[index] if names else None) or f"第{index + 1}个操作"
+                reason = (response.response or response.result) if response else None
+                contents.append(f"{name}执行失败: {reason or '无响应'}")
+                continue
+            if response.action == Action.REQLLM:
+                content = response.result
+            elif final_action == Action.REQLLM:
+                content = response.response or response.result
+            else:
+                content = response.result
+            if content:
+                contents.append(str(content))
             if response.response:
                 responses_text.append(response.response)
 
-        # 确定最终的动作类型
-        final_action = Action.RESPONSE
-        for response in responses:
-            if response.action == Action.REQLLM:
-                final_action = Action.REQLLM
-                break
-
         return ActionResponse(
             action=final_action,
             result="; ".join(contents) if contents else None,
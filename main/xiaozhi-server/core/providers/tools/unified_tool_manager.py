@@ -1,5 +1,6 @@
 """统一工具管理器"""
 
+import asyncio
 from typing import Dict, List, Optional, Any
 from config.logger import setup_logging
 from plugins_func.register import Action, ActionResponse
@@ -13,12 +14,18 @@ class ToolManager:
         self.conn = conn
         self.logger = setup_logging()
         self.executors: Dict[ToolType, ToolExecutor] = {}
+        # 每类执行器同时执行的工具调用数上限
+        self._semaphores: Dict[ToolType, asyncio.Semaphore] = {}
+        self._concurrency = conn.config.get("tool_call_concurrency") or {}
         self._cached_tools: Optional[Dict[str, ToolDefinition]] = None
         self._cached_function_descriptions: Optional[List[Dict[str, Any]]] = None
 
     def register_executor(self, tool_type: ToolType, executor: ToolExecutor):
         """注册工具执行器"""
         self.executors[tool_type] = executor
+        self._semaphores[tool_type] = asyncio.Semaphore(
+            int(self._concurrency.get(tool_type.value, 4))
+        )
         self._invalidate_cache()
         self.logger.info(f"注册工具执行器: {tool_type.value}")
 
@@ -93,7 +100,8 @@ class ToolManager:
 
             # 执行工具
             self.logger.info(f"执行工具: {tool_name}，参数: {arguments}")
-            result = await executor.execute(self.conn, tool_name, arguments)
+            async with self._semaphores[tool_type]:
+                result = await executor.execute(self.conn, tool_name, arguments)
             self.logger.debug(f"工具执行结果: {result}")
             return result
 
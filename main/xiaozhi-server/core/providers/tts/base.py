@@ -1,6 +1,8 @@
 import os
 import re
+import json
 import queue
+import hashlib
 import uuid
 import asyncio
 import threading
@@ -14,6 +16,11 @@ from core.utils.tts import MarkdownCleaner
 from core.utils.output_counter import add_device_output
 from core.handle.reportHandle import enqueue_tts_report
 from core.handle.sendAudioHandle import sendAudioMessage
+from core.utils.executor import run_blocking, run_in_thread_loop
+from core.utils.loop_queue import LoopQueue
+from core.utils.audio_stream import StreamingAudioDecoder
+from core.utils.music_library import music_library, P3Stream
+from core.utils.tts_cache import tts_audio_cache
 from core.providers.tts.dto.dto import (
     TTSMessageDTO,
     SentenceType,
@@ -26,6 +33,17 @@ import traceback
 TAG = __name__
 logger = setup_logging()
 
+# 每种TTS在整个服务中共享的并发合成上限
+_provider_semaphores = {}
+
+
+def get_provider_semaphore(provider_key, limit):
+    semaphore = _provider_semaphores.get(provider_key)
+    if semaphore is None:
+        semaphore = asyncio.Semaphore(limit)
+        _provider_semaphores[provider_key] = semaphore
+    return semaphore
+
 
 class TTSProviderBase(ABC):
     def __init__(self, config, delete_audio_file):
@@ -35,8 +53,27 @@ class TTSProviderBase(ABC):
         self.delete_audio_file = delete_audio_file
         self.audio_file_type = "wav"
         self.output_file = config.get("output_dir", "tmp/")
-        self.tts_text_queue = queue.Queue()
-        self.tts_audio_queue = queue.Queue()
+        # 配置指纹作为TTS缓存键的一部分，音色、模型、语速等任一配置变化都不会命中旧缓存
+        self.config_fingerprint = hashlib.sha1(
+            json.dumps(config, sort_keys=True, default=str).encode("utf-8")
+        ).hexdigest()
+        # 未重写文本处理线程的非流式TTS在事件循环中消费文本队列，合成调用放到共享线程池
+        # 重写了文本处理线程的流式TTS仍由自己的线程阻塞读取文本队列
+        self.text_in_loop = (
+            type(self).tts_text_priority_thread
+            is TTSProviderBase.tts_text_priority_thread
+        )
+        self.tts_text_queue = LoopQueue() if self.text_in_loop else queue.Queue()
+        self.tts_audio_queue = LoopQueue()
+        self.tts_priority_task = None
+        self.tts_emit_task = None
+        self.audio_play_priority_task = None
+        # 并行合成中尚未放入音频队列的任务，以及正在等待结果的任务
+        self.tts_inflight = None
+        self.tts_emitting = None
+        # 重写了stream_audio的TTS边接收边转码，stream_audio_format为其返回的音频格式
+        self.stream_audio_format = None
+        self.stream_audio_enabled = False
         self.tts_audio_first_sentence = True
         self.before_stop_play_files = []
 
@@ -84,7 +121,7 @@ class TTSProviderBase(ABC):
             # 需要删除文件的直接转为音频数据
             while max_repeat_time > 0:
                 try:
-                    audio_bytes = asyncio.run(self.text_to_speak(text, None))
+                    audio_bytes = run_in_thread_loop(self.text_to_speak(text, None))
                     if audio_bytes:
                         audio_datas, _ = audio_bytes_to_data(
                             audio_bytes, file_type=self.audio_file_type, is_opus=True
@@ -111,7 +148,7 @@ class TTSProviderBase(ABC):
             try:
                 while not os.path.exists(tmp_file) and max_repeat_time > 0:
                     try:
-                        asyncio.run(self.text_to_speak(text, tmp_file))
+                        run_in_thread_loop(self.text_to_speak(text, tmp_file))
                     except Exception as e:
                         logger.bind(tag=TAG).warning(
                             f"语音生成失败{5 - max_repeat_time + 1}次: {text}，错误: {e}"
@@ -139,6 +176,11 @@ class TTSProviderBase(ABC):
     async def text_to_speak(self, text, output_file):
         pass
 
+    async def stream_audio(self, text):
+        """按块返回合成的音频(stream_audio_format格式)，支持流式返回音频的TTS重写此方法"""
+        raise NotImplementedError
+        yield
+
     def audio_to_pcm_data(self, audio_file_path):
         """音频文件转换为PCM编码"""
         return audio_to_data(audio_file_path, is_opus=False)
@@ -178,62 +220,295 @@ class TTSProviderBase(ABC):
     async def open_audio_channels(self, conn):
         self.conn = conn
         self.tts_timeout = conn.config.get("tts_timeout", 10)
-        # tts 消化线程
-        self.tts_priority_thread = threading.Thread(
-            target=self.tts_text_priority_thread, daemon=True
-        )
-        self.tts_priority_thread.start()
+        self.tts_audio_queue.bind(conn.loop)
+        # tts 消化任务，流式TTS仍使用自己的消化线程
+        if self.text_in_loop:
+            self.tts_text_queue.bind(conn.loop)
+            # 本连接同时合成的句子数，以及同一种TTS在整个服务中的并发上限
+            self.segment_slots = asyncio.Semaphore(
+                max(int(conn.config.get("tts_parallel_segments", 3)), 1)
+            )
+            self.provider_semaphore = get_provider_semaphore(
+                type(self).__module__,
+                max(int(conn.config.get("tts_provider_max_inflight", 16)), 1),
+            )
+            self.tts_inflight = asyncio.Queue()
+            # 保留音频文件时仍按整段合成写入文件
+            self.stream_audio_enabled = (
+                self.delete_audio_file
+                and self.stream_audio_format is not None
+                and type(self).stream_audio is not TTSProviderBase.stream_audio
+            )
+            self.tts_priority_task = asyncio.create_task(
+                self._tts_text_priority_task()
+            )
+            self.tts_emit_task = asyncio.create_task(self._tts_emit_task())
+        else:
+            self.tts_priority_thread = threading.Thread(
+                target=self.tts_text_priority_thread, daemon=True
+            )
+            self.tts_priority_thread.start()
 
-        # 音频播放 消化线程
-        self.audio_play_priority_thread = threading.Thread(
-            target=self._audio_play_priority_thread, daemon=True
+        # 音频播放 消化任务
+        self.audio_play_priority_task = asyncio.create_task(
+            self._audio_play_priority_task()
         )
-        self.audio_play_priority_thread.start()
 
-    # 这里默认是非流式的处理方式
-    # 流式处理方式请在子类中重写
-    def tts_text_priority_thread(self):
+    def cancel_tasks(self):
+        """取消消化任务，当前正在执行的任务除外（例如播放结束后关闭连接）"""
+        current = asyncio.current_task()
+        self.cancel_pending()
+        for task in (
+            self.tts_priority_task,
+            self.tts_emit_task,
+            self.audio_play_priority_task,
+        ):
+            if task is not None and task is not current and not task.done():
+                task.cancel()
+
+    def _begin_sentence(self):
+        # 初始化参数
+        self.tts_stop_request = False
+        self.processed_chars = 0
+        self.tts_text_buff = []
+        self.is_first_sentence = True
+        self.tts_audio_first_sentence = True
+
+    def _text_to_audio(self, text):
+        """合成一段文本，返回可直接发送的音频包，相同的文本优先使用缓存"""
+        cache_key = tts_audio_cache.make_key(self, text, self.conn.audio_format)
+        audio_datas = tts_audio_cache.get(cache_key)
+        if audio_datas is not None:
+            logger.bind(tag=TAG).debug(f"TTS缓存命中: {text}")
+            return audio_datas
+        if self.delete_audio_file:
+            audio_datas = self.to_tts(text)
+        else:
+            tts_file = self.to_tts(text)
+            audio_datas = self._process_audio_file(tts_file) if tts_file else None
+        if audio_datas:
+            tts_audio_cache.put(cache_key, audio_datas)
+        return audio_datas
+
+    def _synthesize_segment(self, sentence_type, segment_text):
+        """合成一段文本并放入音频队列"""
+        audio_datas = self._text_to_audio(segment_text)
+        if audio_datas:
+            self.tts_audio_queue.put((sentence_type, audio_datas, segment_text))
+
+    def _load_file_audio(self, tts_file):
+        """文件消息的音频：Opus设备优先使用音乐库的p3文件，边播放边读取"""
+        if self.conn.audio_format != "pcm":
+            stream = music_library.open_stream(tts_file)
+            if stream is not None:
+                return stream
+        return self._process_audio_file(tts_file)
+
+    def _process_file_message(self, message):
+        self._process_remaining_text()
+        tts_file = message.content_file
+        if tts_file and os.path.exists(tts_file):
+            audio_datas = self._load_file_audio(tts_file)
+            self.tts_audio_queue.put(
+                (message.sentence_type, audio_datas, message.content_detail)
+            )
+
+    def _take_remaining_text(self):
+        """取出尚未合成的剩余文本"""
+        full_text = "".join(self.tts_text_buff)
+        remaining_text = full_text[self.processed_chars :]
+        if remaining_text:
+            segment_text = textUtils.get_string_no_punctuation_or_emoji(remaining_text)
+            if segment_text:
+                self.processed_chars += len(full_text)
+                return segment_text
+        return None
+
+    async def _tts_text_priority_task(self):
+        """非流式TTS的文本处理：在事件循环中取文本，多段文本并行合成
+
+        合成任务按提交顺序进入tts_inflight，由_tts_emit_task按顺序取结果放入音频队列。
+        """
         while not self.conn.stop_event.is_set():
             try:
-                message = self.tts_text_queue.get(timeout=1)
+                message = await self.tts_text_queue.get()
                 if message.sentence_type == SentenceType.FIRST:
                     self.conn.client_abort = False
                 if self.conn.client_abort:
-                    logger.bind(tag=TAG).info("收到打断信息，终止TTS文本处理线程")
+                    logger.bind(tag=TAG).info("收到打断信息，终止TTS文本处理")
                     continue
                 if message.sentence_type == SentenceType.FIRST:
-                    # 初始化参数
-                    self.tts_stop_request = False
-                    self.processed_chars = 0
-                    self.tts_text_buff = []
-                    self.is_first_sentence = True
-                    self.tts_audio_first_sentence = True
+                    self._begin_sentence()
                 elif ContentType.TEXT == message.content_type:
                     self.tts_text_buff.append(message.content_detail)
                     segment_text = self._get_segment_text()
                     if segment_text:
-                        if self.delete_audio_file:
-                            audio_datas = self.to_tts(segment_text)
-                            if audio_datas:
-                                self.tts_audio_queue.put(
-                                    (message.sentence_type, audio_datas, segment_text)
-                                )
-                        else:
-                            tts_file = self.to_tts(segment_text)
-                            if tts_file:
-                                audio_datas = self._process_audio_file(tts_file)
-                                self.tts_audio_queue.put(
-                                    (message.sentence_type, audio_datas, segment_text)
-                                )
+                        await self._submit_text(message.sentence_type, segment_text)
                 elif ContentType.FILE == message.content_type:
-                    self._process_remaining_text()
+                    await self._submit_remaining_text()
                     tts_file = message.content_file
                     if tts_file and os.path.exists(tts_file):
-                        audio_datas = self._process_audio_file(tts_file)
-                        self.tts_audio_queue.put(
-                            (message.sentence_type, audio_datas, message.content_detail)
+                        await self._submit_synthesis(
+                            message.sentence_type,
+                            message.content_detail,
+                            self._run_synthesis,
+                            self._load_file_audio,
+                            tts_file,
                         )
 
+                if message.sentence_type == SentenceType.LAST:
+                    await self._submit_remaining_text()
+                    # 句子结束标记同样按顺序放出
+                    self.tts_inflight.put_nowait(
+                        (None, message.sentence_type, message.content_detail, None)
+                    )
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.bind(tag=TAG).error(
+                    f"处理TTS文本失败: {str(e)}, 类型: {type(e).__name__}, 堆栈: {traceback.format_exc()}"
+                )
+
+    async def _submit_remaining_text(self):
+        segment_text = self._take_remaining_text()
+        if segment_text:
+            await self._submit_text(SentenceType.MIDDLE, segment_text)
+
+    async def _submit_text(self, sentence_type, text):
+        if self.stream_audio_enabled:
+            frames = asyncio.Queue()
+            await self._submit_synthesis(
+                sentence_type, text, self._stream_synthesis, text, frames, frames=frames
+            )
+        else:
+            await self._submit_synthesis(
+                sentence_type, text, self._run_synthesis, self._text_to_audio, text
+            )
+
+    async def _submit_synthesis(self, sentence_type, text, job, *args, frames=None):
+        """提交一个合成任务，本连接同时进行的合成数达到上限时等待
+
+        frames不为None时为流式合成，音频分批放入frames，任务结束后放入None。
+        """
+        await self.segment_slots.acquire()
+        task = asyncio.create_task(job(*args))
+        # 无论任务正常结束还是被取消（包括尚未开始就被取消），都归还名额
+        task.add_done_callback(lambda _: self.segment_slots.release())
+        if frames is not None:
+            task.add_done_callback(lambda _: frames.put_nowait(None))
+        self.tts_inflight.put_nowait((task, sentence_type, text, frames))
+
+    async def _run_synthesis(self, func, *args):
+        async with self.provider_semaphore:
+            return await run_blocking(func, *args)
+
+    async def _stream_synthesis(self, text, frames):
+        """边接收TTS音频边转码，每凑满若干帧就放入frames，相同的文本优先使用缓存"""
+        cache_key = tts_audio_cache.make_key(self, text, self.conn.audio_format)
+        audio_datas = await run_blocking(tts_audio_cache.get, cache_key)
+        if audio_datas is not None:
+            frames.put_nowait(audio_datas)
+            return
+        audio_datas = []
+        async with self.provider_semaphore:
+            decoder = StreamingAudioDecoder(
+                self.stream_audio_format, is_opus=self.conn.audio_format != "pcm"
+            )
+            try:
+                async for chunk in self.stream_audio(
+                    MarkdownCleaner.clean_markdown(text)
+                ):
+                    packets = await run_blocking(decoder.feed, chunk)
+                    if packets:
+                        audio_datas.extend(packets)
+                        frames.put_nowait(packets)
+                packets = await run_blocking(decoder.finish)
+                if packets:
+                    audio_datas.extend(packets)
+                    frames.put_nowait(packets)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.bind(tag=TAG).warning(f"流式语音合成失败: {text}，错误: {e}")
+                if audio_datas:
+                    return
+                # 尚未产出音频时改为整段合成，沿用其重试逻辑
+                audio_datas = await run_blocking(self._text_to_audio, text)
+                if audio_datas:
+                    frames.put_nowait(audio_datas)
+                return
+            finally:
+                decoder.close()
+        await run_blocking(tts_audio_cache.put, cache_key, audio_datas)
+
+    async def _tts_emit_task(self):
+        """按提交顺序取出合成结果放入音频队列"""
+        while not self.conn.stop_event.is_set():
+            task, sentence_type, text, frames = await self.tts_inflight.get()
+            if task is None:
+                self.tts_audio_queue.put((sentence_type, [], text))
+                continue
+            self.tts_emitting = (task, frames)
+            if frames is not None:
+                # 流式合成：每产出一批音频就放入音频队列，句子文本只随第一批发送
+                while True:
+                    packets = await frames.get()
+                    if packets is None:
+                        break
+                    self.tts_audio_queue.put((sentence_type, packets, text))
+                    text = None
+                self.tts_emitting = None
+                continue
+            await asyncio.wait([task])
+            self.tts_emitting = None
+            if task.cancelled():
+                continue
+            if task.exception() is not None:
+                logger.bind(tag=TAG).error(f"TTS合成失败: {text} {task.exception()}")
+                continue
+            audio_datas = task.result()
+            if audio_datas:
+                self.tts_audio_queue.put((sentence_type, audio_datas, text))
+
+    def cancel_pending(self):
+        """取消尚未放入音频队列的合成任务，用于打断和关闭连接"""
+        if self.tts_inflight is None:
+            return
+        if self.tts_emitting is not None:
+            task, frames = self.tts_emitting
+            task.cancel()
+            # 丢弃已产出但尚未放入音频队列的音频
+            while frames is not None and not frames.empty():
+                frames.get_nowait()
+        while True:
+            try:
+                task, _, _, _ = self.tts_inflight.get_nowait()
+            except asyncio.QueueEmpty:
+                break
+            if task is not None:
+                task.cancel()
+
+    # 这里默认是非流式的处理方式，基类在事件循环中处理(_tts_text_priority_task)
+    # 流式处理方式请在子类中重写，子类重写后在独立线程中运行
+    def tts_text_priority_thread(self):
+        while not self.conn.stop_event.is_set():
+            try:
+                message = self.tts_text_queue.get(timeout=1)
+                if message.sentence_type == SentenceType.FIRST:
+                    self.conn.client_abort = False
+                if self.conn.client_abort:
+                    logger.bind(tag=TAG).info("收到打断信息，终止TTS文本处理线程")
+                    continue
+                if message.sentence_type == SentenceType.FIRST:
+                    self._begin_sentence()
+                elif ContentType.TEXT == message.content_type:
+                    self.tts_text_buff.append(message.content_detail)
+                    segment_text = self._get_segment_text()
+                    if segment_text:
+                        self._synthesize_segment(message.sentence_type, segment_text)
+                elif ContentType.FILE == message.content_type:
+                    self._process_file_message(message)
+
                 if message.sentence_type == SentenceType.LAST:
                     self._process_remaining_text()
                     self.tts_audio_queue.put(
@@ -248,29 +523,29 @@ class TTSProviderBase(ABC):
                 )
                 continue
 
-    def _audio_play_priority_thread(self):
+    async def _audio_play_priority_task(self):
         while not self.conn.stop_event.is_set():
             text = None
             try:
-                try:
-                    sentence_type, audio_datas, text = self.tts_audio_queue.get(
-                        timeout=1
-                    )
-                except queue.Empty:
-                    if self.conn.stop_event.is_set():
-                        break
-                    continue
-                future = asyncio.run_coroutine_threadsafe(
-                    sendAudioMessage(self.conn, sentence_type, audio_datas, text),
-                    self.conn.loop,
-                )
-                future.result()
+                sentence_type, audio_datas, text = await self.tts_audio_queue.get()
+                if audio_datas and self.conn.turn_trace is not None:
+                    self.conn.turn_trace.mark("first_tts_segment")
+                await sendAudioMessage(self.conn, sentence_type, audio_datas, text)
                 if self.conn.max_output_size > 0 and text:
                     add_device_output(self.conn.headers.get("device-id"), len(text))
-                enqueue_tts_report(self.conn, text, audio_datas)
+                # 音乐文件的数据包按需读取，不整首上报
+                enqueue_tts_report(
+                    self.conn,
+                    text,
+                    None if isinstance(audio_datas, P3Stream) else audio_datas,
+                )
+                if isinstance(audio_datas, P3Stream):
+                    audio_datas.close()
+            except asyncio.CancelledError:
+                raise
             except Exception as e:
                 logger.bind(tag=TAG).error(
-                    f"audio_play_priority priority_thread: {text} {e}"
+                    f"audio_play_priority priority_task: {text} {e}"
                 )
 
     async def start_session(self, session_id):
@@ -361,23 +636,8 @@ class TTSProviderBase(ABC):
         Returns:
             bool: 是否成功处理了文本
         """
-        full_text = "".join(self.tts_text_buff)
-        remaining_text = full_text[self.processed_chars :]
-        if remaining_text:
-            segment_text = textUtils.get_string_no_punctuation_or_emoji(remaining_text)
-            if segment_text:
-                if self.delete_audio_file:
-                    audio_datas = self.to_tts(segment_text)
-                    if audio_datas:
-                        self.tts_audio_queue.put(
-                            (SentenceType.MIDDLE, audio_datas, segment_text)
-                        )
-                else:
-                    tts_file = self.to_tts(segment_text)
-                    audio_datas = self._process_audio_file(tts_file)
-                    self.tts_audio_queue.put(
-                        (SentenceType.MIDDLE, audio_datas, segment_text)
-                    )
-                self.processed_chars += len(full_text)
-                return True
+        segment_text = self._take_remaining_text()
+        if segment_text:
+            self._synthesize_segment(SentenceType.MIDDLE, segment_text)
+            return True
         return False
@@ -13,6 +13,8 @@ class TTSProvider(TTSProviderBase):
         else:
             self.voice = config.get("voice")
         self.audio_file_type = config.get("format", "mp3")
+        # Edge TTS以MP3分块返回音频
+        self.stream_audio_format = "mp3"
 
     def generate_filename(self, extension=".mp3"):
         return os.path.join(
@@ -20,6 +22,12 @@ class TTSProvider(TTSProviderBase):
             f"tts-{datetime.now().date()}@{uuid.uuid4().hex}{extension}",
         )
 
+    async def stream_audio(self, text):
+        communicate = edge_tts.Communicate(text, voice=self.voice)
+        async for chunk in communicate.stream():
+            if chunk["type"] == "audio":
+                yield chunk["data"]
+
     async def text_to_speak(self, text, output_file):
         try:
             communicate = edge_tts.Communicate(text, voice=self.voice)
@@ -36,11 +44,11 @@ class TTSProvider(TTSProviderBase):
                             f.write(chunk["data"])
             else:
                 # 返回音频二进制数据
-                audio_bytes = b""
+                audio_chunks = []
                 async for chunk in communicate.stream():
                     if chunk["type"] == "audio":
-                        audio_bytes += chunk["data"]
-                return audio_bytes
+                        audio_chunks.append(chunk["data"])
+                return b"".join(audio_chunks)
         except Exception as e:
             error_msg = f"Edge TTS请求失败: {e}"
             raise Exception(error_msg)  # 抛出异常，让调用方捕获
\ No newline at end of file
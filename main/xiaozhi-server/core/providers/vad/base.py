@@ -7,3 +7,15 @@ class VADProviderBase(ABC):
     def is_vad(self, conn, data) -> bool:
         """检测音频数据中的语音活动"""
         pass
+
+    async def is_vad_async(self, conn, data) -> bool:
+        """在事件循环中检测语音活动，支持批量推理的实现可重写此方法"""
+        return self.is_vad(conn, data)
+
+    def acquire_session(self):
+        """为连接租用独立的VAD会话，无需会话的实现返回None"""
+        return None
+
+    def release_session(self, session):
+        """连接关闭时归还VAD会话"""
+        pass
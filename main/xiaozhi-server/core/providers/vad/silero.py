@@ -1,13 +1,158 @@
+import os
+import copy
 import time
+import asyncio
+import threading
 import numpy as np
 import torch
 import opuslib_next
+from typing import List
 from config.logger import setup_logging
 from core.providers.vad.base import VADProviderBase
 
 TAG = __name__
 logger = setup_logging()
 
+# Silero模型在16kHz下的窗口大小和上下文长度
+WINDOW_SIZE_SAMPLES = 512
+CONTEXT_SIZE_SAMPLES = 64
+
+
+class SileroModelState:
+    """单个连接的Silero模型状态（RNN隐状态和上下文）"""
+
+    def __init__(self):
+        self.state = np.zeros((2, 128), dtype=np.float32)
+        self.context = np.zeros(CONTEXT_SIZE_SAMPLES, dtype=np.float32)
+
+    def reset(self):
+        self.state.fill(0)
+        self.context.fill(0)
+
+
+class VADSession:
+    """单个连接独占的VAD会话，持有独立的Opus解码器和模型状态"""
+
+    def __init__(self, model=None):
+        self.decoder = opuslib_next.Decoder(16000, 1)
+        # 逐窗口推理时使用的独立模型实例，批量推理时为None
+        self.model = model
+        # 批量推理时使用的模型状态
+        self.model_state = SileroModelState()
+
+    def reset(self):
+        self.decoder.reset_state()
+        if self.model is not None:
+            self.model.reset_states()
+        self.model_state.reset()
+
+
+class SileroBatchEngine:
+    """跨连接的Silero VAD批量推理引擎
+
+    收集所有连接待检测的512采样点窗口，按固定节拍合并为一次前向计算。
+    模型状态由每个连接的SileroModelState保存，推理时按批次拼接、推理后写回。
+    """
+
+    def __init__(self, model_path, interval_ms=10, max_batch_size=256):
+        import onnxruntime
+
+        opts = onnxruntime.SessionOptions()
+        opts.inter_op_num_threads = 1
+        opts.intra_op_num_threads = 1
+        self.session = onnxruntime.InferenceSession(
+            model_path, providers=["CPUExecutionProvider"], sess_options=opts
+        )
+        self.interval = max(int(interval_ms), 0) / 1000.0
+        self.max_batch_size = max(int(max_batch_size), 1)
+        self._sr = np.array(16000, dtype=np.int64)
+
+        self._pending = []
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    async def infer(self, model_state: SileroModelState, windows: List[np.ndarray]):
+        """提交一个连接的若干连续int16窗口，返回每个窗口的语音概率"""
+        if not windows:
+            return []
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        with self._lock:
+            self._pending.append((model_state, windows, future, loop))
+        self._wakeup.set()
+        return await future
+
+    def _run(self):
+        while True:
+            self._wakeup.wait()
+            # 等待一个节拍，让其他连接的窗口也进入本批次
+            if self.interval > 0:
+                time.sleep(self.interval)
+            with self._lock:
+                pending, self._pending = self._pending, []
+                self._wakeup.clear()
+            if not pending:
+                continue
+            try:
+                results = self._infer_pending(pending)
+                for (_, _, future, loop), probs in zip(pending, results):
+                    loop.call_soon_threadsafe(self._set_result, future, probs)
+            except Exception as e:
+                logger.bind(tag=TAG).error(f"VAD批量推理失败: {e}")
+                for _, _, future, loop in pending:
+                    loop.call_soon_threadsafe(self._set_exception, future, e)
+
+    def _infer_pending(self, pending):
+        """同一连接的窗口必须顺序推理，第N轮取每个连接的第N个窗口"""
+        results = [[] for _ in pending]
+        max_rounds = max(len(windows) for _, windows, _, _ in pending)
+        for round_index in range(max_rounds):
+            active = [
+                i for i, item in enumerate(pending) if len(item[1]) > round_index
+            ]
+            for start in range(0, len(active), self.max_batch_size):
+                batch = active[start : start + self.max_batch_size]
+                probs = self._forward(
+                    [pending[i][0] for i in batch],
+                    [pending[i][1][round_index] for i in batch],
+                )
+                for i, prob in zip(batch, probs):
+                    results[i].append(prob)
+        return results
+
+    def _forward(self, states: List[SileroModelState], windows: List[np.ndarray]):
+        batch_size = len(states)
+        x = np.empty(
+            (batch_size, CONTEXT_SIZE_SAMPLES + WINDOW_SIZE_SAMPLES), dtype=np.float32
+        )
+        state = np.empty((2, batch_size, 128), dtype=np.float32)
+        for i, (model_state, window) in enumerate(zip(states, windows)):
+            x[i, :CONTEXT_SIZE_SAMPLES] = model_state.context
+            # int16窗口直接归一化写入批次输入，避免中间数组
+            np.multiply(window, 1.0 / 32768.0, out=x[i, CONTEXT_SIZE_SAMPLES:])
+            state[:, i, :] = model_state.state
+
+        out, new_state = self.session.run(
+            None, {"input": x, "state": state, "sr": self._sr}
+        )
+
+        for i, model_state in enumerate(states):
+            model_state.state[...] = new_state[:, i, :]
+            model_state.context[...] = x[i, -CONTEXT_SIZE_SAMPLES:]
+        return out.reshape(batch_size, -1)[:, 0].tolist()
+
+    @staticmethod
+    def _set_result(future, result):
+        if not future.done():
+            future.set_result(result)
+
+    @staticmethod
+    def _set_exception(future, exc):
+        if not future.done():
+            future.set_exception(exc)
+
 
 class VADProvider(VADProviderBase):
     def __init__(self, config):
@@ -19,8 +164,6 @@ class VADProvider(VADProviderBase):
             force_reload=False,
         )
 
-        self.decoder = opuslib_next.Decoder(16000, 1)
-
         # 处理空字符串的情况
         threshold = config.get("threshold", "0.5")
         threshold_low = config.get("threshold_low", "0.2")
@@ -36,51 +179,133 @@ class VADProvider(VADProviderBase):
         # 至少要多少帧才算有语音
         self.frame_window_threshold = 3
 
+        # 批量推理引擎，开启后所有连接共享一次前向计算
+        self.batch_engine = None
+        if str(config.get("batch_inference", False)).lower() in ("true", "1", "yes"):
+            self.batch_engine = SileroBatchEngine(
+                os.path.join(
+                    config["model_dir"], "src", "silero_vad", "data", "silero_vad.onnx"
+                ),
+                interval_ms=config.get("batch_interval_ms") or 10,
+                max_batch_size=config.get("batch_max_size") or 256,
+            )
+            logger.bind(tag=TAG).info("SileroVAD批量推理已开启")
+
+        # 预分配VAD会话池，避免首个连接承担创建解码器和模型实例的开销
+        self._session_lock = threading.Lock()
+        self._session_pool = []
+        session_pool_size = int(config.get("session_pool_size") or 10)
+        for _ in range(session_pool_size):
+            self._session_pool.append(self._create_session())
+        logger.bind(tag=TAG).info(f"VAD会话池已预分配: {session_pool_size}")
+
+    def _create_session(self):
+        if self.batch_engine is not None:
+            return VADSession()
+        return VADSession(copy.deepcopy(self.model))
+
+    def acquire_session(self):
+        with self._session_lock:
+            session = self._session_pool.pop() if self._session_pool else None
+        if session is None:
+            logger.bind(tag=TAG).info("VAD会话池已耗尽，创建新的会话")
+            session = self._create_session()
+        # 在租出时重置，避免归还后仍在进行中的推理污染下一个连接
+        session.reset()
+        return session
+
+    def release_session(self, session):
+        if session is None:
+            return
+        with self._session_lock:
+            self._session_pool.append(session)
+
+    def _get_session(self, conn):
+        if conn.vad_session is None:
+            conn.vad_session = self.acquire_session()
+        return conn.vad_session
+
+    def _update_voice_state(self, conn, speech_prob):
+        """根据单个窗口的语音概率更新连接的VAD状态，返回当前是否有声音"""
+        # 双阈值判断
+        if speech_prob >= self.vad_threshold:
+            is_voice = True
+        elif speech_prob <= self.vad_threshold_low:
+            is_voice = False
+        else:
+            is_voice = conn.last_is_voice
+
+        # 声音没低于最低值则延续前一个状态，判断为有声音
+        conn.last_is_voice = is_voice
+
+        # 更新滑动窗口
+        conn.client_voice_window.append(is_voice)
+        client_have_voice = (
+            conn.client_voice_window.count(True) >= self.frame_window_threshold
+        )
+
+        # 如果之前有声音，但本次没有声音，且与上次有声音的时间差已经超过了静默阈值，则认为已经说完一句话
+        if conn.client_have_voice and not client_have_voice:
+            stop_duration = time.time() * 1000 - conn.last_activity_time
+            if stop_duration >= self.silence_threshold_ms:
+                conn.client_voice_stop = True
+        if client_have_voice:
+            conn.client_have_voice = True
+            conn.last_activity_time = time.time() * 1000
+        return client_have_voice
+
+    def _next_windows(self, conn):
+        """取出缓冲区中所有完整的512采样点窗口（int16视图，不复制）"""
+        windows = []
+        window = conn.client_audio_buffer.read_window()
+        while window is not None:
+            windows.append(window)
+            window = conn.client_audio_buffer.read_window()
+        return windows
+
     def is_vad(self, conn, opus_packet):
         try:
-            pcm_frame = self.decoder.decode(opus_packet, 960)
-            conn.client_audio_buffer.extend(pcm_frame)  # 将新数据加入缓冲区
+            session = self._get_session(conn)
+            pcm_frame = session.decoder.decode(opus_packet, 960)
+            conn.client_audio_buffer.write(pcm_frame)  # 将新数据加入缓冲区
 
             # 处理缓冲区中的完整帧（每次处理512采样点）
             client_have_voice = False
-            while len(conn.client_audio_buffer) >= 512 * 2:
-                # 提取前512个采样点（1024字节）
-                chunk = conn.client_audio_buffer[: 512 * 2]
-                conn.client_audio_buffer = conn.client_audio_buffer[512 * 2 :]
-
-                # 转换为模型需要的张量格式
-                audio_int16 = np.frombuffer(chunk, dtype=np.int16)
-                audio_float32 = audio_int16.astype(np.float32) / 32768.0
+            while True:
+                # 窗口归一化到复用的float32数组，张量与其共享内存
+                audio_float32 = conn.client_audio_buffer.read_window_float32()
+                if audio_float32 is None:
+                    break
                 audio_tensor = torch.from_numpy(audio_float32)
 
                 # 检测语音活动
                 with torch.no_grad():
-                    speech_prob = self.model(audio_tensor, 16000).item()
-
-                # 双阈值判断
-                if speech_prob >= self.vad_threshold:
-                    is_voice = True
-                elif speech_prob <= self.vad_threshold_low:
-                    is_voice = False
-                else:
-                    is_voice = conn.last_is_voice
-
-                # 声音没低于最低值则延续前一个状态，判断为有声音
-                conn.last_is_voice = is_voice
-
-                # 更新滑动窗口
-                conn.client_voice_window.append(is_voice)
-                client_have_voice = (conn.client_voice_window.count(True) >= self.frame_window_threshold)
-
-                # 如果之前有声音，但本次没有声音，且与上次有声音的时间差已经超过了静默阈值，则认为已经说完一句话
-                if conn.client_have_voice and not client_have_voice:
-                    stop_duration = time.time() * 1000 - conn.last_activity_time
-                    if stop_duration >= self.silence_threshold_ms:
-                        conn.client_voice_stop = True
-                if client_have_voice:
-                    conn.client_have_voice = True
-                    conn.last_activity_time = time.time() * 1000
+                    speech_prob = session.model(audio_tensor, 16000).item()
 
+                client_have_voice = self._update_voice_state(conn, speech_prob)
+
+            return client_have_voice
+        except opuslib_next.OpusError as e:
+            logger.bind(tag=TAG).info(f"解码错误: {e}")
+        except Exception as e:
+            logger.bind(tag=TAG).error(f"Error processing audio packet: {e}")
+
+    async def is_vad_async(self, conn, opus_packet):
+        if self.batch_engine is None:
+            return self.is_vad(conn, opus_packet)
+        try:
+            session = self._get_session(conn)
+            pcm_frame = session.decoder.decode(opus_packet, 960)
+            conn.client_audio_buffer.write(pcm_frame)  # 将新数据加入缓冲区
+
+            # 本连接的窗口提交给批量引擎，与其他连接的窗口一起推理
+            speech_probs = await self.batch_engine.infer(
+                session.model_state, self._next_windows(conn)
+            )
+
+            client_have_voice = False
+            for speech_prob in speech_probs:
+                client_have_voice = self._update_voice_state(conn, speech_prob)
             return client_have_voice
         except opuslib_next.OpusError as e:
             logger.bind(tag=TAG).info(f"解码错误: {e}")
@@ -0,0 +1,93 @@
+import time
+import queue
+import asyncio
+import threading
+import numpy as np
+from typing import Callable, List
+from config.logger import setup_logging
+
+TAG = __name__
+logger = setup_logging()
+
+
+class ASRBatchScheduler:
+    """进程级本地ASR批量调度器
+
+    所有连接说完的语音进入同一个队列，工作线程在max_wait_ms内凑满一个批次后
+    调用recognize_batch一次性识别，结果按提交顺序返回给各自的连接。
+    """
+
+    def __init__(
+        self,
+        recognize_batch: Callable[[List[np.ndarray]], List[str]],
+        max_batch_size=8,
+        max_wait_ms=10,
+        num_workers=1,
+    ):
+        self.recognize_batch = recognize_batch
+        self.max_batch_size = max(int(max_batch_size), 1)
+        self.max_wait = max(int(max_wait_ms), 0) / 1000.0
+        self._queue = queue.Queue()
+        self._workers = []
+        for i in range(max(int(num_workers), 1)):
+            worker = threading.Thread(
+                target=self._run, name=f"asr-batch-{i}", daemon=True
+            )
+            worker.start()
+            self._workers.append(worker)
+
+    async def submit(self, samples: np.ndarray) -> str:
+        """提交一段float32音频，等待识别结果"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._queue.put((samples, future, loop, time.monotonic()))
+        return await future
+
+    def _collect_batch(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            timeout = deadline - time.monotonic()
+            try:
+                if timeout > 0:
+                    batch.append(self._queue.get(timeout=timeout))
+                else:
+                    batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect_batch()
+            decode_start = time.monotonic()
+            try:
+                texts = self.recognize_batch([item[0] for item in batch])
+                # 结果数量不一致时无法确定对应关系，整批按失败处理，避免调用方一直等待
+                if len(texts) != len(batch):
+                    raise ValueError(
+                        f"识别结果数量({len(texts)})与批次大小({len(batch)})不一致"
+                    )
+            except Exception as e:
+                logger.bind(tag=TAG).error(f"ASR批量识别失败: {e}")
+                for _, future, loop, _ in batch:
+                    loop.call_soon_threadsafe(self._set_exception, future, e)
+                continue
+
+            decode_time = time.monotonic() - decode_start
+            for (_, future, loop, submit_time), text in zip(batch, texts):
+                queue_time = decode_start - submit_time
+                logger.bind(tag=TAG).info(
+                    f"ASR排队耗时: {queue_time:.3f}s | 批量识别耗时: {decode_time:.3f}s | 批次大小: {len(batch)}"
+                )
+                loop.call_soon_threadsafe(self._set_result, future, text)
+
+    @staticmethod
+    def _set_result(future, result):
+        if not future.done():
+            future.set_result(result)
+
+    @staticmethod
+    def _set_exception(future, exc):
+        if not future.done():
+            future.set_exception(exc)
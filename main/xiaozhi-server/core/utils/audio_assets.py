@@ -0,0 +1,71 @@
+"""
+静态提示音缓存
+
+绑定码、超出输出限制、唤醒词回复、结束提示音等固定音频只转码一次，
+之后按文件路径直接返回编码好的数据包。文件修改时间或大小变化时重新转码。
+数据包以元组保存，所有连接共享同一份数据，放入音频队列时不再复制。
+"""
+
+import os
+import threading
+from typing import Dict, Tuple
+from config.logger import setup_logging
+from core.utils import p3
+from core.utils.util import audio_to_data
+
+TAG = __name__
+logger = setup_logging()
+
+AUDIO_EXTENSIONS = (".wav", ".mp3", ".p3")
+
+
+class AudioAssetStore:
+    def __init__(self):
+        # (绝对路径, 是否Opus) -> ((修改时间, 文件大小), 数据包元组)
+        self._assets: Dict[tuple, tuple] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _signature(file_path: str) -> tuple:
+        stat = os.stat(file_path)
+        return stat.st_mtime_ns, stat.st_size
+
+    def get(self, file_path: str, is_opus: bool = True) -> Tuple[bytes, ...]:
+        """获取音频文件编码后的数据包，首次使用或文件变化时转码"""
+        key = (os.path.abspath(file_path), is_opus)
+        signature = self._signature(file_path)
+        with self._lock:
+            entry = self._assets.get(key)
+        if entry is not None and entry[0] == signature:
+            return entry[1]
+        if file_path.endswith(".p3") and is_opus:
+            packets, _ = p3.decode_opus_from_file(file_path)
+        else:
+            packets, _ = audio_to_data(file_path, is_opus=is_opus)
+        packets = tuple(packets)
+        with self._lock:
+            self._assets[key] = (signature, packets)
+        return packets
+
+    def put(self, file_path: str, packets, is_opus: bool = True):
+        """文件刚由已编码的数据生成时直接存入，避免再次转码"""
+        key = (os.path.abspath(file_path), is_opus)
+        with self._lock:
+            self._assets[key] = (self._signature(file_path), tuple(packets))
+
+    def preload(self, directory: str):
+        """预先转码目录（含子目录）下的所有音频文件"""
+        count = 0
+        for root, _, files in os.walk(directory):
+            for name in files:
+                if not name.lower().endswith(AUDIO_EXTENSIONS):
+                    continue
+                try:
+                    self.get(os.path.join(root, name))
+                    count += 1
+                except Exception as e:
+                    logger.bind(tag=TAG).warning(f"预加载提示音失败: {name}, {e}")
+        logger.bind(tag=TAG).info(f"提示音已预加载: {count}个")
+
+
+audio_assets = AudioAssetStore()
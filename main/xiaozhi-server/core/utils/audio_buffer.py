@@ -0,0 +1,155 @@
+import numpy as np
+from typing import Optional
+
+# 默认缓存30秒的16kHz单声道PCM
+DEFAULT_CAPACITY_SAMPLES = 16000 * 30
+# 缓冲区满时额外腾出的空间，避免每次写入都移动数据
+OVERFLOW_SLACK_SAMPLES = 16000
+# int16归一化系数，2的幂在float32中可精确表示
+PCM_SCALE = np.float32(1.0 / 32768.0)
+
+
+class PcmRingBuffer:
+    """固定容量的16位单声道PCM缓冲区
+
+    数据写入一次后，VAD按窗口读取视图（不复制），ASR读取保留区间内的完整语音。
+    所有位置都是自连接开始以来的绝对采样点序号，缓冲区只在空间不足时整理一次。
+    """
+
+    def __init__(self, capacity_samples=DEFAULT_CAPACITY_SAMPLES, window_size=512):
+        self._data = np.zeros(capacity_samples, dtype=np.int16)
+        self._window = np.empty(window_size, dtype=np.float32)
+        self.capacity = capacity_samples
+        self.window_size = window_size
+        # _data[0]对应的绝对位置和有效采样点数
+        self._base = 0
+        self._size = 0
+        # VAD读取位置
+        self._read_pos = 0
+        # ASR需要保留的起始位置，None表示无需保留
+        self._keep_pos: Optional[int] = None
+        # 保留区间超出容量、开头已被丢弃
+        self._retain_truncated = False
+
+    @property
+    def write_pos(self) -> int:
+        return self._base + self._size
+
+    def __len__(self):
+        """尚未被VAD读取的采样点数"""
+        return self.write_pos - self._read_pos
+
+    def write(self, pcm: bytes):
+        """写入PCM数据，返回写入区间的绝对位置(start, end)"""
+        samples = np.frombuffer(pcm, dtype=np.int16)
+        if len(samples) > self.capacity:
+            samples = samples[-self.capacity :]
+        if self._size + len(samples) > self.capacity:
+            self._compact(len(samples))
+        start = self.write_pos
+        self._data[self._size : self._size + len(samples)] = samples
+        self._size += len(samples)
+        return start, self.write_pos
+
+    def _compact(self, incoming: int):
+        """丢弃已不再需要的数据，把剩余数据移动到缓冲区头部"""
+        drop_to = self._read_pos
+        if self._keep_pos is not None:
+            drop_to = min(drop_to, self._keep_pos)
+        # 仍然放不下时丢弃最旧的数据
+        overflow = self.write_pos + incoming - self.capacity
+        if drop_to < overflow:
+            slack = min(OVERFLOW_SLACK_SAMPLES, self.capacity // 4)
+            drop_to = min(overflow + slack, self.write_pos)
+        if self._keep_pos is not None and drop_to > self._keep_pos:
+            self._retain_truncated = True
+        offset = drop_to - self._base
+        remain = self._size - offset
+        if remain > 0:
+            self._data[:remain] = self._data[offset : self._size]
+        self._base = drop_to
+        self._size = max(remain, 0)
+        self._read_pos = max(self._read_pos, self._base)
+        if self._keep_pos is not None:
+            self._keep_pos = max(self._keep_pos, self._base)
+
+    def read_window(self) -> Optional[np.ndarray]:
+        """读取下一个int16窗口视图，数据不足时返回None
+
+        视图在下一次write之前有效。
+        """
+        if len(self) < self.window_size:
+            return None
+        offset = self._read_pos - self._base
+        self._read_pos += self.window_size
+        return self._data[offset : offset + self.window_size]
+
+    def read_window_float32(self) -> Optional[np.ndarray]:
+        """读取下一个窗口并归一化为float32，结果写入复用的窗口数组
+
+        先转换类型再原地相乘，避免混合类型运算分配临时缓冲区。
+        """
+        window = self.read_window()
+        if window is None:
+            return None
+        np.copyto(self._window, window, casting="unsafe")
+        np.multiply(self._window, PCM_SCALE, out=self._window)
+        return self._window
+
+    def discard_pending(self):
+        """丢弃尚未读取的不完整窗口"""
+        self._read_pos = self.write_pos
+
+    @property
+    def retaining(self) -> bool:
+        return self._keep_pos is not None
+
+    @property
+    def retained_truncated(self) -> bool:
+        """保留的语音超过缓冲区容量，开头部分已被丢弃，调用方需改用原始音频包"""
+        return self._retain_truncated
+
+    @property
+    def retained_start(self) -> Optional[int]:
+        """保留区间的起始绝对位置，未保留时为None"""
+        return self._keep_pos
+
+    def retain_tail(self, samples: int):
+        """保留最近samples个采样点，供后续ASR读取"""
+        self._keep_pos = max(self._base, self.write_pos - samples)
+        self._retain_truncated = False
+
+    def read_float32(self, start: int) -> np.ndarray:
+        """读取从绝对位置start到当前写入位置的数据，归一化为新的float32数组"""
+        offset = max(start - self._base, 0)
+        return np.multiply(
+            self._data[offset : self._size], 1.0 / 32768.0, dtype=np.float32
+        )
+
+    def take_retained(self) -> bytes:
+        """取出保留区间内的PCM数据并结束保留"""
+        if self._keep_pos is None:
+            return b""
+        offset = self._keep_pos - self._base
+        self._keep_pos = None
+        self._retain_truncated = False
+        return self._data[offset : self._size].tobytes()
+
+    def clear(self):
+        self._base = self.write_pos
+        self._size = 0
+        self._read_pos = self._base
+        self._keep_pos = None
+        self._retain_truncated = False
+
+
+class AudioFrames(list):
+    """一段语音的原始音频包，以及VAD阶段已解码的PCM
+
+    行为与原始音频包列表一致，ASR、声纹识别和聊天记录上报直接读取pcm，
+    无需再次解码；pcm为空时由使用方自行解码。
+    """
+
+    def __init__(self, packets=(), pcm: bytes = b""):
+        super().__init__(packets)
+        self.pcm = pcm
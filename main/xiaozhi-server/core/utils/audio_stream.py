@@ -0,0 +1,387 @@
+"""
+TTS音频转码
+
+把MP3/WAV/PCM音频解码、重采样为16kHz单声道16位PCM，并按60ms切帧编码。
+WAV和PCM在进程内解析，MP3使用PyAV(libavcodec)在进程内解码，重采样使用numpy实现的多相滤波器；
+其他格式或未安装PyAV时才启动ffmpeg子进程。
+分块返回的音频可以边接收边转码，凑满60ms就编码为一帧，不必等整段音频下载完。
+"""
+
+import math
+import wave
+import struct
+import threading
+import subprocess
+import numpy as np
+from io import BytesIO
+from typing import List
+from numpy.lib.stride_tricks import sliding_window_view
+from core.utils.opus_encoder_utils import OpusEncoderUtils
+
+try:
+    import av
+except ImportError:
+    av = None
+
+TARGET_SAMPLE_RATE = 16000
+FRAME_DURATION = 60  # ms
+FRAME_BYTES = TARGET_SAMPLE_RATE * FRAME_DURATION // 1000 * 2
+# 由PyAV在进程内解码的格式，其余格式交给ffmpeg子进程
+AV_CODECS = {"mp3": "mp3"}
+# 一次计算的最大输出样本数，限制临时矩阵的内存
+RESAMPLE_BLOCK = 16000
+
+
+class PolyphaseResampler:
+    """有状态的多相FIR重采样，分块处理时块与块之间保持连续
+
+    滤波器与scipy.signal.resample_poly的默认设计一致：Kaiser窗(beta=5)，半宽10个周期。
+    """
+
+    def __init__(self, src_rate: int, dst_rate: int = TARGET_SAMPLE_RATE):
+        g = math.gcd(src_rate, dst_rate)
+        self.up = dst_rate // g
+        self.down = src_rate // g
+        self.passthrough = self.up == self.down
+        if self.passthrough:
+            return
+        max_rate = max(self.up, self.down)
+        length = 2 * 10 * max_rate + 1
+        t = np.arange(length) - (length - 1) / 2
+        h = np.sinc(t / max_rate) / max_rate * np.kaiser(length, 5.0) * self.up
+        self.taps = -(-length // self.up)
+        h = np.concatenate((h, np.zeros(self.taps * self.up - length)))
+        # phases[p, j] = h[j * up + p]，逆序后与输入窗口直接点乘
+        self.phases = h.reshape(self.taps, self.up).T[:, ::-1].astype(np.float32)
+        self.delay = (length - 1) // 2
+        # 缓冲区保存尚需使用的输入，起始处补零代替负下标的输入
+        self.buffer = np.zeros(self.taps - 1, dtype=np.float32)
+        self.buffer_start = -(self.taps - 1)
+        self.received = 0
+        self.produced = 0
+
+    def process(self, samples: np.ndarray) -> np.ndarray:
+        if self.passthrough:
+            return samples
+        self.received += len(samples)
+        return self._run(samples.astype(np.float32), self.received)
+
+    def flush(self) -> np.ndarray:
+        """补零输出剩余样本，输出总数与输入时长一致"""
+        if self.passthrough:
+            return np.zeros(0, dtype=np.float32)
+        total = -(-self.received * self.up // self.down)
+        padding = np.zeros(self.delay // self.up + self.taps + 1, dtype=np.float32)
+        output = self._run(padding, self.received + len(padding))
+        return output[: max(total - (self.produced - len(output)), 0)]
+
+    def _run(self, samples: np.ndarray, available: int) -> np.ndarray:
+        self.buffer = np.concatenate((self.buffer, samples))
+        # 输出n对应上采样域的位置k=n*down+delay，需要输入x[k//up-taps+1 .. k//up]
+        last = (available * self.up - 1 - self.delay) // self.down
+        count = max(last - self.produced + 1, 0)
+        outputs = []
+        windows = sliding_window_view(self.buffer, self.taps)
+        for offset in range(0, count, RESAMPLE_BLOCK):
+            n = self.produced + offset + np.arange(min(RESAMPLE_BLOCK, count - offset))
+            k = n * self.down + self.delay
+            rows = k // self.up - (self.taps - 1) - self.buffer_start
+            outputs.append(
+                np.einsum("ij,ij->i", windows[rows], self.phases[k % self.up])
+            )
+        self.produced += count
+        # 丢弃之后不再需要的输入
+        next_row = (
+            (self.produced * self.down + self.delay) // self.up
+            - (self.taps - 1)
+            - self.buffer_start
+        )
+        next_row = min(max(next_row, 0), len(self.buffer))
+        self.buffer = self.buffer[next_row:]
+        self.buffer_start += next_row
+        if not outputs:
+            return np.zeros(0, dtype=np.float32)
+        return np.concatenate(outputs)
+
+
+def to_pcm16(samples: np.ndarray) -> bytes:
+    if samples.dtype == np.int16:
+        return samples.tobytes()
+    return np.clip(np.round(samples), -32768, 32767).astype(np.int16).tobytes()
+
+
+class PcmSource:
+    """原始PCM(16位小端)，按需混为单声道并重采样"""
+
+    def __init__(self, sample_rate: int = TARGET_SAMPLE_RATE, channels: int = 1):
+        self.channels = channels
+        self.resampler = PolyphaseResampler(sample_rate)
+        self.pending = b""  # 不足一个采样帧的字节
+
+    def feed(self, data: bytes) -> bytes:
+        data = self.pending + data
+        frame_width = 2 * self.channels
+        usable = len(data) - len(data) % frame_width
+        self.pending = data[usable:]
+        if usable == 0:
+            return b""
+        samples = np.frombuffer(data[:usable], dtype=np.int16)
+        if self.channels > 1:
+            samples = samples.reshape(-1, self.channels).mean(axis=1)
+        return to_pcm16(self.resampler.process(samples))
+
+    def finish(self) -> bytes:
+        return to_pcm16(self.resampler.flush())
+
+    def close(self):
+        pass
+
+
+class WavSource(PcmSource):
+    """WAV流：先解析文件头，之后按PCM处理。流式返回的WAV头中数据长度常常不准确，因此忽略长度"""
+
+    def __init__(self):
+        super().__init__()
+        self.header = b""
+        self.in_data = False
+
+    def feed(self, data: bytes) -> bytes:
+        if self.in_data:
+            return super().feed(data)
+        self.header += data
+        body = self._parse_header()
+        if body is None:
+            return b""
+        self.in_data = True
+        self.header = b""
+        return super().feed(body)
+
+    def _parse_header(self):
+        """解析到data块时返回其后的数据，头部尚不完整时返回None"""
+        header = self.header
+        if len(header) < 12:
+            return None
+        if header[:4] != b"RIFF" or header[8:12] != b"WAVE":
+            raise ValueError("不是有效的WAV数据")
+        offset = 12
+        while offset + 8 <= len(header):
+            chunk_id = header[offset : offset + 4]
+            chunk_size = struct.unpack("<I", header[offset + 4 : offset + 8])[0]
+            if chunk_id == b"data":
+                return header[offset + 8 :]
+            if offset + 8 + chunk_size > len(header):
+                return None
+            if chunk_id == b"fmt ":
+                audio_format, channels, sample_rate = struct.unpack(
+                    "<HHI", header[offset + 8 : offset + 16]
+                )
+                bits = struct.unpack("<H", header[offset + 22 : offset + 24])[0]
+                if audio_format != 1 or bits != 16:
+                    raise ValueError(f"不支持的WAV编码: format={audio_format}, bits={bits}")
+                self.channels = channels
+                self.resampler = PolyphaseResampler(sample_rate)
+            offset += 8 + chunk_size + (chunk_size & 1)
+        return None
+
+
+class AvSource:
+    """使用PyAV的解码器增量解码压缩音频，同一个解码器处理整段音频"""
+
+    def __init__(self, audio_format: str):
+        self.codec = av.CodecContext.create(AV_CODECS[audio_format], "r")
+        self.resampler = None
+
+    def feed(self, data: bytes) -> bytes:
+        pcm = []
+        for packet in self.codec.parse(data):
+            pcm.extend(self._decode(packet))
+        return b"".join(pcm)
+
+    def finish(self) -> bytes:
+        pcm = []
+        for packet in self.codec.parse(None):
+            pcm.extend(self._decode(packet))
+        pcm.extend(self._decode(None))
+        if self.resampler is not None:
+            pcm.append(to_pcm16(self.resampler.flush()))
+        return b"".join(pcm)
+
+    def _decode(self, packet):
+        for frame in self.codec.decode(packet):
+            if self.resampler is None:
+                self.resampler = PolyphaseResampler(frame.sample_rate)
+            yield to_pcm16(self.resampler.process(self._mono(frame)))
+
+    @staticmethod
+    def _mono(frame) -> np.ndarray:
+        samples = frame.to_ndarray()
+        channels = len(frame.layout.channels)
+        if frame.format.is_planar:
+            samples = samples.mean(axis=0)
+        else:
+            samples = samples.reshape(-1, channels).mean(axis=1)
+        name = frame.format.name
+        if name.startswith("flt") or name.startswith("dbl"):
+            return samples * 32768
+        if name.startswith("s32"):
+            return samples / 65536
+        return samples
+
+    def close(self):
+        pass
+
+
+class FFmpegSource:
+    """其他压缩格式：数据持续写入常驻的ffmpeg进程，由读取线程收集解码后的PCM"""
+
+    def __init__(self, audio_format: str):
+        self.process = subprocess.Popen(
+            [
+                "ffmpeg",
+                "-nostdin",
+                "-loglevel",
+                "error",
+                "-f",
+                audio_format,
+                "-i",
+                "pipe:0",
+                "-f",
+                "s16le",
+                "-ac",
+                "1",
+                "-ar",
+                str(TARGET_SAMPLE_RATE),
+                "pipe:1",
+            ],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+        )
+        self.output = bytearray()
+        self.lock = threading.Lock()
+        # 读取线程持续取走输出，避免输出管道写满后ffmpeg停止读取输入
+        self.reader = threading.Thread(target=self._read_output, daemon=True)
+        self.reader.start()
+
+    def _read_output(self):
+        stdout = self.process.stdout
+        while True:
+            data = stdout.read1(8192)
+            if not data:
+                break
+            with self.lock:
+                self.output.extend(data)
+
+    def _take_output(self) -> bytes:
+        with self.lock:
+            data = bytes(self.output)
+            self.output.clear()
+        return data
+
+    def feed(self, data: bytes) -> bytes:
+        self.process.stdin.write(data)
+        self.process.stdin.flush()
+        return self._take_output()
+
+    def finish(self) -> bytes:
+        self.process.stdin.close()
+        self.reader.join(timeout=10)
+        self.process.wait(timeout=5)
+        return self._take_output()
+
+    def close(self):
+        if self.process.poll() is None:
+            self.process.kill()
+            self.process.wait()
+        for pipe in (self.process.stdin, self.process.stdout):
+            try:
+                pipe.close()
+            except (OSError, ValueError):
+                pass
+
+
+def supports_in_process(audio_format: str) -> bool:
+    """该格式能否不启动子进程完成转码"""
+    audio_format = audio_format.lower()
+    return audio_format in ("pcm", "wav") or (av is not None and audio_format in AV_CODECS)
+
+
+def create_source(
+    audio_format: str, sample_rate: int = TARGET_SAMPLE_RATE, channels: int = 1
+):
+    audio_format = audio_format.lower()
+    if audio_format == "pcm":
+        return PcmSource(sample_rate, channels)
+    if audio_format == "wav":
+        return WavSource()
+    if av is not None and audio_format in AV_CODECS:
+        return AvSource(audio_format)
+    return FFmpegSource(audio_format)
+
+
+def decode_wav_bytes(audio_bytes: bytes) -> bytes:
+    """完整的WAV数据转为16kHz单声道PCM，使用文件头中的数据长度"""
+    with wave.open(BytesIO(audio_bytes), "rb") as wf:
+        if wf.getsampwidth() != 2:
+            raise ValueError(f"不支持的WAV位深: {wf.getsampwidth() * 8}")
+        source = PcmSource(wf.getframerate(), wf.getnchannels())
+        frames = wf.readframes(wf.getnframes())
+    return source.feed(frames) + source.finish()
+
+
+def decode_audio_bytes(audio_bytes: bytes, audio_format: str) -> bytes:
+    """整段音频转为16kHz单声道16位PCM，调用前应先用supports_in_process判断"""
+    audio_format = audio_format.lower()
+    if audio_format == "wav":
+        return decode_wav_bytes(audio_bytes)
+    source = create_source(audio_format)
+    try:
+        return source.feed(audio_bytes) + source.finish()
+    finally:
+        source.close()
+
+
+class StreamingAudioDecoder:
+    """把TTS分块返回的音频增量转为Opus帧(或60ms的PCM帧)
+
+    每次feed返回本次已凑满的帧，finish返回剩余数据补零后的最后一帧。
+    """
+
+    def __init__(
+        self,
+        audio_format: str,
+        is_opus: bool = True,
+        sample_rate: int = TARGET_SAMPLE_RATE,
+        channels: int = 1,
+    ):
+        self.source = create_source(audio_format, sample_rate, channels)
+        self.encoder = (
+            OpusEncoderUtils(TARGET_SAMPLE_RATE, 1, FRAME_DURATION) if is_opus else None
+        )
+        self.pcm_buffer = bytearray()
+
+    def feed(self, data: bytes) -> List[bytes]:
+        return self._frames(self.source.feed(data), False)
+
+    def finish(self) -> List[bytes]:
+        return self._frames(self.source.finish(), True)
+
+    def close(self):
+        self.source.close()
+
+    def _frames(self, pcm: bytes, end_of_stream: bool) -> List[bytes]:
+        if self.encoder is not None:
+            if not pcm and not end_of_stream:
+                return []
+            return self.encoder.encode_pcm_to_opus(pcm, end_of_stream)
+        self.pcm_buffer.extend(pcm)
+        frames = []
+        offset = 0
+        while len(self.pcm_buffer) - offset >= FRAME_BYTES:
+            frames.append(bytes(self.pcm_buffer[offset : offset + FRAME_BYTES]))
+            offset += FRAME_BYTES
+        del self.pcm_buffer[:offset]
+        if end_of_stream and self.pcm_buffer:
+            frames.append(bytes(self.pcm_buffer).ljust(FRAME_BYTES, b"\x00"))
+            self.pcm_buffer.clear()
+        return frames
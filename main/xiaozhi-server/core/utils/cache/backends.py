@@ -0,0 +1,262 @@
+"""
+共享缓存后端
+
+多个服务进程共用的二级缓存。条目按缓存名称（缓存类型+命名空间）隔离，
+值以JSON序列化为字节保存，无法序列化的值只保留在进程内缓存中。
+"""
+
+import os
+import json
+import time
+import hashlib
+import threading
+from abc import ABC, abstractmethod
+from typing import Any, Dict, Optional, Tuple
+
+
+def dumps(value: Any) -> bytes:
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def loads(data: bytes) -> Any:
+    return json.loads(data.decode("utf-8"))
+
+
+class CacheBackend(ABC):
+    """共享缓存后端接口"""
+
+    @abstractmethod
+    def get(self, cache_name: str, key: str) -> Optional[Tuple[bytes, Optional[float]]]:
+        """返回(数据, 过期时间戳)，不存在或已过期时返回None"""
+        pass
+
+    @abstractmethod
+    def set(self, cache_name: str, key: str, data: bytes, ttl: Optional[float]) -> None:
+        pass
+
+    @abstractmethod
+    def delete(self, cache_name: str, key: str) -> bool:
+        pass
+
+    @abstractmethod
+    def clear(self, cache_name: str) -> None:
+        pass
+
+    @abstractmethod
+    def invalidate_pattern(self, cache_name: str, pattern: str) -> int:
+        pass
+
+    def sweep(self) -> int:
+        """删除所有已过期的条目，返回删除的条数，由缓存管理器的清理线程定期调用"""
+        return 0
+
+    def close(self) -> None:
+        pass
+
+
+class MemoryBackend(CacheBackend):
+    """进程内实现，只在单进程中共享，可作为测试替身"""
+
+    def __init__(self):
+        self._data: Dict[str, Dict[str, Tuple[bytes, Optional[float]]]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, cache_name, key):
+        with self._lock:
+            entry = self._data.get(cache_name, {}).get(key)
+            if entry is None:
+                return None
+            if entry[1] is not None and entry[1] < time.time():
+                del self._data[cache_name][key]
+                return None
+            return entry
+
+    def set(self, cache_name, key, data, ttl):
+        expire_at = time.time() + ttl if ttl is not None else None
+        with self._lock:
+            self._data.setdefault(cache_name, {})[key] = (data, expire_at)
+
+    def delete(self, cache_name, key):
+        with self._lock:
+            return self._data.get(cache_name, {}).pop(key, None) is not None
+
+    def clear(self, cache_name):
+        with self._lock:
+            self._data.pop(cache_name, None)
+
+    def invalidate_pattern(self, cache_name, pattern):
+        with self._lock:
+            entries = self._data.get(cache_name, {})
+            keys = [key for key in entries if pattern in key]
+            for key in keys:
+                del entries[key]
+            return len(keys)
+
+    def sweep(self):
+        now = time.time()
+        deleted = 0
+        with self._lock:
+            for entries in self._data.values():
+                expired = [
+                    key
+                    for key, (_, expire_at) in entries.items()
+                    if expire_at is not None and expire_at < now
+                ]
+                for key in expired:
+                    del entries[key]
+                deleted += len(expired)
+        return deleted
+
+
+class FileBackend(CacheBackend):
+    """基于目录的实现，同一台机器上的多个进程共享
+
+    每个条目一个文件，首行为包含键和过期时间的JSON头，之后是数据。
+    写入先写临时文件再原子替换，读取方不会看到写了一半的条目。
+    定期清理时删除过期条目和残留的临时文件，总大小超过max_bytes时从最早过期的条目开始删除。
+    """
+
+    # 超过此时间（秒）仍未被替换的临时文件视为写入进程已退出时残留
+    STALE_TMP_SECONDS = 600
+
+    def __init__(self, directory: str, max_bytes: Optional[int] = None):
+        self.directory = os.path.abspath(directory)
+        self.max_bytes = max_bytes
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _dir(self, cache_name: str) -> str:
+        return os.path.join(self.directory, cache_name.replace(os.sep, "_"))
+
+    def _path(self, cache_name: str, key: str) -> str:
+        digest = hashlib.sha1(key.encode("utf-8")).hexdigest()
+        return os.path.join(self._dir(cache_name), f"{digest}.entry")
+
+    @staticmethod
+    def _read(path: str):
+        with open(path, "rb") as f:
+            header = json.loads(f.readline())
+            return header, f.read()
+
+    @staticmethod
+    def _read_header(path: str) -> dict:
+        with open(path, "rb") as f:
+            return json.loads(f.readline())
+
+    def get(self, cache_name, key):
+        path = self._path(cache_name, key)
+        try:
+            header, data = self._read(path)
+        except (OSError, ValueError):
+            return None
+        # 哈希冲突时视为未命中
+        if header.get("key") != key:
+            return None
+        expire_at = header.get("expire_at")
+        if expire_at is not None and expire_at < time.time():
+            self._unlink(path)
+            return None
+        return data, expire_at
+
+    def set(self, cache_name, key, data, ttl):
+        path = self._path(cache_name, key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        expire_at = time.time() + ttl if ttl is not None else None
+        header = json.dumps({"key": key, "expire_at": expire_at}, ensure_ascii=False)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, "wb") as f:
+                f.write(header.encode("utf-8") + b"\n")
+                f.write(data)
+            os.replace(tmp_path, path)
+        finally:
+            self._unlink(tmp_path)
+
+    @staticmethod
+    def _unlink(path: str) -> bool:
+        try:
+            os.remove(path)
+            return True
+        except OSError:
+            return False
+
+    def delete(self, cache_name, key):
+        return self._unlink(self._path(cache_name, key))
+
+    def _entries(self, cache_name: str):
+        directory = self._dir(cache_name)
+        if not os.path.isdir(directory):
+            return []
+        return [
+            os.path.join(directory, name)
+            for name in os.listdir(directory)
+            if name.endswith(".entry")
+        ]
+
+    def clear(self, cache_name):
+        for path in self._entries(cache_name):
+            self._unlink(path)
+
+    def invalidate_pattern(self, cache_name, pattern):
+        deleted = 0
+        for path in self._entries(cache_name):
+            try:
+                header, _ = self._read(path)
+            except (OSError, ValueError):
+                continue
+            if pattern in header.get("key", "") and self._unlink(path):
+                deleted += 1
+        return deleted
+
+    def sweep(self):
+        now = time.time()
+        deleted = 0
+        # (过期时间, 路径, 大小)，未设置过期时间的条目排在最后
+        entries = []
+        total = 0
+        for root, _, names in os.walk(self.directory):
+            for name in names:
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                    if name.endswith(".tmp"):
+                        if stat.st_mtime < now - self.STALE_TMP_SECONDS:
+                            self._unlink(path)
+                        continue
+                    if not name.endswith(".entry"):
+                        continue
+                    expire_at = self._read_header(path).get("expire_at")
+                except (OSError, ValueError):
+                    continue
+                if expire_at is not None and expire_at < now:
+                    if self._unlink(path):
+                        deleted += 1
+                    continue
+                if expire_at is None:
+                    expire_at = float("inf")
+                entries.append((expire_at, path, stat.st_size))
+                total += stat.st_size
+        if self.max_bytes and total > self.max_bytes:
+            entries.sort()
+            for _, path, size in entries:
+                if total <= self.max_bytes:
+                    break
+                if self._unlink(path):
+                    deleted += 1
+                total -= size
+        return deleted
+
+
+def create_backend(config: dict) -> Optional[CacheBackend]:
+    """根据配置创建共享缓存后端，backend为none时返回None"""
+    backend = str(config.get("backend", "none")).lower()
+    if backend in ("", "none"):
+        return None
+    if backend == "memory":
+        return MemoryBackend()
+    if backend == "file":
+        max_mb = config.get("file_max_mb", 512)
+        return FileBackend(
+            config.get("file_dir", "tmp/shared_cache"),
+            max_bytes=int(float(max_mb) * 1024 * 1024) if max_mb else None,
+        )
+    raise ValueError(f"不支持的共享缓存后端: {backend}")
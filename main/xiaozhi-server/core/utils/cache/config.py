@@ -18,6 +18,7 @@ class CacheType(Enum):
     IP_INFO = "ip_info"
     CONFIG = "config"
     DEVICE_PROMPT = "device_prompt"
+    TTS_AUDIO = "tts_audio"
 
 
 @dataclass
@@ -27,6 +28,7 @@ class CacheConfig:
     strategy: CacheStrategy = CacheStrategy.TTL
     ttl: Optional[float] = 300  # 默认5分钟
     max_size: Optional[int] = 1000  # 默认最大1000条
+    max_bytes: Optional[int] = None  # 估算占用字节上限，None表示不限制
     cleanup_interval: float = 60  # 清理间隔（秒）
 
     @classmethod
@@ -54,5 +56,11 @@ class CacheConfig:
             CacheType.DEVICE_PROMPT: cls(
                 strategy=CacheStrategy.TTL, ttl=None, max_size=1000  # 手动失效
             ),
+            CacheType.TTS_AUDIO: cls(
+                strategy=CacheStrategy.LRU,
+                ttl=None,
+                max_size=500,
+                max_bytes=64 * 1024 * 1024,  # 按使用频率淘汰
+            ),
         }
         return configs.get(cache_type, cls())
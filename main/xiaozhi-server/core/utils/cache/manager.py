@@ -1,13 +1,79 @@
 """
 全局缓存管理器
+
+每个缓存空间（缓存类型+命名空间）按键的哈希分为若干分片，每个分片有独立的锁、
+LRU顺序（OrderedDict，读写均为O(1)）和过期时间堆，不同空间、不同分片之间互不阻塞。
+超出条数或字节上限时淘汰分片内排在最前的条目（LRU类策略读取时刷新顺序）；过期条目在读取时或由后台清理线程删除。
+命中、未命中、淘汰、过期等计数按空间分别记录，均在锁内更新。
+
+配置了共享缓存后端时，指定类型的缓存同时写入后端，进程内未命中时再从后端读取，
+多个服务进程可以复用意图识别、天气等结果，进程内缓存作为近端缓存保留热点数据。
 """
 
 import time
+import heapq
 import threading
-from typing import Any, Optional, Dict
+from typing import Any, Optional, Dict, Iterable, List, Set
 from collections import OrderedDict
-from .strategies import CacheStrategy, CacheEntry
+from .strategies import CacheStrategy, CacheEntry, estimate_size
 from .config import CacheConfig, CacheType
+from .backends import CacheBackend, dumps, loads
+
+# 条数上限不小于此值的缓存空间才分片，小缓存保持单一分片以精确执行LRU
+MIN_ENTRIES_PER_STRIPE = 64
+MAX_STRIPES = 16
+# 后台清理线程的最长检查间隔（秒）
+MAX_SWEEP_INTERVAL = 60
+# 共享缓存后端的默认清理间隔（秒）
+BACKEND_SWEEP_INTERVAL = 300
+
+COUNTERS = ("hits", "misses", "evictions", "expirations")
+
+
+class _Stripe:
+    """缓存空间中的一个分片"""
+
+    __slots__ = ("lock", "entries", "expiry", "bytes", "counters")
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.entries: "OrderedDict[str, CacheEntry]" = OrderedDict()
+        # (过期时间, 键)，条目被覆盖或删除后堆中的旧记录在弹出时跳过
+        self.expiry: List[tuple] = []
+        self.bytes = 0
+        self.counters = dict.fromkeys(COUNTERS, 0)
+
+
+class _CacheSpace:
+    """一个缓存空间，条数和字节上限平均分配到各分片"""
+
+    def __init__(self, config: CacheConfig):
+        stripes = 1
+        if config.max_size and config.max_size >= MIN_ENTRIES_PER_STRIPE * 2:
+            stripes = min(MAX_STRIPES, config.max_size // MIN_ENTRIES_PER_STRIPE)
+        self.stripes = [_Stripe() for _ in range(stripes)]
+        self.extra_lock = threading.Lock()
+        self.extra: Dict[str, int] = {}
+        self.apply_config(config)
+
+    def apply_config(self, config: CacheConfig):
+        self.config = config
+        count = len(self.stripes)
+        # LRU类策略读取时刷新顺序，其余策略按写入顺序淘汰
+        self.refresh_on_read = config.strategy in (
+            CacheStrategy.LRU,
+            CacheStrategy.TTL_LRU,
+        )
+        # 向下取整，各分片之和不超过总上限
+        self.stripe_max_size = (
+            max(1, config.max_size // count) if config.max_size else None
+        )
+        self.stripe_max_bytes = (
+            max(1, config.max_bytes // count) if config.max_bytes else None
+        )
+
+    def stripe(self, key: str) -> _Stripe:
+        return self.stripes[hash(key) % len(self.stripes)]
 
 
 class GlobalCacheManager:
@@ -15,12 +81,20 @@ class GlobalCacheManager:
 
     def __init__(self):
         self._logger = None
-        self._caches: Dict[str, Dict[str, CacheEntry]] = {}
+        self._spaces: Dict[str, _CacheSpace] = {}
         self._configs: Dict[str, CacheConfig] = {}
-        self._locks: Dict[str, threading.RLock] = {}
-        self._global_lock = threading.RLock()
-        self._last_cleanup = time.time()
-        self._stats = {"hits": 0, "misses": 0, "evictions": 0, "cleanups": 0}
+        # 只在创建缓存空间和修改配置时使用，读写缓存不经过此锁
+        self._global_lock = threading.Lock()
+        self._cleanups = 0
+        self._sweeper = None
+        self._sweeper_stop = threading.Event()
+        # 共享缓存后端，None表示只使用进程内缓存
+        self._backend: Optional[CacheBackend] = None
+        self._shared_types: Set[CacheType] = set()
+        self._near_ttl = 60
+        self._max_ttl = 3600
+        self._backend_sweep_interval = BACKEND_SWEEP_INTERVAL
+        self._backend_swept_at = 0.0
 
     @property
     def logger(self):
@@ -37,20 +111,154 @@ class GlobalCacheManager:
             return f"{cache_type.value}:{namespace}"
         return cache_type.value
 
-    def _get_or_create_cache(
-        self, cache_name: str, config: CacheConfig
-    ) -> Dict[str, CacheEntry]:
-        """获取或创建缓存空间"""
+    def configure(
+        self, cache_type: CacheType, config: CacheConfig, namespace: str = ""
+    ) -> None:
+        """覆盖缓存类型的预设配置，已存在的缓存空间在之后的写入时按新上限淘汰"""
+        cache_name = self._get_cache_name(cache_type, namespace)
         with self._global_lock:
-            if cache_name not in self._caches:
-                self._caches[cache_name] = (
-                    OrderedDict()
-                    if config.strategy in [CacheStrategy.LRU, CacheStrategy.TTL_LRU]
-                    else {}
+            self._configs[cache_name] = config
+            space = self._spaces.get(cache_name)
+            if space is not None:
+                space.apply_config(config)
+
+    def configure_backend(
+        self,
+        backend: Optional[CacheBackend],
+        shared_types: Iterable[CacheType] = (),
+        near_ttl: float = 60,
+        max_ttl: float = 3600,
+        sweep_interval: float = BACKEND_SWEEP_INTERVAL,
+    ) -> None:
+        """设置共享缓存后端，只有shared_types中的缓存类型会读写共享缓存
+
+        进程内缓存作为近端缓存：从共享缓存读到的值最多在本进程保留near_ttl秒，
+        未设置过期时间的条目在共享缓存中最多保留max_ttl秒。
+        后台清理线程每隔sweep_interval秒清理一次共享缓存中的过期条目。
+        """
+        if self._backend is not None and self._backend is not backend:
+            self._backend.close()
+        self._shared_types = set(shared_types)
+        self._near_ttl = near_ttl
+        self._max_ttl = max_ttl
+        self._backend_sweep_interval = sweep_interval
+        self._backend = backend
+        if backend is not None:
+            with self._global_lock:
+                self._start_sweeper()
+
+    def _get_space(self, cache_name: str) -> Optional[_CacheSpace]:
+        return self._spaces.get(cache_name)
+
+    def _get_or_create_space(
+        self, cache_name: str, cache_type: CacheType
+    ) -> _CacheSpace:
+        """获取或创建缓存空间，已存在时不加全局锁"""
+        space = self._spaces.get(cache_name)
+        if space is not None:
+            return space
+        with self._global_lock:
+            space = self._spaces.get(cache_name)
+            if space is None:
+                config = self._configs.get(cache_name) or CacheConfig.for_type(
+                    cache_type
                 )
                 self._configs[cache_name] = config
-                self._locks[cache_name] = threading.RLock()
-            return self._caches[cache_name]
+                space = _CacheSpace(config)
+                self._spaces[cache_name] = space
+            self._start_sweeper()
+            return space
+
+    def record(
+        self, cache_type: CacheType, stat: str, amount: int = 1, namespace: str = ""
+    ) -> None:
+        """记录附加指标，例如缓存命中节省的字节数"""
+        cache_name = self._get_cache_name(cache_type, namespace)
+        space = self._get_or_create_space(cache_name, cache_type)
+        with space.extra_lock:
+            space.extra[stat] = space.extra.get(stat, 0) + amount
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取全局和各缓存空间的统计信息"""
+        totals = dict.fromkeys(COUNTERS, 0)
+        caches = {}
+        for cache_name, space in list(self._spaces.items()):
+            stats = dict.fromkeys(COUNTERS, 0)
+            stats["size"] = 0
+            stats["bytes"] = 0
+            for stripe in space.stripes:
+                with stripe.lock:
+                    for name in COUNTERS:
+                        stats[name] += stripe.counters[name]
+                    stats["size"] += len(stripe.entries)
+                    stats["bytes"] += stripe.bytes
+            with space.extra_lock:
+                stats.update(space.extra)
+            total = stats["hits"] + stats["misses"]
+            stats["hit_rate"] = round(stats["hits"] / total, 4) if total else 0.0
+            caches[cache_name] = stats
+            for name in COUNTERS:
+                totals[name] += stats[name]
+        return {**totals, "cleanups": self._cleanups, "caches": caches}
+
+    def _remove(self, stripe: _Stripe, key: str) -> CacheEntry:
+        """删除条目，调用方需持有分片锁"""
+        entry = stripe.entries.pop(key)
+        stripe.bytes -= entry.size
+        return entry
+
+    def _evict(self, space: _CacheSpace, stripe: _Stripe):
+        """超出上限时淘汰排在最前的条目，调用方需持有分片锁"""
+        max_size = space.stripe_max_size
+        max_bytes = space.stripe_max_bytes
+        while stripe.entries and (
+            (max_size and len(stripe.entries) > max_size)
+            or (max_bytes and stripe.bytes > max_bytes)
+        ):
+            key = next(iter(stripe.entries))
+            self._remove(stripe, key)
+            stripe.counters["evictions"] += 1
+
+    def _expire(self, stripe: _Stripe, now: float) -> int:
+        """删除已到期的条目，调用方需持有分片锁"""
+        deleted = 0
+        expiry = stripe.expiry
+        while expiry and expiry[0][0] < now:
+            expire_at, key = heapq.heappop(expiry)
+            entry = stripe.entries.get(key)
+            # 条目已被覆盖或删除时跳过旧记录
+            if entry is not None and entry.expire_at == expire_at:
+                self._remove(stripe, key)
+                stripe.counters["expirations"] += 1
+                deleted += 1
+        # 旧记录过多时重建堆，避免反复覆盖同一个键导致堆无限增长
+        if len(expiry) > 2 * len(stripe.entries) + 64:
+            stripe.expiry = [
+                (entry.expire_at, key)
+                for key, entry in stripe.entries.items()
+                if entry.ttl is not None
+            ]
+            heapq.heapify(stripe.expiry)
+        return deleted
+
+    def _local_set(
+        self, space: _CacheSpace, key: str, value: Any, ttl: Optional[float]
+    ) -> None:
+        entry = CacheEntry(
+            value=value,
+            timestamp=time.time(),
+            ttl=ttl,
+            size=estimate_size(value) if space.config.max_bytes else 0,
+        )
+        stripe = space.stripe(key)
+        with stripe.lock:
+            if key in stripe.entries:
+                self._remove(stripe, key)
+            stripe.entries[key] = entry
+            stripe.bytes += entry.size
+            if ttl is not None:
+                heapq.heappush(stripe.expiry, (entry.expire_at, key))
+            self._evict(space, stripe)
 
     def set(
         self,
@@ -59,157 +267,198 @@ class GlobalCacheManager:
         value: Any,
         ttl: Optional[float] = None,
         namespace: str = "",
+        shared: bool = True,
     ) -> None:
-        """设置缓存值"""
+        """设置缓存值，shared为False时不写入共享缓存"""
         cache_name = self._get_cache_name(cache_type, namespace)
-        config = self._configs.get(cache_name) or CacheConfig.for_type(cache_type)
-        cache = self._get_or_create_cache(cache_name, config)
+        space = self._get_or_create_space(cache_name, cache_type)
 
         # 使用配置的TTL或传入的TTL
-        effective_ttl = ttl if ttl is not None else config.ttl
-
-        with self._locks[cache_name]:
-            # 创建缓存条目
-            entry = CacheEntry(value=value, timestamp=time.time(), ttl=effective_ttl)
-
-            # 处理不同策略
-            if config.strategy in [CacheStrategy.LRU, CacheStrategy.TTL_LRU]:
-                # LRU策略：如果已存在则移动到末尾
-                if key in cache:
-                    del cache[key]
-                cache[key] = entry
-
-                # 检查大小限制
-                if config.max_size and len(cache) > config.max_size:
-                    # 移除最旧的条目
-                    oldest_key = next(iter(cache))
-                    del cache[oldest_key]
-                    self._stats["evictions"] += 1
-
-            else:
-                cache[key] = entry
-
-                # 检查大小限制
-                if config.max_size and len(cache) > config.max_size:
-                    # 简单策略：随机移除一个条目
-                    victim_key = next(iter(cache))
-                    del cache[victim_key]
-                    self._stats["evictions"] += 1
-
-        # 定期清理过期条目
-        self._maybe_cleanup(cache_name)
+        effective_ttl = ttl if ttl is not None else space.config.ttl
+        self._local_set(space, key, value, effective_ttl)
+
+        if shared and self._is_shared(cache_type):
+            self._shared_set(cache_name, key, value, effective_ttl)
 
     def get(
         self, cache_type: CacheType, key: str, namespace: str = ""
     ) -> Optional[Any]:
-        """获取缓存值"""
+        """获取缓存值，进程内未命中时再查共享缓存"""
         cache_name = self._get_cache_name(cache_type, namespace)
-
-        if cache_name not in self._caches:
-            self._stats["misses"] += 1
+        space = self._get_or_create_space(cache_name, cache_type)
+        stripe = space.stripe(key)
+
+        with stripe.lock:
+            entry = stripe.entries.get(key)
+            if entry is not None and entry.is_expired():
+                self._remove(stripe, key)
+                stripe.counters["expirations"] += 1
+                entry = None
+
+            if entry is not None:
+                # 更新访问信息
+                entry.touch()
+                if space.refresh_on_read:
+                    stripe.entries.move_to_end(key)
+                stripe.counters["hits"] += 1
+                return entry.value
+
+            stripe.counters["misses"] += 1
+
+        if self._is_shared(cache_type):
+            return self._shared_get(space, cache_name, key)
+        return None
+
+    def _is_shared(self, cache_type: CacheType) -> bool:
+        return self._backend is not None and cache_type in self._shared_types
+
+    def _shared_get(self, space: _CacheSpace, cache_name: str, key: str):
+        try:
+            found = self._backend.get(cache_name, key)
+            value = loads(found[0]) if found is not None else None
+        except Exception as e:
+            self.logger.warning(f"读取共享缓存失败 {cache_name}: {e}")
+            found = value = None
+        with space.extra_lock:
+            stat = "shared_misses" if found is None else "shared_hits"
+            space.extra[stat] = space.extra.get(stat, 0) + 1
+        if found is None:
             return None
 
-        cache = self._caches[cache_name]
-        config = self._configs[cache_name]
-
-        with self._locks[cache_name]:
-            if key not in cache:
-                self._stats["misses"] += 1
-                return None
-
-            entry = cache[key]
+        # 放入进程内缓存，最多保留near_ttl秒，以便及时看到其他进程的更新
+        ttl = self._near_ttl
+        if found[1] is not None:
+            ttl = max(min(ttl, found[1] - time.time()), 0)
+        self._local_set(space, key, value, ttl)
+        return value
 
-            # 检查过期
-            if entry.is_expired():
-                del cache[key]
-                self._stats["misses"] += 1
-                return None
-
-            # 更新访问信息
-            entry.touch()
-
-            # LRU策略：移动到末尾
-            if config.strategy in [CacheStrategy.LRU, CacheStrategy.TTL_LRU]:
-                del cache[key]
-                cache[key] = entry
-
-            self._stats["hits"] += 1
-            return entry.value
+    def _shared_set(
+        self, cache_name: str, key: str, value: Any, ttl: Optional[float]
+    ) -> None:
+        if ttl is None or ttl > self._max_ttl:
+            ttl = self._max_ttl
+        try:
+            self._backend.set(cache_name, key, dumps(value), ttl)
+        except (TypeError, ValueError):
+            # 无法序列化的值只保留在进程内缓存
+            pass
+        except Exception as e:
+            self.logger.warning(f"写入共享缓存失败 {cache_name}: {e}")
+
+    def _shared_call(self, cache_type: CacheType, method: str, *args):
+        if not self._is_shared(cache_type):
+            return 0
+        try:
+            return getattr(self._backend, method)(*args)
+        except Exception as e:
+            self.logger.warning(f"操作共享缓存失败 {args[0]}: {e}")
+            return 0
 
     def delete(self, cache_type: CacheType, key: str, namespace: str = "") -> bool:
         """删除缓存条目"""
         cache_name = self._get_cache_name(cache_type, namespace)
-
-        if cache_name not in self._caches:
-            return False
-
-        cache = self._caches[cache_name]
-
-        with self._locks[cache_name]:
-            if key in cache:
-                del cache[key]
+        deleted = bool(self._shared_call(cache_type, "delete", cache_name, key))
+        space = self._get_space(cache_name)
+        if space is None:
+            return deleted
+
+        stripe = space.stripe(key)
+        with stripe.lock:
+            if key in stripe.entries:
+                self._remove(stripe, key)
                 return True
-            return False
+            return deleted
 
     def clear(self, cache_type: CacheType, namespace: str = "") -> None:
         """清空指定缓存"""
         cache_name = self._get_cache_name(cache_type, namespace)
-
-        if cache_name not in self._caches:
+        self._shared_call(cache_type, "clear", cache_name)
+        space = self._get_space(cache_name)
+        if space is None:
             return
 
-        with self._locks[cache_name]:
-            self._caches[cache_name].clear()
+        for stripe in space.stripes:
+            with stripe.lock:
+                stripe.entries.clear()
+                stripe.expiry.clear()
+                stripe.bytes = 0
 
     def invalidate_pattern(
         self, cache_type: CacheType, pattern: str, namespace: str = ""
     ) -> int:
         """按模式失效缓存条目"""
         cache_name = self._get_cache_name(cache_type, namespace)
+        shared_count = self._shared_call(
+            cache_type, "invalidate_pattern", cache_name, pattern
+        )
+        space = self._get_space(cache_name)
+        if space is None:
+            return shared_count
 
-        if cache_name not in self._caches:
-            return 0
-
-        cache = self._caches[cache_name]
         deleted_count = 0
+        for stripe in space.stripes:
+            with stripe.lock:
+                keys_to_delete = [key for key in stripe.entries if pattern in key]
+                for key in keys_to_delete:
+                    self._remove(stripe, key)
+                    deleted_count += 1
 
-        with self._locks[cache_name]:
-            keys_to_delete = [key for key in cache.keys() if pattern in key]
-            for key in keys_to_delete:
-                del cache[key]
-                deleted_count += 1
-
-        return deleted_count
-
-    def _cleanup_expired(self, cache_name: str) -> int:
-        """清理过期条目"""
-        if cache_name not in self._caches:
-            return 0
-
-        cache = self._caches[cache_name]
-        deleted_count = 0
-
-        with self._locks[cache_name]:
-            expired_keys = [key for key, entry in cache.items() if entry.is_expired()]
-            for key in expired_keys:
-                del cache[key]
-                deleted_count += 1
-
-        return deleted_count
-
-    def _maybe_cleanup(self, cache_name: str):
-        """定期清理检查"""
-        config = self._configs.get(cache_name)
-        if not config:
-            return
+        return max(deleted_count, shared_count)
 
+    def cleanup_expired(self) -> int:
+        """清理所有缓存空间中的过期条目"""
         now = time.time()
-        if now - self._last_cleanup > config.cleanup_interval:
-            self._last_cleanup = now
-            deleted = self._cleanup_expired(cache_name)
-            if deleted > 0:
-                self._stats["cleanups"] += 1
-                self.logger.debug(f"清理缓存 {cache_name}: 删除 {deleted} 个过期条目")
+        deleted = 0
+        for cache_name, space in list(self._spaces.items()):
+            space_deleted = 0
+            for stripe in space.stripes:
+                with stripe.lock:
+                    space_deleted += self._expire(stripe, now)
+            if space_deleted:
+                self.logger.debug(f"清理缓存 {cache_name}: 删除 {space_deleted} 个过期条目")
+                deleted += space_deleted
+        if deleted:
+            self._cleanups += 1
+        return deleted
+
+    def cleanup_backend(self) -> int:
+        """清理共享缓存后端中的过期条目，多个进程同时清理时互不影响"""
+        backend = self._backend
+        if backend is None:
+            return 0
+        self._backend_swept_at = time.time()
+        deleted = backend.sweep()
+        if deleted:
+            self.logger.debug(f"清理共享缓存: 删除 {deleted} 个条目")
+        return deleted
+
+    def _sweep_interval(self) -> float:
+        intervals = [config.cleanup_interval for config in self._configs.values()]
+        return min(intervals + [MAX_SWEEP_INTERVAL])
+
+    def _sweep_loop(self):
+        while not self._sweeper_stop.wait(self._sweep_interval()):
+            try:
+                self.cleanup_expired()
+            except Exception as e:
+                self.logger.error(f"清理过期缓存失败: {e}")
+            if time.time() - self._backend_swept_at < self._backend_sweep_interval:
+                continue
+            try:
+                self.cleanup_backend()
+            except Exception as e:
+                self.logger.error(f"清理共享缓存失败: {e}")
+
+    def _start_sweeper(self):
+        """启动后台清理线程，调用方需持有全局锁"""
+        if self._sweeper is None:
+            self._sweeper = threading.Thread(
+                target=self._sweep_loop, name="xiaozhi-cache-sweeper", daemon=True
+            )
+            self._sweeper.start()
+
+    def stop_sweeper(self):
+        self._sweeper_stop.set()
 
 
 # 创建全局缓存管理器实例
@@ -2,6 +2,7 @@
 缓存策略和数据结构定义
 """
 
+import sys
 import time
 from enum import Enum
 from typing import Any, Optional
@@ -26,18 +27,42 @@ class CacheEntry:
     ttl: Optional[float] = None  # 生存时间（秒）
     access_count: int = 0
     last_access: float = None
+    size: int = 0  # 估算的字节数
 
     def __post_init__(self):
         if self.last_access is None:
             self.last_access = self.timestamp
 
-    def is_expired(self) -> bool:
+    @property
+    def expire_at(self) -> Optional[float]:
+        if self.ttl is None:
+            return None
+        return self.timestamp + self.ttl
+
+    def is_expired(self, now: float = None) -> bool:
         """检查是否过期"""
         if self.ttl is None:
             return False
-        return time.time() - self.timestamp > self.ttl
+        if now is None:
+            now = time.time()
+        return now - self.timestamp > self.ttl
 
     def touch(self):
         """更新访问时间和计数"""
         self.last_access = time.time()
         self.access_count += 1
+
+
+def estimate_size(value: Any) -> int:
+    """估算缓存值占用的字节数，音频数据包列表按数据包长度累加"""
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return len(value)
+    if isinstance(value, str):
+        return len(value.encode("utf-8"))
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(estimate_size(item) for item in value)
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(
+            estimate_size(k) + estimate_size(v) for k, v in value.items()
+        )
+    return sys.getsizeof(value)
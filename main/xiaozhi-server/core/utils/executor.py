@@ -0,0 +1,167 @@
+"""
+进程级共享线程池
+
+所有连接的短时阻塞调用（TTS合成、ASR、音频文件解码、聊天记录上报等）
+都提交到同一个有界线程池，线程数不再随连接数增长。
+
+每轮对话的chat线程要占用线程直到大模型输出结束，期间还会等待记忆查询和工具调用，
+单独放在对话线程池中，不会占满共享线程池，让TTS、ASR等排在大模型流式请求之后，
+也不会与它所等待的任务争抢线程。
+"""
+
+import queue
+import asyncio
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+DEFAULT_MAX_WORKERS = 64
+DEFAULT_CHAT_MAX_WORKERS = 128
+
+_executor = None
+_max_workers = DEFAULT_MAX_WORKERS
+_chat_executor = None
+_chat_max_workers = DEFAULT_CHAT_MAX_WORKERS
+_lock = threading.Lock()
+# 每个工作线程常驻的事件循环
+_thread_local = threading.local()
+# 服务器主事件循环，同步代码中的异步流式请求默认在这里执行
+_main_loop = None
+
+
+def configure_executor(max_workers=None, chat_max_workers=None):
+    """设置共享线程池和对话线程池的最大线程数，需在第一次使用线程池之前调用"""
+    global _max_workers, _chat_max_workers
+    if max_workers:
+        _max_workers = max(int(max_workers), 1)
+    if chat_max_workers:
+        _chat_max_workers = max(int(chat_max_workers), 1)
+
+
+def set_main_loop(loop):
+    """记录服务器主事件循环，需在启动时调用"""
+    global _main_loop
+    _main_loop = loop
+
+
+def get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        with _lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=_max_workers, thread_name_prefix="xiaozhi-worker"
+                )
+    return _executor
+
+
+def get_chat_executor() -> ThreadPoolExecutor:
+    """对话线程池，线程数即同时进行对话的轮数上限"""
+    global _chat_executor
+    if _chat_executor is None:
+        with _lock:
+            if _chat_executor is None:
+                _chat_executor = ThreadPoolExecutor(
+                    max_workers=_chat_max_workers, thread_name_prefix="xiaozhi-chat"
+                )
+    return _chat_executor
+
+
+async def run_blocking(func, *args, **kwargs):
+    """在共享线程池中执行阻塞函数并等待结果"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        get_executor(), functools.partial(func, *args, **kwargs)
+    )
+
+
+def run_in_thread_loop(coro):
+    """在当前线程常驻的事件循环中执行协程
+
+    与asyncio.run不同，事件循环在同一线程的多次调用之间复用，不再每次新建和关闭。
+    """
+    loop = getattr(_thread_local, "loop", None)
+    if loop is None or loop.is_closed():
+        loop = asyncio.new_event_loop()
+        _thread_local.loop = loop
+    return loop.run_until_complete(coro)
+
+
+class StreamIterator:
+    """在同步代码中迭代异步生成器
+
+    异步生成器在指定的事件循环中运行，未指定时在服务器主事件循环中运行，
+    连接池等与事件循环绑定的资源由所有调用方共用；在主事件循环所在线程中调用时，
+    改在共享线程池某个线程常驻的事件循环中运行，避免互相等待。
+    输出经队列交给调用线程。close()可以在任意线程调用，会取消事件循环中的任务，
+    生成器中正在等待的网络请求随之关闭。
+    """
+
+    _DONE = object()
+
+    def __init__(self, agen, loop=None):
+        self._agen = agen
+        self._queue = queue.Queue()
+        self._loop = None
+        self._task = None
+        self._closed = False
+        self._lock = threading.Lock()
+        loop = loop or _main_loop
+        if loop is not None and loop.is_running() and not _in_loop(loop):
+            asyncio.run_coroutine_threadsafe(self._pump(), loop)
+        else:
+            get_executor().submit(run_in_thread_loop, self._pump())
+
+    async def _pump(self):
+        with self._lock:
+            closed = self._closed
+            if not closed:
+                self._loop = asyncio.get_running_loop()
+                self._task = asyncio.current_task()
+        if closed:
+            await self._agen.aclose()
+            return
+        try:
+            async for item in self._agen:
+                self._queue.put(item)
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            self._queue.put(_StreamError(e))
+        finally:
+            self._queue.put(self._DONE)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        item = self._queue.get()
+        if item is self._DONE:
+            # 保留结束标记，重复调用时仍然结束
+            self._queue.put(item)
+            raise StopIteration
+        if isinstance(item, _StreamError):
+            raise item.error
+        return item
+
+    def close(self):
+        """停止迭代并取消事件循环中的任务"""
+        with self._lock:
+            self._closed = True
+            if self._task is not None and not self._task.done():
+                self._loop.call_soon_threadsafe(self._task.cancel)
+        self._queue.put(self._DONE)
+
+
+def _in_loop(loop) -> bool:
+    try:
+        return asyncio.get_running_loop() is loop
+    except RuntimeError:
+        return False
+
+
+class _StreamError:
+    __slots__ = ("error",)
+
+    def __init__(self, error):
+        self.error = error
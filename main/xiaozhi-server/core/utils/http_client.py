@@ -0,0 +1,109 @@
+"""
+共用的异步HTTP客户端
+
+每个事件循环一个aiohttp会话，所有连接复用同一个连接池，
+插件在事件循环中等待网络响应时不会阻塞其他设备的音频收发。
+
+大模型接口按base_url共用httpx客户端：保持长连接，安装了h2时使用HTTP/2，
+所有设备的请求复用同一组连接，不再每轮对话重新握手。
+"""
+
+import asyncio
+import weakref
+import aiohttp
+import httpx
+
+try:
+    import h2  # noqa: F401
+
+    HTTP2 = True
+except ImportError:
+    HTTP2 = False
+
+# 默认请求超时（秒）
+DEFAULT_TIMEOUT = 10
+# 大模型连接池：每个base_url的最大连接数和空闲连接保持时间（秒）
+LLM_MAX_CONNECTIONS = 100
+LLM_KEEPALIVE_EXPIRY = 60
+# 大模型流式响应两个片段之间的最长等待时间（秒），上游卡住时结束请求
+LLM_READ_TIMEOUT = 120
+
+# 事件循环 -> aiohttp会话
+_sessions = weakref.WeakKeyDictionary()
+# 事件循环 -> {base_url: httpx客户端}
+_llm_clients = weakref.WeakKeyDictionary()
+# 事件循环 -> {(base_url, api_key): openai异步客户端}
+_openai_clients = weakref.WeakKeyDictionary()
+
+
+def get_http_session() -> aiohttp.ClientSession:
+    """获取当前事件循环共用的HTTP会话，需在事件循环中调用"""
+    loop = asyncio.get_running_loop()
+    session = _sessions.get(loop)
+    if session is None or session.closed:
+        session = aiohttp.ClientSession(
+            timeout=aiohttp.ClientTimeout(total=DEFAULT_TIMEOUT)
+        )
+        _sessions[loop] = session
+    return session
+
+
+def llm_timeout(read=None) -> httpx.Timeout:
+    """大模型请求的超时：连接、写入等待DEFAULT_TIMEOUT，读取等待read秒"""
+    return httpx.Timeout(
+        DEFAULT_TIMEOUT, read=float(read) if read else LLM_READ_TIMEOUT
+    )
+
+
+def get_llm_http_client(base_url: str) -> httpx.AsyncClient:
+    """获取当前事件循环中base_url共用的httpx客户端，需在事件循环中调用
+
+    流式响应持续时间不定，客户端不设总超时，只限制连接和每次读取的等待时间，
+    各大模型可在请求时另行指定。
+    """
+    clients = _llm_clients.setdefault(asyncio.get_running_loop(), {})
+    key = base_url.rstrip("/")
+    client = clients.get(key)
+    if client is None or client.is_closed:
+        client = httpx.AsyncClient(
+            http2=HTTP2,
+            timeout=llm_timeout(),
+            limits=httpx.Limits(
+                max_connections=LLM_MAX_CONNECTIONS,
+                max_keepalive_connections=LLM_MAX_CONNECTIONS,
+                keepalive_expiry=LLM_KEEPALIVE_EXPIRY,
+            ),
+        )
+        clients[key] = client
+    return client
+
+
+def get_async_openai(base_url: str, api_key: str, timeout=None):
+    """获取当前事件循环中使用共用连接池的openai异步客户端"""
+    import openai
+
+    clients = _openai_clients.setdefault(asyncio.get_running_loop(), {})
+    http_client = get_llm_http_client(base_url)
+    # 连接池重建后openai客户端也要重建
+    key = (base_url, api_key, timeout, id(http_client))
+    client = clients.get(key)
+    if client is None:
+        client = openai.AsyncOpenAI(
+            api_key=api_key,
+            base_url=base_url,
+            timeout=httpx.Timeout(timeout) if timeout else openai.NOT_GIVEN,
+            http_client=http_client,
+        )
+        clients[key] = client
+    return client
+
+
+async def close_http_session():
+    """关闭当前事件循环的HTTP会话和大模型连接池"""
+    loop = asyncio.get_running_loop()
+    session = _sessions.pop(loop, None)
+    if session is not None and not session.closed:
+        await session.close()
+    _openai_clients.pop(loop, None)
+    for client in _llm_clients.pop(loop, {}).values():
+        await client.aclose()
@@ -0,0 +1,319 @@
+"""
+语义意图缓存
+
+语音识别的文本先归一化：去掉标点和语气词、繁体转简体、中文数字转阿拉伯数字，
+再按单字和相邻两字（权重减半）构成向量，与同一设备缓存过的句子计算余弦相似度，
+超过阈值即复用之前的意图识别结果，“打开灯”“把灯打开”只需调用一次大模型。
+句子中的数字、否定词和疑问词必须完全一致，“音量调到30”不会命中“音量调到50”，
+“不打开空调”“打开空调吗”不会命中“打开空调”。
+两句话只有语序不同或只差客套词、虚词时才能复用，缓存意图的参数值还必须出现在新句子中，
+“南京天气怎么样”不会命中“北京天气怎么样”，“今天怎么样”不会命中“今天天气怎么样”。
+精确缓存的键只去掉标点、统一大小写和繁简，不删除句中的字。
+缓存按设备隔离，设备可用的工具列表变化后该设备的缓存全部失效。
+"""
+
+import re
+import json
+import time
+import threading
+import unicodedata
+from collections import Counter, OrderedDict
+from typing import Dict, List, Optional, Set
+
+try:
+    from opencc import OpenCC
+
+    _t2s = OpenCC("t2s")
+except ImportError:
+    _t2s = None
+
+# 标点、空白等无意义的符号
+_NOISE = re.compile(r"[\W_]+", re.UNICODE)
+# 句中不影响意图的虚词，"把灯打开"与"打开灯"归一化后只差语序，只用于相似度计算
+_PARTICLES = re.compile("一下|把|的")
+# 句首的客套词和句末的语气词
+_LEADING_FILLERS = ("麻烦你", "麻烦", "请你", "请", "帮我", "给我", "嗯", "呃", "啊", "那个")
+_TRAILING_FILLERS = ("好吗", "好不好", "可以吗", "吧", "啊", "呀", "啦", "了", "嘛", "哦", "哈")
+# 否定词和疑问词，与数字一样必须完全一致，"不打开空调"不能复用"打开空调"
+_MARKERS = frozenset("不别没勿吗么呢")
+# 两句话可以不同的字：客套词和虚词，其余的字不同时不复用
+_FILLER_CHARS = frozenset("请帮我给你把的了吧啊呀啦嘛哦哈嗯呃麻烦")
+_CN_DIGITS = dict(zip("零一二两三四五六七八九", (0, 1, 2, 2, 3, 4, 5, 6, 7, 8, 9)))
+_CN_UNITS = {"十": 10, "百": 100, "千": 1000, "万": 10000}
+_CN_NUMBER = re.compile(f"[{''.join(_CN_DIGITS)}{''.join(_CN_UNITS)}]+")
+_DIGITS = re.compile(r"\d+")
+# 二元词的权重，低于单字，语序不同的同义说法仍有较高的相似度
+BIGRAM_WEIGHT = 0.5
+
+
+def _cn_to_int(text: str) -> int:
+    """中文数字转整数，"五十"->50，"一百零五"->105，"一二三"->123"""
+    if all(c in _CN_DIGITS for c in text):
+        return int("".join(str(_CN_DIGITS[c]) for c in text))
+    total = section = number = 0
+    for c in text:
+        if c in _CN_DIGITS:
+            number = _CN_DIGITS[c]
+        elif c == "万":
+            total = (total + section + number) * 10000
+            section = number = 0
+        else:
+            # "十"前没有数字时表示10
+            section += (number or 1) * _CN_UNITS[c]
+            number = 0
+    return total + section + number
+
+
+def canonical(text: str) -> str:
+    """精确缓存使用的形式：只去掉标点空白、统一全半角、大小写和繁简"""
+    text = unicodedata.normalize("NFKC", text).lower()
+    if _t2s is not None:
+        text = _t2s.convert(text)
+    return _NOISE.sub("", text)
+
+
+def normalize(text: str) -> str:
+    """相似度计算使用的形式，在canonical基础上去掉虚词、客套词并统一数字"""
+    # "一下"先去掉，避免其中的"一"被转成数字
+    text = _PARTICLES.sub("", canonical(text))
+    changed = True
+    while changed and text:
+        changed = False
+        for filler in _LEADING_FILLERS:
+            if text.startswith(filler) and len(text) > len(filler):
+                text = text[len(filler) :]
+                changed = True
+        for filler in _TRAILING_FILLERS:
+            if text.endswith(filler) and len(text) > len(filler):
+                text = text[: -len(filler)]
+                changed = True
+    return _CN_NUMBER.sub(lambda m: str(_cn_to_int(m.group(0))), text)
+
+
+def _vector(text: str) -> Dict[str, float]:
+    vector = dict.fromkeys(text, 1.0)
+    for i in range(len(text) - 1):
+        vector[text[i : i + 2]] = BIGRAM_WEIGHT
+    return vector
+
+
+def intent_name(intent: str) -> str:
+    """从意图识别结果中取出函数名，多个函数用+连接"""
+    try:
+        data = json.loads(intent)
+    except (TypeError, ValueError):
+        return "unknown"
+    if "function_calls" in data:
+        return "+".join(call.get("name", "") for call in data["function_calls"])
+    if "function_call" in data:
+        return data["function_call"].get("name") or "unknown"
+    return "unknown"
+
+
+def _argument_values(intent: str) -> List[str]:
+    """取出意图中所有函数参数的值，归一化后返回"""
+    try:
+        data = json.loads(intent)
+    except (TypeError, ValueError):
+        return []
+    calls = data.get("function_calls") or [data.get("function_call") or {}]
+    values = []
+
+    def collect(value):
+        if isinstance(value, dict):
+            for item in value.values():
+                collect(item)
+        elif isinstance(value, list):
+            for item in value:
+                collect(item)
+        elif isinstance(value, (str, int, float)) and not isinstance(value, bool):
+            value = normalize(str(value))
+            if value:
+                values.append(value)
+
+    for call in calls:
+        arguments = call.get("arguments") if isinstance(call, dict) else None
+        if isinstance(arguments, str):
+            try:
+                arguments = json.loads(arguments)
+            except ValueError:
+                arguments = [arguments]
+        collect(arguments)
+    return values
+
+
+class _Entry:
+    __slots__ = (
+        "text",
+        "vector",
+        "norm",
+        "digits",
+        "markers",
+        "arguments",
+        "intent",
+        "expire_at",
+    )
+
+    def __init__(self, text: str, intent: Optional[str], expire_at: float):
+        self.text = text
+        self.vector = _vector(text)
+        self.norm = sum(w * w for w in self.vector.values()) ** 0.5
+        self.digits = _DIGITS.findall(text)
+        self.markers = [c for c in text if c in _MARKERS]
+        self.arguments = _argument_values(intent) if intent else []
+        self.intent = intent
+        self.expire_at = expire_at
+
+    def reusable_for(self, text: str) -> bool:
+        """相似的句子能否复用本意图
+
+        两句话不同的字只能是客套词、虚词，且参数值都出现在新句子中。
+        """
+        difference = (Counter(text) - Counter(self.text)) + (
+            Counter(self.text) - Counter(text)
+        )
+        if any(c not in _FILLER_CHARS for c in difference):
+            return False
+        return all(value in text for value in self.arguments)
+
+
+class _Scope:
+    """一台设备的缓存，按句子LRU淘汰"""
+
+    def __init__(self, signature: str):
+        self.signature = signature
+        self.entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self.postings: Dict[str, Set[str]] = {}
+
+    def add(self, text: str, entry: _Entry):
+        self.remove(text)
+        self.entries[text] = entry
+        for token in entry.vector:
+            self.postings.setdefault(token, set()).add(text)
+
+    def remove(self, text: str):
+        entry = self.entries.pop(text, None)
+        if entry is None:
+            return
+        for token in entry.vector:
+            texts = self.postings.get(token)
+            if texts is not None:
+                texts.discard(text)
+                if not texts:
+                    del self.postings[token]
+
+
+class SemanticIntentCache:
+    def __init__(self):
+        self.enabled = True
+        self.threshold = 0.85
+        self.ttl = 600
+        self.max_entries = 200
+        self.max_devices = 10000
+        self._scopes: "OrderedDict[str, _Scope]" = OrderedDict()
+        # 意图 -> {"exact": 精确命中, "semantic": 相似命中, "miss": 调用大模型}
+        self._counters: Dict[str, Dict[str, int]] = {}
+        self._lock = threading.Lock()
+
+    def configure(self, config: dict):
+        config = config or {}
+        self.enabled = str(config.get("enable", True)).lower() in ("true", "1", "yes")
+        self.threshold = float(config.get("threshold", 0.85))
+        self.ttl = float(config.get("ttl", 600))
+        self.max_entries = int(config.get("max_entries", 200))
+
+    def _scope(self, device_id: str, signature: str) -> _Scope:
+        """获取设备的缓存，工具列表变化时清空，调用方需持有锁"""
+        scope = self._scopes.get(device_id)
+        if scope is None or scope.signature != signature:
+            scope = _Scope(signature)
+            self._scopes[device_id] = scope
+            while len(self._scopes) > self.max_devices:
+                self._scopes.popitem(last=False)
+        self._scopes.move_to_end(device_id)
+        return scope
+
+    def lookup(self, device_id: str, signature: str, text: str) -> Optional[str]:
+        """查找最相似的已缓存句子，相似度达到阈值时返回其意图"""
+        if not self.enabled:
+            return None
+        text = normalize(text)
+        if not text:
+            return None
+        query = _Entry(text, None, 0)
+        now = time.time()
+        with self._lock:
+            scope = self._scope(device_id, signature)
+            candidates = set()
+            for token in text:
+                candidates |= scope.postings.get(token, set())
+            best_score, best_text = 0.0, None
+            for candidate in candidates:
+                entry = scope.entries[candidate]
+                if entry.expire_at < now:
+                    scope.remove(candidate)
+                    continue
+                if entry.digits != query.digits or entry.markers != query.markers:
+                    continue
+                dot = sum(
+                    weight * entry.vector.get(token, 0)
+                    for token, weight in query.vector.items()
+                )
+                score = dot / (query.norm * entry.norm)
+                # 只差一个字的地名、歌名等会有很高的相似度，参数对不上时不能复用
+                if score > best_score and entry.reusable_for(text):
+                    best_score, best_text = score, candidate
+            if best_text is None or best_score < self.threshold:
+                return None
+            scope.entries.move_to_end(best_text)
+            return scope.entries[best_text].intent
+
+    def add(self, device_id: str, signature: str, text: str, intent: str):
+        """缓存大模型识别出的意图"""
+        if not self.enabled:
+            return
+        text = normalize(text)
+        if not text:
+            return
+        entry = _Entry(text, intent, time.time() + self.ttl)
+        with self._lock:
+            scope = self._scope(device_id, signature)
+            scope.add(text, entry)
+            while len(scope.entries) > self.max_entries:
+                scope.remove(next(iter(scope.entries)))
+
+    def record(self, intent: str, result: str):
+        """记录一次意图查询的结果：exact、semantic或miss"""
+        name = intent_name(intent)
+        with self._lock:
+            counters = self._counters.setdefault(
+                name, {"exact": 0, "semantic": 0, "miss": 0}
+            )
+            counters[result] += 1
+
+    def get_stats(self) -> Dict[str, Dict[str, float]]:
+        """各意图的命中次数和命中率"""
+        with self._lock:
+            stats = {name: dict(counters) for name, counters in self._counters.items()}
+        for counters in stats.values():
+            total = sum(counters.values())
+            hits = counters["exact"] + counters["semantic"]
+            counters["hit_rate"] = round(hits / total, 4) if total else 0.0
+        return stats
+
+    def render_prometheus(self) -> str:
+        """输出Prometheus文本格式的指标"""
+        lines = [
+            "# HELP xiaozhi_intent_cache_total 意图识别缓存查询次数(result为exact/semantic/miss)",
+            "# TYPE xiaozhi_intent_cache_total counter",
+        ]
+        with self._lock:
+            for name, counters in self._counters.items():
+                for result, count in counters.items():
+                    lines.append(
+                        f'xiaozhi_intent_cache_total{{intent="{name}",result="{result}"}} {count}'
+                    )
+        return "\n".join(lines) + "\n"
+
+
+intent_cache = SemanticIntentCache()
@@ -0,0 +1,47 @@
+import queue
+import asyncio
+
+
+class LoopQueue:
+    """在事件循环中消费的队列
+
+    消费方在事件循环中await get()，生产方可以是事件循环本身，也可以是任意线程：
+    其他线程的put会通过call_soon_threadsafe转交给事件循环，无需轮询。
+    绑定事件循环之前put的数据会直接进入队列。
+    """
+
+    def __init__(self, loop=None):
+        self._loop = loop
+        self._queue = asyncio.Queue()
+
+    def bind(self, loop):
+        self._loop = loop
+
+    def put(self, item):
+        if self._loop is None:
+            self._queue.put_nowait(item)
+            return
+        try:
+            running_loop = asyncio.get_running_loop()
+        except RuntimeError:
+            running_loop = None
+        if running_loop is self._loop:
+            self._queue.put_nowait(item)
+        else:
+            self._loop.call_soon_threadsafe(self._queue.put_nowait, item)
+
+    async def get(self):
+        return await self._queue.get()
+
+    def get_nowait(self):
+        """与queue.Queue保持一致，队列为空时抛出queue.Empty"""
+        try:
+            return self._queue.get_nowait()
+        except asyncio.QueueEmpty:
+            raise queue.Empty
+
+    def qsize(self):
+        return self._queue.qsize()
+
+    def empty(self):
+        return self._queue.empty()
@@ -0,0 +1,269 @@
+"""
+本地音乐库
+
+音乐目录中的MP3/WAV在后台预先转码为p3格式（每个Opus包前带4字节头），
+播放时内存映射p3文件，按包索引边播放边读取，歌曲无需整首解码即可开始播放，
+每个收听的连接只占用一个读取位置，同一首歌的文件页由所有连接共享。
+"""
+
+import os
+import json
+import mmap
+import struct
+import hashlib
+import threading
+import numpy as np
+from typing import Optional
+from config.logger import setup_logging
+from core.utils.audio_stream import StreamingAudioDecoder
+from core.utils.executor import get_executor
+
+TAG = __name__
+logger = setup_logging()
+
+FRAME_DURATION = 60  # ms
+READ_CHUNK = 64 * 1024
+
+
+class P3File:
+    """内存映射的p3文件及其数据包索引
+
+    每个P3Stream持有一个引用，最后一个引用释放时关闭内存映射。
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.signature = _signature(path)
+        self.closed = False
+        self._refs = 0
+        self._ref_lock = threading.Lock()
+        with open(path, "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+        offsets = []
+        lengths = []
+        position = 0
+        # 建立索引，末尾不完整的包忽略
+        while position + 4 <= size:
+            length = struct.unpack_from(">H", self.mm, position + 2)[0]
+            if position + 4 + length > size:
+                break
+            offsets.append(position + 4)
+            lengths.append(length)
+            position += 4 + length
+        self.offsets = np.array(offsets, dtype=np.int64)
+        self.lengths = np.array(lengths, dtype=np.int32)
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def acquire(self):
+        with self._ref_lock:
+            if self.closed:
+                raise ValueError(f"p3文件已关闭: {self.path}")
+            self._refs += 1
+
+    def release(self):
+        with self._ref_lock:
+            self._refs -= 1
+            if self._refs > 0 or self.closed:
+                return
+            self.closed = True
+        if isinstance(self.mm, mmap.mmap):
+            self.mm.close()
+
+    @property
+    def duration(self) -> float:
+        return len(self) * FRAME_DURATION / 1000
+
+    def packet(self, index: int) -> bytes:
+        offset = int(self.offsets[index])
+        return self.mm[offset : offset + int(self.lengths[index])]
+
+    def stream(self, start_seconds: float = 0) -> "P3Stream":
+        start = min(int(start_seconds * 1000 // FRAME_DURATION), len(self))
+        return P3Stream(self, start, len(self))
+
+
+class P3Stream:
+    """p3文件中一段数据包的只读序列，迭代时才从内存映射中读取
+
+    支持len、下标和切片，可以直接作为音频数据包列表交给sendAudio。
+    迭代完毕、迭代被中断或调用close后释放对p3文件的引用。
+    """
+
+    def __init__(self, p3_file: P3File, start: int, stop: int):
+        self._released = True
+        p3_file.acquire()
+        self._released = False
+        self.p3_file = p3_file
+        self.start = start
+        self.stop = stop
+
+    def close(self):
+        if not self._released:
+            self._released = True
+            self.p3_file.release()
+
+    def __del__(self):
+        self.close()
+
+    def __len__(self):
+        return max(self.stop - self.start, 0)
+
+    def __getitem__(self, item):
+        if isinstance(item, slice):
+            start, stop, step = item.indices(len(self))
+            if step != 1:
+                raise ValueError("P3Stream不支持步长切片")
+            return P3Stream(self.p3_file, self.start + start, self.start + stop)
+        if item < 0:
+            item += len(self)
+        if not 0 <= item < len(self):
+            raise IndexError(item)
+        return self.p3_file.packet(self.start + item)
+
+    def __iter__(self):
+        try:
+            for index in range(self.start, self.stop):
+                yield self.p3_file.packet(index)
+        finally:
+            self.close()
+
+    def seek(self, seconds: float) -> "P3Stream":
+        """从本段开头偏移指定秒数处开始的新序列"""
+        return self[int(seconds * 1000 // FRAME_DURATION) :]
+
+
+def _signature(path: str) -> tuple:
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_size
+
+
+class MusicLibrary:
+    def __init__(self):
+        self.music_dir = os.path.abspath("./music")
+        self.music_ext = (".mp3", ".wav", ".p3")
+        self.cache_dir = os.path.abspath("tmp/music_p3")
+        self._files = {}  # p3路径 -> P3File
+        self._pending = set()  # 正在转码的源文件
+        self._lock = threading.Lock()
+
+    def configure(self, config: dict):
+        config = config or {}
+        self.music_dir = os.path.abspath(config.get("music_dir", "./music"))
+        self.music_ext = tuple(config.get("music_ext", self.music_ext))
+        self.cache_dir = os.path.abspath(config.get("p3_cache_dir", "tmp/music_p3"))
+
+    def _cache_path(self, source: str) -> str:
+        """按源文件绝对路径的哈希命名，不同目录下的同名歌曲不会互相覆盖"""
+        source = os.path.abspath(source)
+        digest = hashlib.md5(source.encode("utf-8")).hexdigest()
+        name = os.path.splitext(os.path.basename(source))[0]
+        return os.path.join(self.cache_dir, f"{name}.{digest}.p3")
+
+    def _is_fresh(self, source: str, cache_path: str) -> bool:
+        """转码时记录的源文件大小和修改时间与当前一致才算有效"""
+        if not os.path.exists(cache_path):
+            return False
+        try:
+            with open(cache_path + ".json", "r", encoding="utf-8") as f:
+                recorded = tuple(json.load(f)["signature"])
+        except (OSError, ValueError, KeyError, TypeError):
+            return False
+        return recorded == _signature(source)
+
+    def _open(self, p3_path: str) -> P3Stream:
+        with self._lock:
+            p3_file = self._files.get(p3_path)
+        if p3_file is not None and p3_file.signature == _signature(p3_path):
+            try:
+                return p3_file.stream()
+            except ValueError:
+                # 之前的收听已全部结束，内存映射已关闭
+                pass
+        p3_file = P3File(p3_path)
+        stream = p3_file.stream()
+        with self._lock:
+            self._files[p3_path] = p3_file
+        return stream
+
+    def open_stream(self, music_path: str) -> Optional[P3Stream]:
+        """返回歌曲的数据包序列，尚未转码时在后台转码并返回None"""
+        if music_path.endswith(".p3"):
+            return self._open(music_path)
+        cache_path = self._cache_path(music_path)
+        if self._is_fresh(music_path, cache_path):
+            return self._open(cache_path)
+        self.schedule(music_path)
+        return None
+
+    def schedule(self, source: str):
+        """在共享线程池中转码一首歌，已在转码中则忽略"""
+        with self._lock:
+            if source in self._pending:
+                return
+            self._pending.add(source)
+        get_executor().submit(self._transcode_logged, source)
+
+    def _transcode_logged(self, source: str):
+        try:
+            self.transcode(source)
+        except Exception as e:
+            logger.bind(tag=TAG).error(f"音乐转码失败: {source}, {e}")
+        finally:
+            with self._lock:
+                self._pending.discard(source)
+
+    def transcode(self, source: str) -> str:
+        """把音乐文件分块转码为p3文件，内存占用与歌曲长度无关"""
+        cache_path = self._cache_path(source)
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        tmp_path = f"{cache_path}.{threading.get_ident()}.tmp"
+        # 在读取之前记录源文件状态，转码期间文件被修改时下次会重新转码
+        signature = _signature(source)
+        decoder = StreamingAudioDecoder(os.path.splitext(source)[1].lstrip("."))
+        try:
+            with open(source, "rb") as src, open(tmp_path, "wb") as dst:
+                while True:
+                    chunk = src.read(READ_CHUNK)
+                    packets = decoder.feed(chunk) if chunk else decoder.finish()
+                    for packet in packets:
+                        dst.write(struct.pack(">BBH", 0, 0, len(packet)))
+                        dst.write(packet)
+                    if not chunk:
+                        break
+            os.replace(tmp_path, cache_path)
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"source": source, "signature": signature}, f)
+            os.replace(tmp_path, cache_path + ".json")
+        finally:
+            decoder.close()
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        return cache_path
+
+    def transcode_all(self):
+        """后台任务：转码音乐目录中所有尚未转码或已更新的歌曲"""
+        if not os.path.isdir(self.music_dir):
+            return
+        count = 0
+        for root, _, files in os.walk(self.music_dir):
+            for name in files:
+                ext = os.path.splitext(name)[1].lower()
+                if ext not in self.music_ext or ext == ".p3":
+                    continue
+                source = os.path.join(root, name)
+                if self._is_fresh(source, self._cache_path(source)):
+                    continue
+                with self._lock:
+                    if source in self._pending:
+                        continue
+                    self._pending.add(source)
+                self._transcode_logged(source)
+                count += 1
+        if count:
+            logger.bind(tag=TAG).info(f"音乐库转码完成: {count}首")
+
+
+music_library = MusicLibrary()
@@ -56,4 +56,14 @@ def decode_opus_from_bytes(input_bytes):
         total_frames += 1
 
     total_duration = (total_frames * frame_duration_ms) / 1000.0
-    return opus_datas, total_duration
\ No newline at end of file
+    return opus_datas, total_duration
+
+
+def encode_opus_to_bytes(opus_datas):
+    """
+    将 Opus 数据包列表编码为p3二进制数据，每个数据包前加4字节头部。
+    """
+    return b"".join(
+        struct.pack(">BBH", 0, 0, len(opus_data)) + opus_data
+        for opus_data in opus_datas
+    )
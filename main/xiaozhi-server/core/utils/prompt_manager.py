@@ -165,8 +165,12 @@ class PromptManager:
             from plugins_func.functions.get_weather import get_weather
             from plugins_func.register import ActionResponse
 
-            # 调用get_weather函数
-            result = get_weather(conn, location=location, lang="zh_CN")
+            # 在当前线程常驻的事件循环中调用异步的get_weather函数
+            from core.utils.executor import run_in_thread_loop
+
+            result = run_in_thread_loop(
+                get_weather(conn, location=location, lang="zh_CN")
+            )
             if isinstance(result, ActionResponse):
                 weather_report = result.result
                 self.cache_manager.set(self.CacheType.WEATHER, location, weather_report)
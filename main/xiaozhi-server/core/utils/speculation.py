@@ -0,0 +1,48 @@
+import time
+import threading
+
+# 意图识别迟迟没有结果时，推测执行的聊天最多等待的秒数
+SPECULATION_TIMEOUT = 15
+
+
+class SpeculativeTurn:
+    """推测执行的一轮对话
+
+    聊天大模型与意图识别同时启动，大模型的输出在意图确认前只缓存不播报。
+    意图识别为继续聊天时调用commit，缓存的内容开始播报；否则调用rollback取消生成。
+    """
+
+    PENDING = 0
+    COMMITTED = 1
+    ROLLED_BACK = 2
+
+    def __init__(self):
+        self.start_time = time.monotonic()
+        self._state = self.PENDING
+        self._decided = threading.Event()
+        # 本轮的大模型流式请求，确认继续聊天后才登记到连接上
+        self.stream = None
+
+    def commit(self):
+        if self._state == self.PENDING:
+            self._state = self.COMMITTED
+            self._decided.set()
+
+    def rollback(self):
+        if self._state == self.PENDING:
+            self._state = self.ROLLED_BACK
+            self._decided.set()
+
+    @property
+    def decided(self) -> bool:
+        return self._decided.is_set()
+
+    @property
+    def committed(self) -> bool:
+        return self._state == self.COMMITTED
+
+    def wait(self, timeout=SPECULATION_TIMEOUT) -> bool:
+        """等待意图识别结果，超时视为回滚，返回是否确认继续聊天"""
+        if not self._decided.wait(timeout):
+            self.rollback()
+        return self.committed
@@ -0,0 +1,170 @@
+"""
+TTS音频缓存
+
+以TTS类型、音色、音频格式和清洗后的文本为键，缓存可以直接发送给设备的音频包。
+内存层由全局缓存管理器按LRU淘汰，磁盘层以p3格式保存并限制总大小，
+命中情况和节省的字节数记录在全局缓存管理器的统计信息中。
+"""
+
+import os
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import List, Optional
+from config.logger import setup_logging
+from core.utils import p3
+from core.utils.tts import MarkdownCleaner
+from core.utils.cache.manager import cache_manager
+from core.utils.cache.config import CacheType, CacheConfig
+from core.utils.cache.strategies import CacheStrategy
+
+TAG = __name__
+logger = setup_logging()
+
+
+class TTSAudioCache:
+    def __init__(self):
+        self.enabled = False
+        self.max_text_length = 50
+        self.disk_dir = None
+        self.disk_max_bytes = 0
+        self._disk_index = OrderedDict()  # key -> 文件大小，按最近使用排序
+        self._disk_bytes = 0
+        self._lock = threading.Lock()
+
+    def configure(self, config: dict):
+        config = config or {}
+        self.enabled = str(config.get("enable", True)).lower() in ("true", "1", "yes")
+        if not self.enabled:
+            return
+        self.max_text_length = int(config.get("max_text_length", 50))
+        cache_manager.configure(
+            CacheType.TTS_AUDIO,
+            CacheConfig(
+                strategy=CacheStrategy.LRU,
+                ttl=None,
+                max_size=int(config.get("memory_max_items", 500)),
+                max_bytes=int(float(config.get("memory_max_mb", 64)) * 1024 * 1024),
+            ),
+        )
+        self.disk_max_bytes = int(float(config.get("disk_max_mb", 200)) * 1024 * 1024)
+        self.disk_dir = config.get("disk_dir") or None
+        if self.disk_dir and self.disk_max_bytes > 0:
+            os.makedirs(self.disk_dir, exist_ok=True)
+            self._load_disk_index()
+        else:
+            self.disk_dir = None
+
+    def _load_disk_index(self):
+        """启动时按修改时间加载已有的磁盘缓存"""
+        files = []
+        for name in os.listdir(self.disk_dir):
+            if not name.endswith(".p3"):
+                continue
+            stat = os.stat(os.path.join(self.disk_dir, name))
+            files.append((stat.st_mtime, name[:-3], stat.st_size))
+        files.sort()
+        with self._lock:
+            for _, key, size in files:
+                self._disk_index[key] = size
+                self._disk_bytes += size
+            self._evict_disk()
+        logger.bind(tag=TAG).info(
+            f"TTS磁盘缓存已加载: {len(self._disk_index)}条, {self._disk_bytes / 1024 / 1024:.1f}MB"
+        )
+
+    def make_key(self, tts, text: str, audio_format: str) -> Optional[str]:
+        """生成缓存键，文本过长或清洗后为空时不缓存"""
+        if not self.enabled:
+            return None
+        normalized = MarkdownCleaner.clean_markdown(text).strip()
+        if not normalized or len(normalized) > self.max_text_length:
+            return None
+        raw = json.dumps(
+            [
+                type(tts).__module__,
+                str(getattr(tts, "voice", "")),
+                tts.config_fingerprint,
+                audio_format,
+                normalized,
+            ],
+            ensure_ascii=False,
+        )
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def _disk_path(self, key: str) -> str:
+        return os.path.join(self.disk_dir, f"{key}.p3")
+
+    def get(self, key: Optional[str]) -> Optional[List[bytes]]:
+        if key is None:
+            return None
+        audio_datas = cache_manager.get(CacheType.TTS_AUDIO, key)
+        if audio_datas is None:
+            audio_datas = self._get_from_disk(key)
+            if audio_datas is not None:
+                cache_manager.set(CacheType.TTS_AUDIO, key, audio_datas)
+        if audio_datas is not None:
+            cache_manager.record(
+                CacheType.TTS_AUDIO, "bytes_saved", sum(len(p) for p in audio_datas)
+            )
+        return audio_datas
+
+    def _get_from_disk(self, key: str) -> Optional[List[bytes]]:
+        if self.disk_dir is None:
+            return None
+        with self._lock:
+            if key not in self._disk_index:
+                return None
+            self._disk_index.move_to_end(key)
+        try:
+            audio_datas, _ = p3.decode_opus_from_file(self._disk_path(key))
+        except (OSError, ValueError) as e:
+            logger.bind(tag=TAG).warning(f"读取TTS磁盘缓存失败: {e}")
+            self._remove_disk(key)
+            return None
+        cache_manager.record(CacheType.TTS_AUDIO, "disk_hits")
+        return audio_datas
+
+    def put(self, key: Optional[str], audio_datas: List[bytes]):
+        if key is None or not audio_datas:
+            return
+        cache_manager.set(CacheType.TTS_AUDIO, key, audio_datas)
+        if self.disk_dir is None:
+            return
+        data = p3.encode_opus_to_bytes(audio_datas)
+        path = self._disk_path(key)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.bind(tag=TAG).warning(f"写入TTS磁盘缓存失败: {e}")
+            return
+        with self._lock:
+            self._disk_bytes += len(data) - self._disk_index.pop(key, 0)
+            self._disk_index[key] = len(data)
+            self._evict_disk()
+
+    def _remove_disk(self, key: str):
+        with self._lock:
+            self._disk_bytes -= self._disk_index.pop(key, 0)
+        try:
+            os.remove(self._disk_path(key))
+        except OSError:
+            pass
+
+    def _evict_disk(self):
+        """超出磁盘上限时删除最久未使用的文件，调用方需持有锁"""
+        while self._disk_bytes > self.disk_max_bytes and self._disk_index:
+            key, size = self._disk_index.popitem(last=False)
+            self._disk_bytes -= size
+            try:
+                os.remove(self._disk_path(key))
+            except OSError:
+                pass
+            cache_manager.record(CacheType.TTS_AUDIO, "disk_evictions")
+
+
+tts_audio_cache = TTSAudioCache()
@@ -0,0 +1,170 @@
+"""
+单轮对话耗时追踪
+
+从VAD判定用户说完话开始，记录一轮对话各阶段的耗时：
+VAD端点、ASR、声纹识别、意图识别、大模型首个token、首段TTS音频、首帧音频发送、最后一帧发送。
+每轮结束后可写入JSON Lines文件，并汇总为Prometheus格式的直方图。
+"""
+
+import os
+import json
+import time
+import threading
+from typing import Dict, Optional
+
+# 直方图分桶上限(秒)
+HISTOGRAM_BUCKETS = (0.05, 0.1, 0.2, 0.3, 0.5, 0.75, 1.0, 1.5, 2.0, 3.0, 5.0, 10.0)
+
+# 时间点类阶段，值为相对本轮开始的偏移
+MARK_STAGES = (
+    "llm_first_token",
+    "first_tts_segment",
+    "first_audio_sent",
+    "last_frame",
+)
+# 区间类阶段，值为阶段自身的耗时；vad_endpoint为最后一次检测到声音到判定说完话
+SPAN_STAGES = ("vad_endpoint", "asr", "voiceprint", "intent")
+
+
+class TurnTrace:
+    """一轮对话的追踪记录，各阶段时间均为相对本轮开始的毫秒数"""
+
+    def __init__(self, session_id: str):
+        self.session_id = session_id
+        self.sentence_id: Optional[str] = None
+        self.start_wall = time.time()
+        self.start = time.monotonic()
+        self.marks: Dict[str, float] = {}
+        self.spans: Dict[str, Dict[str, float]] = {}
+        self.finished = False
+
+    def _offset_ms(self, timestamp=None) -> float:
+        if timestamp is None:
+            timestamp = time.monotonic()
+        return round((timestamp - self.start) * 1000, 1)
+
+    def mark(self, stage: str, timestamp=None):
+        """记录某个时间点，同一阶段只记录第一次"""
+        if stage not in self.marks:
+            self.marks[stage] = self._offset_ms(timestamp)
+
+    def span(self, stage: str, start: float, end: float = None):
+        """记录某个阶段的起止时间(time.monotonic)"""
+        self.spans[stage] = {
+            "start": self._offset_ms(start),
+            "end": self._offset_ms(end),
+        }
+
+    def has(self, stage: str) -> bool:
+        return stage in self.marks or stage in self.spans
+
+    def elapsed(self, stage: str) -> Optional[float]:
+        """阶段耗时(秒)：时间点为相对开始的偏移，区间为自身耗时"""
+        if stage in self.marks:
+            return self.marks[stage] / 1000
+        if stage in self.spans:
+            span = self.spans[stage]
+            return (span["end"] - span["start"]) / 1000
+        return None
+
+    def to_dict(self) -> dict:
+        return {
+            "session_id": self.session_id,
+            "sentence_id": self.sentence_id,
+            "start_time": round(self.start_wall, 3),
+            "completed": "last_frame" in self.marks,
+            "marks": self.marks,
+            "spans": self.spans,
+        }
+
+
+class Histogram:
+    def __init__(self, buckets=HISTOGRAM_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.count += 1
+        self.sum += value
+        for i, upper in enumerate(self.buckets):
+            if value <= upper:
+                self.counts[i] += 1
+
+
+class TurnTracer:
+    """进程级的追踪汇总：导出JSON Lines，并维护各阶段的直方图"""
+
+    def __init__(self):
+        self.enabled = True
+        self.jsonl_path = None
+        self._lock = threading.Lock()
+        self._histograms: Dict[str, Histogram] = {
+            stage: Histogram() for stage in MARK_STAGES + SPAN_STAGES
+        }
+        self._turns_total = 0
+        self._turns_incomplete = 0
+
+    def configure(self, config: dict):
+        config = config or {}
+        self.enabled = str(config.get("enable", True)).lower() in ("true", "1", "yes")
+        self.jsonl_path = config.get("jsonl_path") or None
+        if self.jsonl_path:
+            os.makedirs(os.path.dirname(self.jsonl_path) or ".", exist_ok=True)
+
+    def start_turn(self, session_id: str) -> Optional[TurnTrace]:
+        if not self.enabled:
+            return None
+        return TurnTrace(session_id)
+
+    def finish_turn(self, trace: Optional[TurnTrace]):
+        """结束一轮追踪，写入文件并更新直方图，重复调用只记录一次"""
+        if trace is None:
+            return
+        with self._lock:
+            if trace.finished:
+                return
+            trace.finished = True
+            self._turns_total += 1
+            if not trace.has("last_frame"):
+                self._turns_incomplete += 1
+            for stage, histogram in self._histograms.items():
+                value = trace.elapsed(stage)
+                if value is not None:
+                    histogram.observe(value)
+            if self.jsonl_path:
+                with open(self.jsonl_path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(trace.to_dict(), ensure_ascii=False) + "\n")
+
+    def render_prometheus(self) -> str:
+        """输出Prometheus文本格式的指标"""
+        lines = [
+            "# HELP xiaozhi_turn_stage_seconds 单轮对话各阶段耗时(时间点为相对用户说完话的偏移)",
+            "# TYPE xiaozhi_turn_stage_seconds histogram",
+        ]
+        with self._lock:
+            for stage, histogram in self._histograms.items():
+                for upper, count in zip(histogram.buckets, histogram.counts):
+                    lines.append(
+                        f'xiaozhi_turn_stage_seconds_bucket{{stage="{stage}",le="{upper}"}} {count}'
+                    )
+                lines.append(
+                    f'xiaozhi_turn_stage_seconds_bucket{{stage="{stage}",le="+Inf"}} {histogram.count}'
+                )
+                lines.append(
+                    f'xiaozhi_turn_stage_seconds_sum{{stage="{stage}"}} {histogram.sum:.6f}'
+                )
+                lines.append(
+                    f'xiaozhi_turn_stage_seconds_count{{stage="{stage}"}} {histogram.count}'
+                )
+            lines.append("# HELP xiaozhi_turns_total 已结束的对话轮数")
+            lines.append("# TYPE xiaozhi_turns_total counter")
+            lines.append(f"xiaozhi_turns_total {self._turns_total}")
+            lines.append("# HELP xiaozhi_turns_incomplete_total 未发送完音频就结束的对话轮数")
+            lines.append("# TYPE xiaozhi_turns_incomplete_total counter")
+            lines.append(f"xiaozhi_turns_incomplete_total {self._turns_incomplete}")
+        return "\n".join(lines) + "\n"
+
+
+turn_tracer = TurnTracer()
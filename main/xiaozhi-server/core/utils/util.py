@@ -11,6 +11,7 @@ import requests
 import opuslib_next
 from pydub import AudioSegment
 import copy
+from core.utils.audio_stream import supports_in_process, decode_audio_bytes
 
 TAG = __name__
 emoji_map = {
@@ -108,7 +109,7 @@ def get_ip_info(ip_addr, logger):
         if is_private_ip(ip_addr):
             ip_addr = ""
         url = f"https://whois.pconline.com.cn/ipJson.jsp?json=true&ip={ip_addr}"
-        resp = requests.get(url).json()
+        resp = requests.get(url, timeout=10).json()
         ip_info = {"city": resp.get("city")}
 
         # 存入缓存
@@ -216,7 +217,12 @@ def audio_to_data(audio_file_path, is_opus=True):
     file_type = os.path.splitext(audio_file_path)[1]
     if file_type:
         file_type = file_type.lstrip(".")
-    # 读取音频文件，-nostdin 参数：不要从标准输入读取数据，否则FFmpeg会阻塞
+    if file_type and supports_in_process(file_type):
+        # WAV/MP3在进程内转码，不再启动ffmpeg进程
+        with open(audio_file_path, "rb") as f:
+            raw_data = decode_audio_bytes(f.read(), file_type)
+        return pcm_to_data(raw_data, is_opus), len(raw_data) / 2 / 16000
+    # 其他格式交给pydub，-nostdin 参数：不要从标准输入读取数据，否则FFmpeg会阻塞
     audio = AudioSegment.from_file(
         audio_file_path, format=file_type, parameters=["-nostdin"]
     )
@@ -234,11 +240,15 @@ def audio_to_data(audio_file_path, is_opus=True):
 
 def audio_bytes_to_data(audio_bytes, file_type, is_opus=True):
     """
-    直接用音频二进制数据转为opus/pcm数据，支持wav、mp3、p3
+    直接用音频二进制数据转为opus/pcm数据，支持wav、mp3、pcm(16kHz)、p3
     """
     if file_type == "p3":
         # 直接用p3解码
         return p3.decode_opus_from_bytes(audio_bytes)
+    elif supports_in_process(file_type):
+        # WAV/MP3/PCM在进程内转码，不再启动ffmpeg进程
+        raw_data = decode_audio_bytes(audio_bytes, file_type)
+        return pcm_to_data(raw_data, is_opus), len(raw_data) / 2 / 16000
     else:
         # 其他格式用pydub
         audio = AudioSegment.from_file(
@@ -5,6 +5,7 @@ from core.connection import ConnectionHandler
 from config.config_loader import get_config_from_api
 from core.utils.modules_initialize import initialize_modules
 from core.utils.util import check_vad_update, check_asr_update
+from core.providers.tools.server_mcp import ServerMCPPool
 
 TAG = __name__
 
@@ -31,16 +32,23 @@ class WebSocketServer:
         self._memory = modules["memory"] if "memory" in modules else None
 
         self.active_connections = set()
+        # 所有连接共享的服务端MCP客户端
+        self.mcp_pool = ServerMCPPool(self.config)
 
     async def start(self):
         server_config = self.config["server"]
         host = server_config.get("ip", "0.0.0.0")
         port = int(server_config.get("port", 8000))
 
-        async with websockets.serve(
-            self._handle_connection, host, port, process_request=self._http_response
-        ):
-            await asyncio.Future()
+        try:
+            async with websockets.serve(
+                self._handle_connection, host, port, process_request=self._http_response
+            ):
+                # 后台启动MCP服务，首个连接到来时无需再等待
+                asyncio.create_task(self.mcp_pool.start())
+                await asyncio.Future()
+        finally:
+            await self.mcp_pool.close()
 
     async def _handle_connection(self, websocket):
         """处理新连接，每次创建独立的ConnectionHandler"""
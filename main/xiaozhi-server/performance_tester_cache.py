@@ -0,0 +1,153 @@
+import time
+import random
+import argparse
+import threading
+from tabulate import tabulate
+from core.utils.cache.manager import GlobalCacheManager
+from core.utils.cache.config import CacheConfig, CacheType
+from core.utils.cache.strategies import CacheStrategy
+
+# 测试的缓存类型及其配置：条数上限、字节上限、TTL和每个值的大小
+WORKLOADS = {
+    CacheType.TTS_AUDIO: (
+        CacheConfig(
+            strategy=CacheStrategy.LRU,
+            ttl=None,
+            max_size=500,
+            max_bytes=8 * 1024 * 1024,
+        ),
+        32 * 1024,
+    ),
+    CacheType.INTENT: (
+        CacheConfig(strategy=CacheStrategy.TTL_LRU, ttl=2, max_size=1000),
+        256,
+    ),
+    CacheType.WEATHER: (
+        CacheConfig(strategy=CacheStrategy.TTL, ttl=5, max_size=1000),
+        1024,
+    ),
+    CacheType.CONFIG: (
+        CacheConfig(strategy=CacheStrategy.FIXED_SIZE, ttl=None, max_size=20),
+        4096,
+    ),
+}
+
+
+def zipf_weights(count: int, s: float = 1.1):
+    return [1 / (rank**s) for rank in range(1, count + 1)]
+
+
+class CachePerformanceTester:
+    def __init__(self, threads: int, ops: int, keys: int, read_ratio: float):
+        self.threads = threads
+        self.ops = ops
+        self.keys = keys
+        self.read_ratio = read_ratio
+
+    def _worker(self, manager, seed, latencies, gets):
+        rng = random.Random(seed)
+        types = list(WORKLOADS)
+        keys = rng.choices(
+            range(self.keys), weights=zipf_weights(self.keys), k=self.ops
+        )
+        values = {cache_type: b"x" * size for cache_type, (_, size) in WORKLOADS.items()}
+        local_gets = 0
+        for key in keys:
+            cache_type = rng.choice(types)
+            start = time.perf_counter()
+            if rng.random() < self.read_ratio:
+                if manager.get(cache_type, f"k{key}") is None:
+                    manager.set(cache_type, f"k{key}", values[cache_type])
+                local_gets += 1
+            else:
+                manager.set(cache_type, f"k{key}", values[cache_type])
+            latencies.append(time.perf_counter() - start)
+        gets.append(local_gets)
+
+    def run(self):
+        print(
+            f"🔍 线程数: {self.threads}，每线程操作数: {self.ops}，"
+            f"键数量: {self.keys}，读比例: {self.read_ratio:.0%}"
+        )
+        manager = GlobalCacheManager()
+        for cache_type, (config, _) in WORKLOADS.items():
+            manager.configure(cache_type, config)
+
+        latencies = []
+        gets = []
+        workers = [
+            threading.Thread(
+                target=self._worker, args=(manager, seed, latencies, gets)
+            )
+            for seed in range(self.threads)
+        ]
+        print("⏳ 测试中...")
+        start = time.perf_counter()
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        elapsed = time.perf_counter() - start
+        manager.cleanup_expired()
+        manager.stop_sweeper()
+
+        latencies.sort()
+        stats = manager.get_stats()
+        rows = []
+        for cache_type, (config, _) in WORKLOADS.items():
+            cache = stats["caches"].get(cache_type.value, {})
+            within = cache.get("size", 0) <= config.max_size and (
+                not config.max_bytes or cache.get("bytes", 0) <= config.max_bytes
+            )
+            rows.append(
+                [
+                    cache_type.value,
+                    f"{cache.get('hit_rate', 0):.1%}",
+                    f"{cache.get('size', 0)}/{config.max_size}",
+                    f"{cache.get('bytes', 0) // 1024}KB",
+                    f"{cache.get('evictions', 0)}",
+                    f"{cache.get('expirations', 0)}",
+                    "✅" if within else "❌",
+                ]
+            )
+
+        total_gets = sum(gets)
+        consistent = stats["hits"] + stats["misses"] == total_gets
+        print("\n缓存并发性能:\n")
+        print(
+            tabulate(
+                [
+                    [
+                        f"{len(latencies) / elapsed:,.0f}",
+                        f"{latencies[len(latencies) // 2] * 1e6:.1f}μs",
+                        f"{latencies[int(len(latencies) * 0.99) - 1] * 1e6:.1f}μs",
+                        f"{stats['hits'] / max(total_gets, 1):.1%}",
+                        "✅" if consistent else "❌",
+                    ]
+                ],
+                headers=["每秒操作数", "延迟P50", "延迟P99", "命中率", "命中+未命中=读取次数"],
+                tablefmt="github",
+                colalign=("right", "right", "right", "right", "center"),
+                disable_numparse=True,
+            )
+        )
+        print("\n各缓存类型:\n")
+        print(
+            tabulate(
+                rows,
+                headers=["缓存类型", "命中率", "条数", "估算占用", "淘汰", "过期", "未超上限"],
+                tablefmt="github",
+                colalign=("left", "right", "right", "right", "right", "right", "center"),
+                disable_numparse=True,
+            )
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="全局缓存并发性能测试")
+    parser.add_argument("--threads", type=int, default=32, help="并发线程数")
+    parser.add_argument("--ops", type=int, default=20000, help="每个线程的操作数")
+    parser.add_argument("--keys", type=int, default=5000, help="键的数量（Zipf分布）")
+    parser.add_argument("--read-ratio", type=float, default=0.8, help="读操作比例")
+    args = parser.parse_args()
+    CachePerformanceTester(args.threads, args.ops, args.keys, args.read_ratio).run()
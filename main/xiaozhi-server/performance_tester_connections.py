@@ -0,0 +1,245 @@
+import os
+import gc
+import time
+import queue
+import asyncio
+import argparse
+import threading
+import resource
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor
+from tabulate import tabulate
+from core.utils.executor import get_executor, configure_executor, run_blocking
+from core.utils.loop_queue import LoopQueue
+
+# 设备每60ms上传一个Opus包
+FRAME_INTERVAL = 0.06
+# 模拟每个音频包的处理耗时（VAD推理等）
+FRAME_WORK = 0.0002
+
+
+def get_rss_mb():
+    """当前进程的常驻内存(MB)"""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    # 非Linux系统只能拿到峰值内存
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return usage / 1024 / 1024 if os.uname().sysname == "Darwin" else usage / 1024
+
+
+class ThreadedConnection:
+    """原有连接模型：每个连接3个轮询线程 + 上报线程 + 私有线程池"""
+
+    def __init__(self, loop):
+        self.loop = loop
+        self.stop_event = threading.Event()
+        self.executor = ThreadPoolExecutor(max_workers=5)
+        self.asr_audio_queue = queue.Queue()
+        self.tts_text_queue = queue.Queue()
+        self.tts_audio_queue = queue.Queue()
+        self.report_queue = queue.Queue()
+        self.processed = 0
+        for target in (
+            self._asr_thread,
+            self._tts_text_thread,
+            self._audio_play_thread,
+            self._report_thread,
+        ):
+            threading.Thread(target=target, daemon=True).start()
+        # 初始化组件也在私有线程池中执行
+        self.executor.submit(lambda: None)
+
+    async def _handle_audio(self, message):
+        time.sleep(FRAME_WORK)
+        self.processed += 1
+
+    def _asr_thread(self):
+        while not self.stop_event.is_set():
+            try:
+                message = self.asr_audio_queue.get(timeout=1)
+                asyncio.run_coroutine_threadsafe(
+                    self._handle_audio(message), self.loop
+                ).result()
+            except queue.Empty:
+                continue
+
+    def _poll(self, q):
+        while not self.stop_event.is_set():
+            try:
+                q.get(timeout=1)
+            except queue.Empty:
+                continue
+
+    def _tts_text_thread(self):
+        self._poll(self.tts_text_queue)
+
+    def _audio_play_thread(self):
+        self._poll(self.tts_audio_queue)
+
+    def _report_thread(self):
+        self._poll(self.report_queue)
+
+    def put_audio(self, message):
+        self.asr_audio_queue.put(message)
+
+    def close(self):
+        self.stop_event.set()
+        self.executor.shutdown(wait=False)
+
+
+class AsyncConnection:
+    """事件循环连接模型：asyncio任务消费队列，阻塞调用交给共享线程池"""
+
+    def __init__(self, loop):
+        self.loop = loop
+        self.stop_event = threading.Event()
+        self.executor = get_executor()
+        self.asr_audio_queue = LoopQueue(loop)
+        self.tts_text_queue = LoopQueue(loop)
+        self.tts_audio_queue = LoopQueue(loop)
+        self.report_queue = LoopQueue(loop)
+        self.processed = 0
+        self.tasks = [
+            loop.create_task(self._asr_task()),
+            loop.create_task(self._consume(self.tts_text_queue)),
+            loop.create_task(self._consume(self.tts_audio_queue)),
+            loop.create_task(self._consume(self.report_queue)),
+        ]
+        self.executor.submit(lambda: None)
+
+    async def _asr_task(self):
+        while not self.stop_event.is_set():
+            await self.asr_audio_queue.get()
+            time.sleep(FRAME_WORK)
+            self.processed += 1
+
+    async def _consume(self, q):
+        while not self.stop_event.is_set():
+            item = await q.get()
+            await run_blocking(lambda: item)
+
+    def put_audio(self, message):
+        self.asr_audio_queue.put(message)
+
+    def close(self):
+        self.stop_event.set()
+        for task in self.tasks:
+            task.cancel()
+
+
+MODELS = {
+    "每连接独立线程": ThreadedConnection,
+    "asyncio任务+共享线程池": AsyncConnection,
+}
+
+
+def _measure(name, connections, active_seconds, workers):
+    """在独立进程中测试一种连接模型，避免前一个模型的内存影响结果"""
+    configure_executor(workers)
+    tester = ConnectionLoadTester(connections, active_seconds, workers)
+    return asyncio.run(tester._run_model(MODELS[name]))
+
+
+class ConnectionLoadTester:
+    def __init__(self, connections: int, active_seconds: float, workers: int):
+        self.connections = connections
+        self.active_seconds = active_seconds
+        self.workers = workers
+
+    async def _run_model(self, model_cls):
+        loop = asyncio.get_running_loop()
+        gc.collect()
+        base_threads = threading.active_count()
+        base_rss = get_rss_mb()
+
+        conns = [model_cls(loop) for _ in range(self.connections)]
+        # 等待线程启动、任务进入等待状态
+        await asyncio.sleep(1)
+        idle_threads = threading.active_count() - base_threads
+        idle_rss = get_rss_mb() - base_rss
+
+        # 所有连接同时上传音频
+        packet = bytes(120)
+        frames = int(self.active_seconds / FRAME_INTERVAL)
+        start = time.perf_counter()
+        cpu_start = time.process_time()
+        for _ in range(frames):
+            tick = time.perf_counter()
+            for conn in conns:
+                conn.put_audio(packet)
+            await asyncio.sleep(max(FRAME_INTERVAL - (time.perf_counter() - tick), 0))
+        # 等待队列中剩余的音频处理完
+        expected = frames * self.connections
+        deadline = time.perf_counter() + 30
+        while (
+            sum(conn.processed for conn in conns) < expected
+            and time.perf_counter() < deadline
+        ):
+            await asyncio.sleep(0.05)
+        elapsed = time.perf_counter() - start
+        cpu_time = time.process_time() - cpu_start
+        active_threads = threading.active_count() - base_threads
+        active_rss = get_rss_mb() - base_rss
+        processed = sum(conn.processed for conn in conns)
+
+        for conn in conns:
+            conn.close()
+
+        per_1000 = 1000 / self.connections
+        return [
+            f"{idle_threads * per_1000:.0f}",
+            f"{idle_rss * per_1000:.1f}MB",
+            f"{active_threads * per_1000:.0f}",
+            f"{active_rss * per_1000:.1f}MB",
+            f"{cpu_time / elapsed * 100:.0f}%",
+            f"{processed}/{expected}",
+        ]
+
+    def run(self):
+        print(
+            f"🔍 连接数: {self.connections}，活跃阶段每个连接每{int(FRAME_INTERVAL * 1000)}ms"
+            f"上传一个音频包，持续{self.active_seconds}秒"
+        )
+        rows = []
+        ctx = multiprocessing.get_context("spawn")
+        for name in MODELS:
+            print(f"⏳ 测试{name}...")
+            with ctx.Pool(1) as pool:
+                row = pool.apply(
+                    _measure,
+                    (name, self.connections, self.active_seconds, self.workers),
+                )
+            rows.append([name] + row)
+
+        print("\n连接模型资源占用对比(折算为每1000个连接):\n")
+        print(
+            tabulate(
+                rows,
+                headers=[
+                    "连接模型",
+                    "空闲线程数",
+                    "空闲内存",
+                    "活跃线程数",
+                    "活跃内存",
+                    "活跃CPU",
+                    "已处理音频包",
+                ],
+                tablefmt="github",
+                colalign=("left", "right", "right", "right", "right", "right", "right"),
+                disable_numparse=True,
+            )
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="连接模型线程数与内存压测")
+    parser.add_argument("--connections", type=int, default=1000, help="模拟连接数")
+    parser.add_argument("--seconds", type=float, default=5.0, help="活跃阶段时长(秒)")
+    parser.add_argument("--workers", type=int, default=64, help="共享线程池大小")
+    args = parser.parse_args()
+    ConnectionLoadTester(args.connections, args.seconds, args.workers).run()
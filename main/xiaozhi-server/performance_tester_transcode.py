@@ -0,0 +1,143 @@
+import time
+import asyncio
+import argparse
+import subprocess
+import statistics
+from io import BytesIO
+from pydub import AudioSegment
+from tabulate import tabulate
+from core.utils.util import audio_bytes_to_data, pcm_to_data
+from core.utils.audio_stream import supports_in_process
+from core.utils.executor import configure_executor, run_blocking
+
+# 测试用的音频：TTS常见的WAV(24kHz)与MP3
+SAMPLES = {
+    "wav": "config/assets/max_output_size.wav",
+    "mp3": "config/assets/tts_notify.mp3",
+}
+
+
+class SpawnCounter:
+    """统计测试期间启动的子进程数"""
+
+    def __init__(self):
+        self.count = 0
+        self._original = subprocess.Popen.__init__
+
+    def __enter__(self):
+        counter = self
+        original = self._original
+
+        def init(popen, *args, **kwargs):
+            counter.count += 1
+            original(popen, *args, **kwargs)
+
+        subprocess.Popen.__init__ = init
+        return self
+
+    def __exit__(self, *exc):
+        subprocess.Popen.__init__ = self._original
+
+
+def pydub_to_data(audio_bytes, file_type):
+    """原有方式：每段音频启动一次ffmpeg进程"""
+    audio = AudioSegment.from_file(
+        BytesIO(audio_bytes), format=file_type, parameters=["-nostdin"]
+    )
+    audio = audio.set_channels(1).set_frame_rate(16000).set_sample_width(2)
+    return pcm_to_data(audio.raw_data, True), len(audio) / 1000.0
+
+
+def in_process_to_data(audio_bytes, file_type):
+    return audio_bytes_to_data(audio_bytes, file_type, is_opus=True)
+
+
+METHODS = {
+    "pydub(ffmpeg子进程)": pydub_to_data,
+    "进程内转码": in_process_to_data,
+}
+
+
+class TranscodePerformanceTester:
+    def __init__(self, conversations: int, segments: int, workers: int):
+        self.conversations = conversations
+        self.segments = segments
+        self.workers = workers
+
+    async def _conversation(self, func, audio_bytes, file_type, latencies):
+        """一路对话依次转码多段TTS音频"""
+        for _ in range(self.segments):
+            start = time.perf_counter()
+            await run_blocking(func, audio_bytes, file_type)
+            latencies.append(time.perf_counter() - start)
+
+    async def _run_method(self, func, audio_bytes, file_type):
+        latencies = []
+        with SpawnCounter() as spawns:
+            cpu_start = time.process_time()
+            start = time.perf_counter()
+            await asyncio.gather(
+                *(
+                    self._conversation(func, audio_bytes, file_type, latencies)
+                    for _ in range(self.conversations)
+                )
+            )
+            elapsed = time.perf_counter() - start
+            cpu_time = time.process_time() - cpu_start
+        latencies.sort()
+        return [
+            f"{statistics.median(latencies) * 1000:.1f}ms",
+            f"{latencies[int(len(latencies) * 0.95) - 1] * 1000:.1f}ms",
+            f"{len(latencies) / elapsed:.1f}",
+            f"{cpu_time:.2f}秒",
+            f"{spawns.count}",
+        ]
+
+    async def _run(self):
+        rows = []
+        for file_type, path in SAMPLES.items():
+            with open(path, "rb") as f:
+                audio_bytes = f.read()
+            for name, func in METHODS.items():
+                label = name
+                if func is in_process_to_data and not supports_in_process(file_type):
+                    label = f"{name}(未安装PyAV，回退子进程)"
+                print(f"⏳ 测试{file_type} - {label}...")
+                row = await self._run_method(func, audio_bytes, file_type)
+                rows.append([file_type, label] + row)
+        return rows
+
+    def run(self):
+        print(
+            f"🔍 并发对话: {self.conversations}，每路转码{self.segments}段，"
+            f"线程池大小: {self.workers}"
+        )
+        configure_executor(self.workers)
+        rows = asyncio.run(self._run())
+        print("\nTTS音频转码性能对比:\n")
+        print(
+            tabulate(
+                rows,
+                headers=[
+                    "格式",
+                    "方式",
+                    "每段延迟P50",
+                    "每段延迟P95",
+                    "每秒段数",
+                    "本进程CPU耗时",
+                    "启动子进程数",
+                ],
+                tablefmt="github",
+                colalign=("left", "left", "right", "right", "right", "right", "right"),
+                disable_numparse=True,
+            )
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="TTS音频转码性能测试")
+    parser.add_argument("--conversations", type=int, default=200, help="并发对话数")
+    parser.add_argument("--segments", type=int, default=5, help="每路对话转码的段数")
+    parser.add_argument("--workers", type=int, default=64, help="共享线程池大小")
+    args = parser.parse_args()
+    TranscodePerformanceTester(args.conversations, args.segments, args.workers).run()
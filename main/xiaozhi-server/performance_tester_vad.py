@@ -0,0 +1,252 @@
+import os
+import time
+import argparse
+import logging
+import tracemalloc
+import numpy as np
+import torch
+from tabulate import tabulate
+from core.providers.vad.silero import (
+    SileroBatchEngine,
+    SileroModelState,
+    WINDOW_SIZE_SAMPLES,
+)
+from core.utils.audio_buffer import PcmRingBuffer
+
+# 设置全局日志级别为WARNING，抑制INFO级别日志
+logging.basicConfig(level=logging.WARNING)
+
+MODEL_DIR = "models/snakers4_silero-vad"
+# 每个Opus包解码出960个采样点
+PCM_FRAME = 960
+# 统计内存分配时使用的音频包数，开头的包用于预热，不计入统计
+TRACE_FRAMES = 2000
+TRACE_WARMUP_FRAMES = 100
+
+
+class VADPerformanceTester:
+    """对比逐连接逐窗口推理与批量推理在大量并发音频流下的CPU占用"""
+
+    def __init__(self, streams: int, seconds: float, max_batch_size: int):
+        self.streams = streams
+        self.seconds = seconds
+        self.max_batch_size = max_batch_size
+        # 每秒16000采样点，约31个512采样点窗口
+        self.windows_per_stream = int(seconds * 16000 // WINDOW_SIZE_SAMPLES)
+        rng = np.random.default_rng(0)
+        self.windows = (
+            rng.standard_normal((self.windows_per_stream, WINDOW_SIZE_SAMPLES))
+            .astype(np.float32)
+            * 0.1
+        )
+
+    def _test_torch_single(self):
+        """原有方式：每个连接每个窗口单独调用一次torch模型"""
+        model, _ = torch.hub.load(
+            repo_or_dir=MODEL_DIR,
+            source="local",
+            model="silero_vad",
+            force_reload=False,
+        )
+        start_cpu = time.process_time()
+        start_wall = time.perf_counter()
+        with torch.no_grad():
+            for window in self.windows:
+                tensor = torch.from_numpy(window)
+                for _ in range(self.streams):
+                    model(tensor, 16000).item()
+        return time.process_time() - start_cpu, time.perf_counter() - start_wall
+
+    def _test_onnx(self, max_batch_size: int):
+        """onnxruntime推理，max_batch_size为1时即逐连接逐窗口推理
+
+        与批量推理使用相同的会话设置(单线程)，两者的差异只来自批量合并。
+        """
+        engine = SileroBatchEngine(
+            os.path.join(MODEL_DIR, "src", "silero_vad", "data", "silero_vad.onnx"),
+            max_batch_size=max_batch_size,
+        )
+        states = [SileroModelState() for _ in range(self.streams)]
+        start_cpu = time.process_time()
+        start_wall = time.perf_counter()
+        for window in self.windows:
+            pending = [(state, [window], None, None) for state in states]
+            engine._infer_pending(pending)
+        return time.process_time() - start_cpu, time.perf_counter() - start_wall
+
+    def _test_onnx_single(self):
+        return self._test_onnx(1)
+
+    def _test_batch(self):
+        """批量方式：同一节拍内所有连接的窗口合并为一次前向计算"""
+        return self._test_onnx(self.max_batch_size)
+
+    @staticmethod
+    def _bytearray_feeder():
+        """原有方式：bytearray切片 + frombuffer/astype转换"""
+        buffer = bytearray()
+
+        def feed(frame):
+            nonlocal buffer
+            count = 0
+            buffer.extend(frame)
+            while len(buffer) >= WINDOW_SIZE_SAMPLES * 2:
+                chunk = buffer[: WINDOW_SIZE_SAMPLES * 2]
+                buffer = buffer[WINDOW_SIZE_SAMPLES * 2 :]
+                audio_int16 = np.frombuffer(chunk, dtype=np.int16)
+                audio_int16.astype(np.float32) / 32768.0
+                count += 1
+            return count
+
+        return feed
+
+    @staticmethod
+    def _ring_buffer_feeder():
+        """环形缓冲区：窗口为视图，归一化写入复用数组"""
+        buffer = PcmRingBuffer()
+
+        def feed(frame):
+            count = 0
+            buffer.write(frame)
+            while buffer.read_window_float32() is not None:
+                count += 1
+            return count
+
+        return feed
+
+    @staticmethod
+    def _time_feeder(feed, frames):
+        count = 0
+        start = time.perf_counter()
+        for frame in frames:
+            count += feed(frame)
+        return time.perf_counter() - start, count
+
+    @staticmethod
+    def _trace_feeder(feed, frames):
+        """用tracemalloc统计每个窗口的临时内存峰值和残留内存增长(字节)"""
+        for frame in frames[:TRACE_WARMUP_FRAMES]:
+            feed(frame)
+        peak_total = 0
+        count = 0
+        tracemalloc.start()
+        try:
+            start_current, _ = tracemalloc.get_traced_memory()
+            for frame in frames[TRACE_WARMUP_FRAMES:TRACE_FRAMES]:
+                before, _ = tracemalloc.get_traced_memory()
+                tracemalloc.reset_peak()
+                count += feed(frame)
+                _, peak = tracemalloc.get_traced_memory()
+                peak_total += peak - before
+            end_current, _ = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        count = max(count, 1)
+        return peak_total / count, (end_current - start_current) / count
+
+    def run_buffer(self):
+        """对比VAD取窗口阶段的缓冲区内存分配，分配量由tracemalloc实测"""
+        rng = np.random.default_rng(0)
+        frames = [
+            rng.integers(-3000, 3000, PCM_FRAME, dtype=np.int16).tobytes()
+            for _ in range(
+                max(int(self.seconds * 16000 // PCM_FRAME) * 100, TRACE_FRAMES)
+            )
+        ]
+        # 实时音频每路每秒约31.25个窗口
+        windows_per_second = self.streams * 16000 / WINDOW_SIZE_SAMPLES
+        rows = []
+        for name, feeder in (
+            ("bytearray切片", self._bytearray_feeder),
+            ("环形缓冲区", self._ring_buffer_feeder),
+        ):
+            elapsed, windows = self._time_feeder(feeder(), frames)
+            peak, growth = self._trace_feeder(feeder(), frames)
+            rows.append(
+                [
+                    name,
+                    f"{elapsed / windows * 1e6:.2f}微秒",
+                    f"{peak:.0f}",
+                    f"{windows_per_second * peak / 1024 / 1024:.1f}MB",
+                    f"{growth:.0f}",
+                ]
+            )
+
+        print(f"\nVAD缓冲区分配对比({self.streams}路并发):\n")
+        print(
+            tabulate(
+                rows,
+                headers=[
+                    "方式",
+                    "每窗口耗时",
+                    "每窗口临时内存(字节)",
+                    "每秒临时内存",
+                    "每窗口残留(字节)",
+                ],
+                tablefmt="github",
+                colalign=("left", "right", "right", "right", "right"),
+                disable_numparse=True,
+            )
+        )
+
+    def run(self):
+        print(
+            f"🔍 并发音频流: {self.streams}，每路音频时长: {self.seconds}秒，"
+            f"窗口数: {self.windows_per_stream}"
+        )
+        rows = []
+        baseline = None
+        # onnxruntime逐窗口推理为基准，torch一行只反映运行时本身的差异
+        for name, test in (
+            ("onnxruntime逐窗口推理", self._test_onnx_single),
+            ("onnxruntime批量推理", self._test_batch),
+            ("torch逐窗口推理", self._test_torch_single),
+        ):
+            print(f"⏳ 测试{name}...")
+            cpu_time, wall_time = test()
+            if baseline is None:
+                baseline = cpu_time
+            # 折算为每1000路并发音频流、每秒音频消耗的CPU秒数
+            cpu_per_1000 = cpu_time / self.seconds * 1000 / self.streams
+            rows.append(
+                [
+                    name,
+                    f"{cpu_time:.3f}秒",
+                    f"{wall_time:.3f}秒",
+                    f"{cpu_per_1000:.3f}",
+                    f"{baseline / cpu_time:.2f}x",
+                ]
+            )
+
+        print("\nVAD推理性能对比:\n")
+        print(
+            tabulate(
+                rows,
+                headers=[
+                    "方式",
+                    "CPU耗时",
+                    "实际耗时",
+                    "每1000路每秒音频CPU秒数",
+                    "相对逐窗口onnxruntime",
+                ],
+                tablefmt="github",
+                colalign=("left", "right", "right", "right", "right"),
+                disable_numparse=True,
+            )
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Silero VAD批量推理性能测试")
+    parser.add_argument("--streams", type=int, default=1000, help="并发音频流数量")
+    parser.add_argument("--seconds", type=float, default=1.0, help="每路音频时长(秒)")
+    parser.add_argument("--batch", type=int, default=256, help="单批次最大窗口数")
+    parser.add_argument(
+        "--buffer", action="store_true", help="只测试VAD缓冲区的分配情况"
+    )
+    args = parser.parse_args()
+    tester = VADPerformanceTester(args.streams, args.seconds, args.batch)
+    if args.buffer:
+        tester.run_buffer()
+    else:
+        tester.run()
@@ -4,6 +4,8 @@ import json
 from config.logger import setup_logging
 from plugins_func.register import register_function, ToolType, ActionResponse, Action
 from markitdown import MarkItDown
+from core.utils.executor import run_blocking
+from core.utils.http_client import get_http_session
 
 TAG = __name__
 logger = setup_logging()
@@ -116,7 +118,7 @@ GET_NEWS_FROM_NEWSNOW_FUNCTION_DESC = {
 }
 
 
-def fetch_news_from_api(conn, source="thepaper"):
+async def fetch_news_from_api(conn, source="thepaper"):
     """从API获取新闻列表"""
     try:
         api_url = f"https://newsnow.busiyi.world/api/s?id={source}"
@@ -125,10 +127,9 @@ def fetch_news_from_api(conn, source="thepaper"):
         ]["get_news_from_newsnow"].get("url"):
             api_url = conn.config["plugins"]["get_news_from_newsnow"]["url"] + source
 
-        response = requests.get(api_url, timeout=10)
-        response.raise_for_status()
-
-        data = response.json()
+        async with get_http_session().get(api_url) as response:
+            response.raise_for_status()
+            data = await response.json(content_type=None)
 
         if "items" in data:
             return data["items"]
@@ -142,7 +143,7 @@ def fetch_news_from_api(conn, source="thepaper"):
 
 
 def fetch_news_detail(url):
-    """获取新闻详情页内容并使用MarkItDown清理HTML"""
+    """获取新闻详情页内容并使用MarkItDown清理HTML，在线程池中调用"""
     try:
         response = requests.get(url, timeout=10)
         response.raise_for_status()
@@ -170,7 +171,7 @@ def fetch_news_detail(url):
     GET_NEWS_FROM_NEWSNOW_FUNCTION_DESC,
     ToolType.SYSTEM_CTL,
 )
-def get_news_from_newsnow(
+async def get_news_from_newsnow(
     conn, source: str = "澎湃新闻", detail: bool = False, lang: str = "zh_CN"
 ):
     """获取新闻并随机选择一条进行播报，或获取上一条新闻的详细内容"""
@@ -207,7 +208,7 @@ def get_news_from_newsnow(
             )
 
             # 获取新闻详情
-            detail_content = fetch_news_detail(url)
+            detail_content = await run_blocking(fetch_news_detail, url)
 
             if not detail_content or detail_content == "无法获取详细内容":
                 return ActionResponse(
@@ -249,7 +250,7 @@ def get_news_from_newsnow(
         logger.bind(tag=TAG).info(f"获取新闻: 新闻源={source}({english_source_id})")
 
         # 获取新闻列表
-        news_items = fetch_news_from_api(conn, english_source_id)
+        news_items = await fetch_news_from_api(conn, english_source_id)
 
         if not news_items:
             return ActionResponse(
@@ -1,8 +1,9 @@
-import requests
 from bs4 import BeautifulSoup
 from config.logger import setup_logging
 from plugins_func.register import register_function, ToolType, ActionResponse, Action
 from core.utils.util import get_ip_info
+from core.utils.executor import run_blocking
+from core.utils.http_client import get_http_session
 
 TAG = __name__
 logger = setup_logging()
@@ -107,15 +108,20 @@ WEATHER_CODE_MAP = {
 }
 
 
-def fetch_city_info(location, api_key, api_host):
+async def fetch_city_info(location, api_key, api_host):
     url = f"https://{api_host}/geo/v2/city/lookup?key={api_key}&location={location}&lang=zh"
-    response = requests.get(url, headers=HEADERS).json()
-    return response.get("location", [])[0] if response.get("location") else None
+    async with get_http_session().get(url, headers=HEADERS) as response:
+        data = await response.json(content_type=None)
+    return data.get("location", [])[0] if data.get("location") else None
 
 
-def fetch_weather_page(url):
-    response = requests.get(url, headers=HEADERS)
-    return BeautifulSoup(response.text, "html.parser") if response.ok else None
+async def fetch_weather_page(url):
+    async with get_http_session().get(url, headers=HEADERS) as response:
+        if not response.ok:
+            return None
+        html = await response.text()
+    # 网页解析较耗CPU，放到线程池中执行
+    return await run_blocking(BeautifulSoup, html, "html.parser")
 
 
 def parse_weather_info(soup):
@@ -150,7 +156,7 @@ def parse_weather_info(soup):
 
 
 @register_function("get_weather", GET_WEATHER_FUNCTION_DESC, ToolType.SYSTEM_CTL)
-def get_weather(conn, location: str = None, lang: str = "zh_CN"):
+async def get_weather(conn, location: str = None, lang: str = "zh_CN"):
     from core.utils.cache.manager import cache_manager, CacheType
 
     api_host = conn.config["plugins"]["get_weather"].get(
@@ -167,14 +173,18 @@ def get_weather(conn, location: str = None, lang: str = "zh_CN"):
         # 通过客户端IP解析城市
         if client_ip:
             # 先从缓存获取IP对应的城市信息
-            cached_ip_info = cache_manager.get(CacheType.IP_INFO, client_ip)
+            cached_ip_info = await run_blocking(
+                cache_manager.get, CacheType.IP_INFO, client_ip
+            )
             if cached_ip_info:
                 location = cached_ip_info.get("city")
             else:
                 # 缓存未命中，调用API获取
-                ip_info = get_ip_info(client_ip, logger)
+                ip_info = await run_blocking(get_ip_info, client_ip, logger)
                 if ip_info:
-                    cache_manager.set(CacheType.IP_INFO, client_ip, ip_info)
+                    await run_blocking(
+                        cache_manager.set, CacheType.IP_INFO, client_ip, ip_info
+                    )
                     location = ip_info.get("city")
 
             if not location:
@@ -184,17 +194,19 @@ def get_weather(conn, location: str = None, lang: str = "zh_CN"):
             location = default_location
     # 尝试从缓存获取完整天气报告
     weather_cache_key = f"full_weather_{location}_{lang}"
-    cached_weather_report = cache_manager.get(CacheType.WEATHER, weather_cache_key)
+    cached_weather_report = await run_blocking(
+        cache_manager.get, CacheType.WEATHER, weather_cache_key
+    )
     if cached_weather_report:
         return ActionResponse(Action.REQLLM, cached_weather_report, None)
 
     # 缓存未命中，获取实时天气数据
-    city_info = fetch_city_info(location, api_key, api_host)
+    city_info = await fetch_city_info(location, api_key, api_host)
     if not city_info:
         return ActionResponse(
             Action.REQLLM, f"未找到相关的城市: {location}，请确认地点是否正确", None
         )
-    soup = fetch_weather_page(city_info["fxLink"])
+    soup = await fetch_weather_page(city_info["fxLink"])
     if not soup:
         return ActionResponse(Action.REQLLM, None, "请求失败")
     city_name, current_abstract, current_basic, temps_list = parse_weather_info(soup)
@@ -217,6 +229,8 @@ def get_weather(conn, location: str = None, lang: str = "zh_CN"):
     weather_report += "\n（如需某一天的具体天气，请告诉我日期）"
 
     # 缓存完整的天气报告
-    cache_manager.set(CacheType.WEATHER, weather_cache_key, weather_report)
+    await run_blocking(
+        cache_manager.set, CacheType.WEATHER, weather_cache_key, weather_report
+    )
 
     return ActionResponse(Action.REQLLM, weather_report, None)
@@ -1,8 +1,8 @@
 from plugins_func.register import register_function, ToolType, ActionResponse, Action
 from plugins_func.functions.hass_init import initialize_hass_handler
 from config.logger import setup_logging
+from core.utils.http_client import get_http_session
 import asyncio
-import requests
 
 TAG = __name__
 logger = setup_logging()
@@ -27,14 +27,12 @@ hass_get_state_function_desc = {
 
 
 @register_function("hass_get_state", hass_get_state_function_desc, ToolType.SYSTEM_CTL)
-def hass_get_state(conn, entity_id=""):
+async def hass_get_state(conn, entity_id=""):
     try:
-
-        future = asyncio.run_coroutine_threadsafe(
-            handle_hass_get_state(conn, entity_id), conn.loop
-        )
         # 添加10秒超时
-        ha_response = future.result(timeout=10)
+        ha_response = await asyncio.wait_for(
+            handle_hass_get_state(conn, entity_id), timeout=10
+        )
         return ActionResponse(Action.REQLLM, ha_response, None)
     except asyncio.TimeoutError:
         logger.bind(tag=TAG).error("获取Home Assistant状态超时")
@@ -51,50 +49,51 @@ async def handle_hass_get_state(conn, entity_id):
     base_url = ha_config.get("base_url")
     url = f"{base_url}/api/states/{entity_id}"
     headers = {"Authorization": f"Bearer {api_key}", "Content-Type": "application/json"}
-    response = requests.get(url, headers=headers)
-    if response.status_code == 200:
-        responsetext = "设备状态:" + response.json()["state"] + " "
-        logger.bind(tag=TAG).info(f"api返回内容: {response.json()}")
+    async with get_http_session().get(url, headers=headers) as response:
+        if response.status == 200:
+            data = await response.json()
+            responsetext = "设备状态:" + data["state"] + " "
+            logger.bind(tag=TAG).info(f"api返回内容: {data}")
 
-        if "media_title" in response.json()["attributes"]:
-            responsetext = (
-                responsetext
-                + "正在播放的是:"
-                + str(response.json()["attributes"]["media_title"])
-                + " "
-            )
-        if "volume_level" in response.json()["attributes"]:
-            responsetext = (
-                responsetext
-                + "音量是:"
-                + str(response.json()["attributes"]["volume_level"])
-                + " "
-            )
-        if "color_temp_kelvin" in response.json()["attributes"]:
-            responsetext = (
-                responsetext
-                + "色温是:"
-                + str(response.json()["attributes"]["color_temp_kelvin"])
-                + " "
-            )
-        if "rgb_color" in response.json()["attributes"]:
-            responsetext = (
-                responsetext
-                + "rgb颜色是:"
-                + str(response.json()["attributes"]["rgb_color"])
-                + " "
-            )
-        if "brightness" in response.json()["attributes"]:
-            responsetext = (
-                responsetext
-                + "亮度是:"
-                + str(response.json()["attributes"]["brightness"])
-                + " "
-            )
-        logger.bind(tag=TAG).info(f"查询返回内容: {responsetext}")
-        return responsetext
-        # return response.json()['attributes']
-        # response.attributes
+            if "media_title" in data["attributes"]:
+                responsetext = (
+                    responsetext
+                    + "正在播放的是:"
+                    + str(data["attributes"]["media_title"])
+                    + " "
+                )
+            if "volume_level" in data["attributes"]:
+                responsetext = (
+                    responsetext
+                    + "音量是:"
+                    + str(data["attributes"]["volume_level"])
+                    + " "
+                )
+            if "color_temp_kelvin" in data["attributes"]:
+                responsetext = (
+                    responsetext
+                    + "色温是:"
+                    + str(data["attributes"]["color_temp_kelvin"])
+                    + " "
+                )
+            if "rgb_color" in data["attributes"]:
+                responsetext = (
+                    responsetext
+                    + "rgb颜色是:"
+                    + str(data["attributes"]["rgb_color"])
+                    + " "
+                )
+            if "brightness" in data["attributes"]:
+                responsetext = (
+                    responsetext
+                    + "亮度是:"
+                    + str(data["attributes"]["brightness"])
+                    + " "
+                )
+            logger.bind(tag=TAG).info(f"查询返回内容: {responsetext}")
+            return responsetext
+            # return response.json()['attributes']
+            # response.attributes
 
-    else:
-        return f"切换失败，错误码: {response.status_code}"
+        else:
+            return f"切换失败，错误码: {response.status}"
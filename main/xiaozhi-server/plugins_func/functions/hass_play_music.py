@@ -1,8 +1,7 @@
 from plugins_func.register import register_function, ToolType, ActionResponse, Action
 from plugins_func.functions.hass_init import initialize_hass_handler
 from config.logger import setup_logging
-import asyncio
-import requests
+from core.utils.http_client import get_http_session
 
 TAG = __name__
 logger = setup_logging()
@@ -33,13 +32,10 @@ hass_play_music_function_desc = {
 @register_function(
     "hass_play_music", hass_play_music_function_desc, ToolType.SYSTEM_CTL
 )
-def hass_play_music(conn, entity_id="", media_content_id="random"):
+async def hass_play_music(conn, entity_id="", media_content_id="random"):
     try:
         # 执行音乐播放命令
-        future = asyncio.run_coroutine_threadsafe(
-            handle_hass_play_music(conn, entity_id, media_content_id), conn.loop
-        )
-        ha_response = future.result()
+        ha_response = await handle_hass_play_music(conn, entity_id, media_content_id)
         return ActionResponse(
             action=Action.RESPONSE, result="退出意图已处理", response=ha_response
         )
@@ -54,8 +50,9 @@ async def handle_hass_play_music(conn, entity_id, media_content_id):
     url = f"{base_url}/api/services/music_assistant/play_media"
     headers = {"Authorization": f"Bearer {api_key}", "Content-Type": "application/json"}
     data = {"entity_id": entity_id, "media_id": media_content_id}
-    response = requests.post(url, headers=headers, json=data)
-    if response.status_code == 200:
+    async with get_http_session().post(url, headers=headers, json=data) as response:
+        status = response.status
+    if status == 200:
         return f"正在播放{media_content_id}的音乐"
     else:
-        return f"音乐播放失败，错误码: {response.status_code}"
+        return f"音乐播放失败，错误码: {status}"
@@ -1,8 +1,8 @@
 from plugins_func.register import register_function, ToolType, ActionResponse, Action
 from plugins_func.functions.hass_init import initialize_hass_handler
 from config.logger import setup_logging
+from core.utils.http_client import get_http_session
 import asyncio
-import requests
 
 TAG = __name__
 logger = setup_logging()
@@ -50,15 +50,14 @@ hass_set_state_function_desc = {
 
 
 @register_function("hass_set_state", hass_set_state_function_desc, ToolType.SYSTEM_CTL)
-def hass_set_state(conn, entity_id="", state=None):
+async def hass_set_state(conn, entity_id="", state=None):
     if state is None:
         state = {}
     try:
-        future = asyncio.run_coroutine_threadsafe(
-            handle_hass_set_state(conn, entity_id, state), conn.loop
-        )
         # 添加10秒超时
-        ha_response = future.result(timeout=10)
+        ha_response = await asyncio.wait_for(
+            handle_hass_set_state(conn, entity_id, state), timeout=10
+        )
         return ActionResponse(Action.REQLLM, ha_response, None)
     except asyncio.TimeoutError:
         logger.bind(tag=TAG).error("设置Home Assistant状态超时")
@@ -169,11 +168,10 @@ async def handle_hass_set_state(conn, entity_id, state):
         data = {"entity_id": entity_id, arg: value}
     url = f"{base_url}/api/services/{domain}/{action}"
     headers = {"Authorization": f"Bearer {api_key}", "Content-Type": "application/json"}
-    response = requests.post(url, headers=headers, json=data)
-    logger.bind(tag=TAG).info(
-        f"设置状态:{description},url:{url},return_code:{response.status_code}"
-    )
-    if response.status_code == 200:
+    async with get_http_session().post(url, headers=headers, json=data) as response:
+        status = response.status
+    logger.bind(tag=TAG).info(f"设置状态:{description},url:{url},return_code:{status}")
+    if status == 200:
         return description
     else:
-        return f"设置失败，错误码: {response.status_code}"
+        return f"设置失败，错误码: {status}"
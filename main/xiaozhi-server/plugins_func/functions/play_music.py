@@ -2,13 +2,13 @@ import os
 import re
 import time
 import random
-import difflib
+import asyncio
 import traceback
-from pathlib import Path
 from core.handle.sendAudioHandle import send_stt_message
 from plugins_func.register import register_function, ToolType, ActionResponse, Action
 from core.utils.dialogue import Message
 from core.providers.tts.dto.dto import TTSMessageDTO, SentenceType, ContentType
+from core.utils.music_index import MusicIndex
 
 TAG = __name__
 
@@ -47,9 +47,9 @@ def play_music(conn, song_name: str):
                 action=Action.RESPONSE, result="系统繁忙", response="请稍后再试"
             )
 
-        # 提交异步任务
-        task = conn.loop.create_task(
-            handle_music_command(conn, music_intent)  # 封装异步逻辑
+        # 提交异步任务，插件在线程池中执行，需线程安全地提交到连接的事件循环
+        task = asyncio.run_coroutine_threadsafe(
+            handle_music_command(conn, music_intent), conn.loop  # 封装异步逻辑
         )
 
         # 非阻塞回调处理
@@ -82,37 +82,10 @@ def _extract_song_name(text):
     return None
 
 
-def _find_best_match(potential_song, music_files):
+def _find_best_match(potential_song, music_index):
     """查找最匹配的歌曲"""
-    best_match = None
-    highest_ratio = 0
-
-    for music_file in music_files:
-        song_name = os.path.splitext(music_file)[0]
-        ratio = difflib.SequenceMatcher(None, potential_song, song_name).ratio()
-        if ratio > highest_ratio and ratio > 0.4:
-            highest_ratio = ratio
-            best_match = music_file
-    return best_match
-
-
-def get_music_files(music_dir, music_ext):
-    music_dir = Path(music_dir)
-    music_files = []
-    music_file_names = []
-    for file in music_dir.rglob("*"):
-        # 判断是否是文件
-        if file.is_file():
-            # 获取文件扩展名
-            ext = file.suffix.lower()
-            # 判断扩展名是否在列表中
-            if ext in music_ext:
-                # 添加相对路径
-                music_files.append(str(file.relative_to(music_dir)))
-                music_file_names.append(
-                    os.path.splitext(str(file.relative_to(music_dir)))[0]
-                )
-    return music_files, music_file_names
+    matches = music_index.search(potential_song, top_k=1, min_score=0.3)
+    return matches[0][0] if matches else None
 
 
 def initialize_music_handler(conn):
@@ -133,10 +106,11 @@ def initialize_music_handler(conn):
             MUSIC_CACHE["music_dir"] = os.path.abspath("./music")
             MUSIC_CACHE["music_ext"] = (".mp3", ".wav", ".p3")
             MUSIC_CACHE["refresh_time"] = 60
-        # 获取音乐文件列表
-        MUSIC_CACHE["music_files"], MUSIC_CACHE["music_file_names"] = get_music_files(
+        # 建立歌曲索引，之后按目录修改时间增量刷新
+        MUSIC_CACHE["music_index"] = MusicIndex(
             MUSIC_CACHE["music_dir"], MUSIC_CACHE["music_ext"]
         )
+        MUSIC_CACHE["music_index"].refresh()
         MUSIC_CACHE["scan_time"] = time.time()
     return MUSIC_CACHE
 
@@ -152,15 +126,13 @@ async def handle_music_command(conn, text):
     # 尝试匹配具体歌名
     if os.path.exists(MUSIC_CACHE["music_dir"]):
         if time.time() - MUSIC_CACHE["scan_time"] > MUSIC_CACHE["refresh_time"]:
-            # 刷新音乐文件列表
-            MUSIC_CACHE["music_files"], MUSIC_CACHE["music_file_names"] = (
-                get_music_files(MUSIC_CACHE["music_dir"], MUSIC_CACHE["music_ext"])
-            )
+            # 增量刷新音乐文件列表
+            MUSIC_CACHE["music_index"].refresh()
             MUSIC_CACHE["scan_time"] = time.time()
 
         potential_song = _extract_song_name(clean_text)
         if potential_song:
-            best_match = _find_best_match(potential_song, MUSIC_CACHE["music_files"])
+            best_match = _find_best_match(potential_song, MUSIC_CACHE["music_index"])
             if best_match:
                 conn.logger.bind(tag=TAG).info(f"找到最匹配的歌曲: {best_match}")
                 await play_local_music(conn, specific_file=best_match)
@@ -202,10 +174,10 @@ async def play_local_music(conn, specific_file=None):
             selected_music = specific_file
             music_path = os.path.join(MUSIC_CACHE["music_dir"], specific_file)
         else:
-            if not MUSIC_CACHE["music_files"]:
+            selected_music = MUSIC_CACHE["music_index"].random_file()
+            if not selected_music:
                 conn.logger.bind(tag=TAG).error("未找到MP3音乐文件")
                 return
-            selected_music = random.choice(MUSIC_CACHE["music_files"])
             music_path = os.path.join(MUSIC_CACHE["music_dir"], selected_music)
 
         if not os.path.exists(music_path):
@@ -42,11 +42,15 @@ class ActionResponse:
 
 
 class FunctionItem:
-    def __init__(self, name, description, func, type):
+    def __init__(
+        self, name, description, func, type, timeout=None, max_concurrency=None
+    ):
         self.name = name
         self.description = description
         self.func = func
         self.type = type
+        self.timeout = timeout  # 单次调用超时（秒），None表示使用全局配置
+        self.max_concurrency = max_concurrency  # 同时执行的调用数上限，None表示使用全局配置
 
 
 class DeviceTypeRegistry:
@@ -79,11 +83,16 @@ class DeviceTypeRegistry:
 all_function_registry = {}
 
 
-def register_function(name, desc, type=None):
-    """注册函数到函数注册字典的装饰器"""
+def register_function(name, desc, type=None, timeout=None, max_concurrency=None):
+    """注册函数到函数注册字典的装饰器
+
+    函数可以是普通函数或async函数：普通函数在插件专用线程池中执行，async函数在事件循环中执行。
+    """
 
     def decorator(func):
-        all_function_registry[name] = FunctionItem(name, desc, func, type)
+        all_function_registry[name] = FunctionItem(
+            name, desc, func, type, timeout, max_concurrency
+        )
         logger.bind(tag=TAG).debug(f"函数 '{name}' 已加载，可以注册使用")
         return func
 
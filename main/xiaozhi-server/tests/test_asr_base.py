@@ -0,0 +1,73 @@
+import asyncio
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+opuslib_next = pytest.importorskip("opuslib_next")
+
+from core.providers.asr.base import ASRProviderBase
+from core.utils.audio_buffer import PcmRingBuffer
+
+FRAME = 960
+
+
+class _Provider(ASRProviderBase):
+    def __init__(self):
+        super().__init__()
+        self.tasks = []
+
+    async def speech_to_text(self, opus_data, session_id, audio_format="opus"):
+        return "", None
+
+    def _start_turn_trace(self, conn):
+        pass
+
+    async def handle_voice_stop(self, conn, asr_audio_task):
+        self.tasks.append(asr_audio_task)
+
+
+def _conn():
+    return SimpleNamespace(
+        client_listen_mode="auto",
+        client_have_voice=True,
+        client_voice_stop=False,
+        asr_audio=[],
+        client_audio_buffer=PcmRingBuffer(),
+        audio_format="opus",
+        reset_vad_states=lambda: None,
+    )
+
+
+def _speak(provider, conn, seconds):
+    """模拟VAD：每包解码后写入缓冲区，最后一包时检测到说话结束"""
+    encoder = opuslib_next.Encoder(16000, 1, opuslib_next.APPLICATION_AUDIO)
+    decoder = opuslib_next.Decoder(16000, 1)
+    pcm = (np.sin(np.arange(FRAME) / 8) * 3000).astype(np.int16).tobytes()
+    packets = int(seconds * 1000 // 60)
+    for index in range(packets):
+        packet = encoder.encode(pcm, FRAME)
+        conn.client_audio_buffer.write(decoder.decode(packet, FRAME))
+        while conn.client_audio_buffer.read_window() is not None:
+            pass
+        conn.client_voice_stop = index == packets - 1
+        asyncio.run(provider.receive_audio(conn, packet, True))
+    return packets
+
+
+def test_short_utterance_reuses_vad_pcm():
+    provider, conn = _Provider(), _conn()
+    packets = _speak(provider, conn, 3)
+    task = provider.tasks[0]
+    assert len(task.pcm) == packets * FRAME * 2
+    assert provider.decode_opus(task) == [task.pcm]
+
+
+def test_utterance_longer_than_buffer_decodes_all_packets():
+    provider, conn = _Provider(), _conn()
+    packets = _speak(provider, conn, 36)
+    task = provider.tasks[0]
+    assert len(task) == packets
+    assert task.pcm == b""
+    pcm = b"".join(provider.decode_opus(task))
+    assert len(pcm) == packets * FRAME * 2
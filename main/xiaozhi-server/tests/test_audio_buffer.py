@@ -0,0 +1,33 @@
+import numpy as np
+
+from core.utils.audio_buffer import PcmRingBuffer
+
+FRAME = 960
+
+
+def _feed(buffer, seconds):
+    """按60ms一包写入PCM并读完VAD窗口，返回写入的采样点数"""
+    frame = np.arange(FRAME, dtype=np.int16).tobytes()
+    frames = int(seconds * 16000 // FRAME)
+    for _ in range(frames):
+        buffer.write(frame)
+        while buffer.read_window() is not None:
+            pass
+    return frames * FRAME
+
+
+def test_retained_utterance_within_capacity():
+    buffer = PcmRingBuffer()
+    buffer.retain_tail(0)
+    samples = _feed(buffer, 10)
+    assert not buffer.retained_truncated
+    assert len(buffer.take_retained()) == samples * 2
+
+
+def test_retained_utterance_longer_than_capacity_is_marked():
+    buffer = PcmRingBuffer()
+    buffer.retain_tail(0)
+    _feed(buffer, 36)
+    assert buffer.retained_truncated
+    buffer.take_retained()
+    assert not buffer.retained_truncated
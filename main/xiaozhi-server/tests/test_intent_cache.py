@@ -0,0 +1,67 @@
+import json
+
+from core.utils.intent_cache import SemanticIntentCache, canonical
+
+SIGNATURE = "tools"
+
+
+def _weather(city):
+    return json.dumps(
+        {"function_call": {"name": "get_weather", "arguments": {"location": city}}},
+        ensure_ascii=False,
+    )
+
+
+def _cache():
+    cache = SemanticIntentCache()
+    cache.configure({"enable": True, "threshold": 0.85, "ttl": 600})
+    return cache
+
+
+def test_reorders_without_arguments_hit():
+    cache = _cache()
+    intent = json.dumps({"function_call": {"name": "light_on"}})
+    cache.add("device", SIGNATURE, "打开灯", intent)
+    assert cache.lookup("device", SIGNATURE, "把灯打开") == intent
+
+
+def test_different_city_does_not_hit():
+    cache = _cache()
+    cache.add("device", SIGNATURE, "北京天气怎么样", _weather("北京"))
+    assert cache.lookup("device", SIGNATURE, "南京天气怎么样") is None
+
+
+def test_same_city_paraphrase_hits():
+    cache = _cache()
+    cache.add("device", SIGNATURE, "北京天气怎么样", _weather("北京"))
+    assert cache.lookup("device", SIGNATURE, "北京的天气怎么样啊") == _weather("北京")
+
+
+def test_different_number_does_not_hit():
+    cache = _cache()
+    intent = json.dumps(
+        {"function_call": {"name": "set_volume", "arguments": {"volume": 30}}}
+    )
+    cache.add("device", SIGNATURE, "音量调到30", intent)
+    assert cache.lookup("device", SIGNATURE, "音量调到五十") is None
+
+
+def test_negation_and_question_do_not_hit():
+    cache = _cache()
+    intent = json.dumps({"function_call": {"name": "ac_on"}})
+    cache.add("device", SIGNATURE, "打开空调", intent)
+    for text in ("不打开空调", "别打开空调", "打开空调吗", "没打开空调"):
+        assert cache.lookup("device", SIGNATURE, text) is None, text
+    assert cache.lookup("device", SIGNATURE, "请帮我把空调打开") == intent
+
+
+def test_missing_content_word_does_not_hit():
+    cache = _cache()
+    intent = json.dumps({"function_call": {"name": "get_weather"}})
+    cache.add("device", SIGNATURE, "今天天气怎么样", intent)
+    assert cache.lookup("device", SIGNATURE, "今天怎么样") is None
+
+
+def test_canonical_keeps_particles():
+    assert canonical("的士高") == "的士高"
+    assert canonical("把灯打开！") != canonical("灯打开")